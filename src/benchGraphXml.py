@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+"""
+Measures the time and peak memory used to lay out and write the schema
+graph, as XML and as JSON, for a synthetic schema.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import presquel
+from presquel.codegen import (AnalysisModel, write_graph_xml,
+                              write_graph_json, load_layout)
+
+
+VERSION = "%{prog}s " + presquel.VERSION_STR
+
+
+def write_synthetic_schema(base_dir, table_count, column_count):
+    """
+    Write a package with table_count tables, each with column_count columns
+    and a foreign key to an earlier table.
+    """
+    version_dir = os.path.join(base_dir, 'v00')
+    os.makedirs(version_dir)
+    for i in range(table_count):
+        lines = [
+            'table:',
+            '  name: T' + str(i),
+            '  columns:',
+            '  - column:',
+            '      name: T' + str(i) + '_Id',
+            '      type: int',
+            '      autoIncrement: true',
+            '      constraints:',
+            '      - constraint:',
+            '          type: primary key',
+        ]
+        if i > 0:
+            parent = str(i // 2)
+            lines.extend([
+                '  - column:',
+                '      name: T' + parent + '_Id',
+                '      type: int',
+                '      constraints:',
+                '      - constraint:',
+                '          type: foreign key',
+                '          table: T' + parent,
+                '          column: T' + parent + '_Id',
+            ])
+        for c in range(column_count):
+            lines.extend([
+                '  - column:',
+                '      name: Value_' + str(c),
+                '      type: nvarchar(40)',
+            ])
+        with open(os.path.join(version_dir, '{0:05d}_t.yaml'.format(i)),
+                  'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+def measure(name, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{0}: {1:.3f} seconds, {2:.1f} KiB peak".format(
+        name, elapsed, peak / 1024.0))
+
+
+def main(args_list):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the schema graph output")
+    parser.add_argument('--version', action='version', version=VERSION)
+    parser.add_argument('-t', '--tables', type=int, default=3000,
+                        help="number of tables in the synthetic schema")
+    parser.add_argument('-c', '--columns', type=int, default=8,
+                        help="number of extra columns in each table")
+    args = parser.parse_args(args_list)
+
+    base_dir = tempfile.mkdtemp()
+    try:
+        package_dir = os.path.join(base_dir, 'bench')
+        write_synthetic_schema(package_dir, args.tables, args.columns)
+        package = presquel.load_package(package_dir, 'bench')
+        analysis = AnalysisModel()
+        analysis.add_version(package.get_newest_version().schema_version)
+
+        xml_file = os.path.join(base_dir, 'schema.graph.xml')
+        json_file = os.path.join(base_dir, 'schema.graph.json')
+
+        layouts = []
+
+        def layout():
+            layouts.append(load_layout(analysis, base_dir))
+
+        def xml():
+            with open(xml_file, 'wb') as f:
+                write_graph_xml(analysis, f, layouts[-1])
+
+        def json():
+            with open(json_file, 'w') as f:
+                write_graph_json(analysis, f, layouts[-1])
+
+        print("{0} tables, {1} columns each".format(
+            args.tables, args.columns + 2))
+        measure("layout", layout)
+        measure("cached layout", layout)
+        measure("xml", xml)
+        measure("json", json)
+    finally:
+        shutil.rmtree(base_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
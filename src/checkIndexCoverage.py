@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+import os
+import sys
+import presquel
+import argparse
+from presquel.codegen import (AnalysisModel, IndexCoverageReport)
+from presquel.model.indexes import (
+    find_schema_index_problems, index_problems_to_json)
+
+
+VERSION = "%{prog}s " + presquel.VERSION_STR
+
+
+class SourceSetup(object):
+    def __init__(self, base_dir: str):
+        self.problems = []
+        self.warnings = []
+
+        version_split = base_dir.split("@")
+        if len(version_split) == 1:
+            self.base_dir = base_dir
+            self.version_name = None
+        elif len(version_split) == 2:
+            self.base_dir = version_split[0]
+            self.version_name = version_split[1]
+        else:
+            self.problems.append(
+                "invalid version definition: '" + base_dir + "'")
+            return
+
+        self.package_name = os.path.basename(self.base_dir)
+
+        if not os.path.isdir(self.base_dir):
+            self.problems.append("not a directory: " + self.base_dir)
+
+        self.package = None
+        self.branch = None
+
+    def load(self):
+        self.package = presquel.load_package(self.base_dir, self.package_name)
+        for number in self.package.unresolved_branch_versions:
+            self.problems.append(
+                "package references unknown version number " + str(number))
+        self.package_name = self.package.package
+
+        if self.version_name is None:
+            self.branch = self.package.get_newest_version()
+            if self.branch is None:
+                self.problems.append("no versions in package")
+        else:
+            for version in self.package.get_versions():
+                if version.is_version(self.version_name):
+                    self.branch = self.package.get_version(version)
+                    break
+            if self.branch is None:
+                self.problems.append(
+                    "could not find version '" + self.version_name +
+                    "' in package")
+
+        if self.branch is not None:
+            for prb in self.branch.schema_version.problems:
+                if prb.is_error:
+                    self.problems.append(str(prb))
+                else:
+                    self.warnings.append(str(prb))
+
+
+def read_baseline(filename: str) -> set:
+    """
+    The baseline file lists the accepted full scan access paths, one per
+    line.  Blank lines and lines starting with '#' are ignored.
+    """
+    ret = set()
+    with open(filename, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 0 and not line.startswith('#'):
+                ret.add(line)
+    return ret
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        fromfile_prefix_chars='@',
+        description="""Reports the access paths of the generated data access
+        code that are not backed by an index.  Exits with an error if there
+        are full scan paths that are not in the baseline.""")
+    parser.add_argument('--version', action='version', version=VERSION)
+
+    parser.add_argument("-v", "--verbose",
+                        help="list every access path, not just the full scans",
+                        action="store_true")
+    parser.add_argument("-p", "--platform",
+                        help="SQL platform used to pick the sql dialects",
+                        action="store",
+                        default="mysql")
+    parser.add_argument("-b", "--baseline",
+                        help="""file listing the accepted full scan access
+                        paths; only paths not in this file fail the check""",
+                        action="store")
+    parser.add_argument("--write-baseline",
+                        help="""write the current full scan access paths to
+                        this file, and exit without failing""",
+                        action="store")
+    parser.add_argument("--index-report",
+                        help="""write the duplicate, redundant and unindexed
+                        foreign key report, as JSON, to this file""",
+                        action="store")
+
+    parser.add_argument('sources', metavar='source', nargs='+',
+                        help="""source directory to use an input.  By default,
+                        this will pull in the highest version number to
+                        check.  To check one specific version, use the
+                        format 'source/dir/name@1.2.3'.""")
+
+    arg_values = parser.parse_args()
+    platforms = [arg_values.platform]
+
+    baseline = set()
+    if arg_values.baseline is not None:
+        baseline = read_baseline(arg_values.baseline)
+
+    analysis_model = AnalysisModel()
+    problems = False
+    for source in arg_values.sources:
+        setup = SourceSetup(source)
+        if len(setup.problems) <= 0:
+            setup.load()
+        for warning in setup.warnings:
+            print("[" + source + "] " + warning)
+        if len(setup.problems) > 0:
+            problems = True
+            print("Problems discovered for " + source + ":")
+            for problem in setup.problems:
+                print("[" + source + "] " + str(problem))
+        else:
+            analysis_model.add_version(setup.branch.schema_version)
+
+    if problems:
+        sys.exit(1)
+
+    if arg_values.index_report is not None:
+        with open(arg_values.index_report, 'w') as f:
+            f.write(index_problems_to_json(
+                find_schema_index_problems(analysis_model.schemas)))
+        print("Generating " + arg_values.index_report)
+
+    report = IndexCoverageReport(analysis_model, platforms)
+
+    if arg_values.write_baseline is not None:
+        with open(arg_values.write_baseline, 'w') as f:
+            f.write('# Accepted full scan access paths\n')
+            for path in report.unindexed_paths:
+                f.write(path.key + '\n')
+        print("Wrote " + str(len(report.unindexed_paths)) + " path(s) to " +
+              arg_values.write_baseline)
+        sys.exit(0)
+
+    if arg_values.verbose:
+        for line in report.to_lines():
+            print(line)
+
+    new_paths = report.get_new_unindexed_paths(baseline)
+    for path in new_paths:
+        print("Full scan: " + str(path))
+    if len(new_paths) > 0:
+        print(str(len(new_paths)) + " new full scan access path(s)")
+        sys.exit(1)
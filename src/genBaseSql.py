@@ -23,6 +23,7 @@ def find_max_order_len(max_len, schema_list):
 class SourceSetup(object):
     def __init__(self, base_dir: str):
         self.problems = []
+        self.warnings = []
 
         version_split = base_dir.split("@")
         if len(version_split) == 1:
@@ -71,8 +72,11 @@ class SourceSetup(object):
                 )
 
         if self.branch is not None:
-            self.problems.extend(
-                [str(branch) for branch in self.branch.schema_version.problems])
+            for prb in self.branch.schema_version.problems:
+                if prb.is_error:
+                    self.problems.append(str(prb))
+                else:
+                    self.warnings.append(str(prb))
 
     def set_output(self, output_dir: str, directories: bool, force: bool):
         if directories:
@@ -112,6 +116,12 @@ if __name__ == '__main__':
                         help="SQL platform to generate for",
                         action="store",
                         required=True)
+    parser.add_argument("--defer-indexes",
+                        help="""create the tables with only their primary key,
+                        and put the secondary indexes and foreign keys into a
+                        separate script to run after the data is bulk
+                        loaded""",
+                        action="store_true")
 
     parser.add_argument('sources', metavar='source', nargs='+',
                         help="""source directory to use an input.  By default,
@@ -135,6 +145,8 @@ if __name__ == '__main__':
         setup.load()
         setup.set_output(arg_values.output, arg_values.directories,
                          arg_values.force)
+        for warning in setup.warnings:
+            print("[" + source + "] " + warning)
         if len(setup.problems) > 0:
             problems = True
             print("Problems discovered for " + source + ":")
@@ -158,5 +170,18 @@ if __name__ == '__main__':
                     schema.order.items()[0], schema.name))
             print("Generating " + filename)
             with open(filename, 'w') as f:
-                for script in gen.generate_base(schema):
+                for script in gen.generate_base(
+                        schema, arg_values.defer_indexes):
                     f.write(script)
+
+        if arg_values.defer_indexes:
+            scripts = []
+            for schema in branch_version.schema:
+                scripts.extend(gen.generate_deferred_indexes(schema))
+            if len(scripts) > 0:
+                # Named to sort after the ordered schema files.
+                filename = os.path.join(setup.out_dir, 'post_load_indexes.sql')
+                print("Generating " + filename)
+                with open(filename, 'w') as f:
+                    for script in scripts:
+                        f.write(script)
@@ -8,25 +8,50 @@ import distutils.dir_util
 
 
 if __name__ == '__main__':
-    output_dir = sys.argv[1]
+    args = sys.argv[1:]
+    # Also write the graph as JSON, for tools other than the UI.
+    write_json = False
+    if '--json' in args:
+        args.remove('--json')
+        write_json = True
+    # The computed layout is cached with the output, unless told otherwise.
+    layout_cache_dir = None
+    if '--layout-cache' in args:
+        pos = args.index('--layout-cache')
+        layout_cache_dir = args[pos + 1]
+        del args[pos:pos + 2]
+    # Only graph the tables within some foreign keys of one table.
+    focus = None
+    if '--focus' in args:
+        pos = args.index('--focus')
+        focus = args[pos + 1]
+        del args[pos:pos + 2]
+    depth = 1
+    if '--depth' in args:
+        pos = args.index('--depth')
+        depth = int(args[pos + 1])
+        del args[pos:pos + 2]
+    output_dir = args[0]
     analysis = presquel.codegen.AnalysisModel()
-    for in_dir in sys.argv[2:]:
+    for in_dir in args[1:]:
         package = presquel.load_package(in_dir)
         head_version = package.get_newest_version()
         if head_version is None:
             print("no versions found in {0}".format(in_dir))
             sys.exit(1)
         branch = head_version.schema_version
-        if len(branch.problems) > 0:
+        for problem in branch.problems:
+            if not problem.is_error:
+                print("[{0}] {1}".format(package.package, problem))
+        errors = [problem for problem in branch.problems if problem.is_error]
+        if len(errors) > 0:
             print("Problems discovered for {0}:".format(in_dir))
-            for problem in branch.problems:
-                print("[{0}] {1}".format(package_name, problem))
+            for problem in errors:
+                print("[{0}] {1}".format(package.package, problem))
             sys.exit(1)
 
         analysis.add_version(branch)
 
-    xml = presquel.codegen.generate_graph_xml(analysis)
-
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     distutils.dir_util.copy_tree(
@@ -36,5 +61,23 @@ if __name__ == '__main__':
          update = True,
          verbose = True,
          dry_run = False)
+    schemas = None
+    if focus is not None:
+        if analysis.get_schema_named(focus) is None:
+            print("no such table {0}".format(focus))
+            sys.exit(1)
+        schemas = analysis.get_schema_neighborhood(focus, depth)
+        print("graphing {0} tables within {1} of {2}".format(
+            len(schemas), depth, focus))
+
+    if layout_cache_dir is None:
+        layout_cache_dir = output_dir
+    elif not os.path.exists(layout_cache_dir):
+        os.makedirs(layout_cache_dir)
+    layout = presquel.codegen.load_layout(analysis, layout_cache_dir,
+                                                schemas)
     with open(os.path.join(output_dir, 'schema.graph.xml'), 'wb') as f:
-        f.write(xml)
+        presquel.codegen.write_graph_xml(analysis, f, layout, schemas)
+    if write_json:
+        with open(os.path.join(output_dir, 'schema.graph.json'), 'w') as f:
+            presquel.codegen.write_graph_json(analysis, f, layout, schemas)
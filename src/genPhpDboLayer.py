@@ -16,7 +16,18 @@ PLATFORMS = ['mysql']
 # much like genBaseSql.py
 
 if __name__ == '__main__':
-    (parent_class, namespace, in_dir, output_dir) = sys.argv[1:]
+    args = sys.argv[1:]
+    # Generated classes reuse their prepared statements, unless turned off.
+    statement_cache = True
+    if '--no-statement-cache' in args:
+        args.remove('--no-statement-cache')
+        statement_cache = False
+    # Paged reads count the total rows with window functions (MySql 8.0+).
+    window_functions = False
+    if '--window-functions' in args:
+        args.remove('--window-functions')
+        window_functions = True
+    (parent_class, namespace, in_dir, output_dir) = args
     package_name = os.path.basename(in_dir)
     package = load_package(in_dir, package_name)
     package_name = package.package
@@ -25,9 +36,13 @@ if __name__ == '__main__':
         print("no versions found")
         sys.exit(1)
     branch = head_version.schema_version
-    if len(branch.problems) > 0:
+    for problem in branch.problems:
+        if not problem.is_error:
+            print("[" + package_name + "] " + str(problem))
+    errors = [problem for problem in branch.problems if problem.is_error]
+    if len(errors) > 0:
         print("Problems discovered for " + in_dir + ":")
-        for problem in branch.problems:
+        for problem in errors:
             print("[" + package_name + "] " + str(problem))
         sys.exit(1)
 
@@ -36,11 +51,22 @@ if __name__ == '__main__':
 
     lang_gen = php.PhpLanguageGenerator()
     file_gen = filegen.FileGen(lang_gen)
-    prep_sql_converter = mysql.MySqlPrepSqlConverter('php', PLATFORMS)
+    prep_sql_converter = mysql.MySqlPrepSqlConverter(
+        'php', PLATFORMS, window_functions)
+    uses_cache = False
     for schema in branch.schema:
         config = php.PhpGenConfig(
             analysis_model.get_analysis_for(schema),
             output_dir, PLATFORMS,
-            prep_sql_converter, namespace, parent_class)
+            prep_sql_converter, namespace, parent_class, statement_cache)
         print("Generating PHP for " + config.class_name)
         file_gen.generate_file(config)
+        if config.get_table_cache() is not None:
+            uses_cache = True
+
+    if uses_cache:
+        # The cache backends shared by the cached table classes.
+        print("Generating PHP for DboCache")
+        with open(os.path.join(output_dir, php.DBO_CACHE_FILE_NAME),
+                  'w') as out:
+            out.write('\n'.join(php.generate_dbo_cache(namespace)))
@@ -2,6 +2,7 @@
 
 import os
 import sys
+import json
 import presquel
 import argparse
 
@@ -37,6 +38,7 @@ def find_max_order_len(max_len, schema_list):
 class SourceSetup(object):
     def __init__(self, base_dir: str):
         self.problems = []
+        self.warnings = []
 
         version_split = base_dir.split("@")
         if len(version_split) == 1:
@@ -92,14 +94,19 @@ class SourceSetup(object):
             self.analysis = presquel.BranchUpgradeAnalysis(self.branch)
 
             if self.analysis.current_version is not None:
-                self.problems.extend([
-                    str(prb)
-                    for prb in self.analysis.current_version.problems])
+                for prb in self.analysis.current_version.problems:
+                    if prb.is_error:
+                        self.problems.append(str(prb))
+                    else:
+                        self.warnings.append(str(prb))
             if self.analysis.previous_version is not None:
-                self.problems.extend([
-                    "({}) {}".format(
+                for prb in self.analysis.previous_version.problems:
+                    msg = "({}) {}".format(
                         self.analysis.previous_version.version, prb)
-                    for prb in self.analysis.previous_version.problems])
+                    if prb.is_error:
+                        self.problems.append(msg)
+                    else:
+                        self.warnings.append(msg)
             if self.analysis.upgrade_set is not None:
                 self.problems.extend([
                     "({}) {}".format(
@@ -154,6 +161,22 @@ if __name__ == '__main__':
                         help="SQL platform to generate for",
                         action="store",
                         required=True)
+    parser.add_argument("--server-version",
+                        help="""database server version to generate for, such
+                        as 5.7.22; this decides which online DDL algorithms
+                        the upgrade scripts request""",
+                        action="store")
+    parser.add_argument("--estimate",
+                        help="""JSON file with the row count and average row
+                        size of each table; writes the estimated I/O and
+                        duration of each upgrade step to upgrade-estimate.txt
+                        (mysql only)""",
+                        action="store")
+    parser.add_argument("--bundle",
+                        help="""also write all the steps into one script, which
+                        records each completed step so that running it again
+                        after a failure skips them (mysql only)""",
+                        action="store_true")
 
     parser.add_argument('sources', metavar='source', nargs='+',
                         help="""source directory to use an input.  By default,
@@ -169,6 +192,19 @@ if __name__ == '__main__':
         print("No generator found for " + arg_values.platform)
         sys.exit(1)
     gen = gens[0]
+    if arg_values.server_version is not None:
+        gen = gen.for_server_version(
+            presquel.schemagen.parse_server_version(arg_values.server_version))
+    statistics = None
+    if arg_values.estimate is not None:
+        if not isinstance(gen, presquel.schemagen.MySqlScriptGenerator):
+            print("--estimate is only supported for the mysql platform")
+            sys.exit(1)
+        statistics = presquel.schemagen.load_statistics(arg_values.estimate)
+    if (arg_values.bundle and
+            not isinstance(gen, presquel.schemagen.MySqlScriptGenerator)):
+        print("--bundle is only supported for the mysql platform")
+        sys.exit(1)
 
     sources = []
     problems = False
@@ -177,6 +213,8 @@ if __name__ == '__main__':
         setup.load()
         setup.set_output(arg_values.output, arg_values.directories,
                          arg_values.force)
+        for warning in setup.warnings:
+            print("[{}] {}".format(source, warning))
         if len(setup.problems) > 0:
             problems = True
             print("Problems discovered for " + source + ":")
@@ -196,6 +234,7 @@ if __name__ == '__main__':
         order_length = find_max_order_len(-1, changes)
         name_format = ('{0:0' + str(order_length) + 'd}_{1}.sql')
 
+        step_files = []
         for change in changes:
             if isinstance(change, presquel.model.Change):
                 schema_name = "change"
@@ -206,7 +245,66 @@ if __name__ == '__main__':
             filename = os.path.join(
                 setup.out_dir, name_format.format(
                     change.order.items()[0], schema_name))
+            scripts = gen.generate_upgrade(change)
+            if len(scripts) <= 0:
+                step_files.append(None)
+                continue
+            step_files.append(os.path.basename(filename))
             print("Generating " + filename)
             with open(filename, 'w') as f:
-                for script in gen.generate_upgrade(change):
+                for script in scripts:
                     f.write(script)
+
+        # The steps that don't depend on each other can run at the same time.
+        manifest = presquel.schemagen.build_upgrade_graph(changes).to_json(
+            step_files)
+        manifest['package'] = setup.package_name
+        manifest['version'] = str(setup.branch.version)
+        if setup.analysis.previous_version is not None:
+            manifest['previousVersion'] = str(
+                setup.analysis.previous_version.version)
+        filename = os.path.join(setup.out_dir, 'upgrade-manifest.json')
+        print("Generating " + filename)
+        with open(filename, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        if arg_values.bundle:
+            previous = None
+            if setup.analysis.previous_version is not None:
+                previous = setup.analysis.previous_version.version
+            filename = os.path.join(
+                setup.out_dir, setup.package_name + '_v' +
+                str(setup.branch.version) + '_upgrade.sql')
+            print("Generating " + filename)
+            scripts = presquel.runner.generate_upgrade_bundle(
+                setup.package, gen, previous, setup.branch.version,
+                presquel.runner.load_version_table(setup.base_dir))
+            with open(filename, 'w') as f:
+                for script in scripts:
+                    f.write(script)
+
+        report = gen.generate_upgrade_report(changes)
+        if len(report) > 0:
+            filename = os.path.join(setup.out_dir, 'online-ddl-report.txt')
+            print("Generating " + filename)
+            with open(filename, 'w') as f:
+                for line in report:
+                    f.write(line + '\n')
+            for line in report:
+                if line.startswith('!!'):
+                    print("[{}] WARNING table copy: {}".format(
+                        setup, line[2:].strip()))
+
+        if statistics is not None:
+            estimate = presquel.schemagen.format_estimates(
+                presquel.schemagen.estimate_upgrade(gen, changes, statistics),
+                statistics)
+            filename = os.path.join(setup.out_dir, 'upgrade-estimate.txt')
+            print("Generating " + filename)
+            with open(filename, 'w') as f:
+                for line in estimate:
+                    f.write(line + '\n')
+            for line in estimate:
+                if (line.startswith('Total:') or
+                        line.startswith('?? No statistics')):
+                    print("[{}] {}".format(setup, line))
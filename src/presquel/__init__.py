@@ -11,7 +11,7 @@ from .parser import load_package
 from .schemagen import (get_generator, BranchUpgradeAnalysis)
 
 
-from . import (model, codegen, schemagen, parser)
+from . import (model, codegen, schemagen, parser, runner)
 
 VERSION = (0, 2, 0)
 VERSION_STR = ".".join([str(ver) for ver in VERSION])
@@ -3,4 +3,7 @@ __author__ = 'Groboclown'
 from .analysis import *
 from .sql import *
 from . import php
-from .graph_xml import generate_graph_xml
\ No newline at end of file
+from .graph_xml import (generate_graph_xml, generate_graph_json,
+                        write_graph_xml, write_graph_json)
+from .graph_layout import (compute_layout, load_layout, get_schema_hash)
+from .index_coverage import *
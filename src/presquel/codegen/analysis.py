@@ -76,6 +76,7 @@ class ColumnAnalysis(SchemaAnalysis):
         self.is_read_only = is_read_only
 
         self.is_primary_key = False
+        self.is_unique = False
         self.is_read = True
         self.allows_create = not column.auto_increment
         self.allows_update = True
@@ -114,6 +115,9 @@ class ColumnAnalysis(SchemaAnalysis):
                 self.read_by = True
                 if c.constraint.constraint_type == 'primarykey':
                     self.is_primary_key = True
+                    self.is_unique = True
+                elif c.constraint.constraint_type.count('unique') > 0:
+                    self.is_unique = True
             elif c.constraint.constraint_type == 'initialvalue':
                 con = c.constraint
                 assert isinstance(con, SqlConstraint)
@@ -344,6 +348,26 @@ class ColumnSetAnalysis(SchemaAnalysis):
 
         return ret
 
+    def is_unique_column_list(self, columns: list) -> bool:
+        """
+        Does the list of columns identify at most one row, because it is the
+        primary key or a unique key?
+
+        :param columns: list of Column schema objects, as returned by
+            get_selectable_column_lists
+        :type columns: list[Column]
+        """
+        names = set(col.name for col in columns)
+        if len(columns) == 1:
+            ca = self.get_column_analysis(columns[0].name)
+            if ca is not None and ca.is_unique:
+                return True
+        for con in self.top_analysis.unique_or_primary_sets:
+            assert isinstance(con, AbstractProcessedConstraint)
+            if set(con.constraint.column_names) == names:
+                return True
+        return False
+
     def get_write_validations(self) -> list((Column, Constraint)):
         """
 
@@ -487,8 +511,13 @@ class AnalysisModel(object):
         object.__init__(self)
         self.__schemas = []
         self.__schema_by_name = {}
+        # Foreign keys refer to tables by their simple name.
+        self.__schema_by_simple_name = {}
         self.__schema_packages = {}
         self.__schema_analysis = {}
+        # Foreign key table name -> [(referencing schema, foreign key)], so
+        # the references to a schema don't need a scan over every schema.
+        self.__references_to = {}
 
     def add_version(self, schema_version: SchemaVersion):
         """
@@ -504,9 +533,17 @@ class AnalysisModel(object):
                 raise Exception("already registered schema with name " +
                                 name)
             self.__schema_by_name[name] = schema
+            self.__schema_by_simple_name.setdefault(schema.name, schema)
             self.__schemas.append(schema)
             self.__schema_packages[schema] = schema_version.package
             self.__schema_analysis[schema] = self._process_schema(schema)
+            for fk in self._get_foreign_keys(schema):
+                self.__references_to.setdefault(fk.fk_table_name, []).append(
+                    (schema, fk))
+        # The references are found once every schema of the version is
+        # registered, as a foreign key can name a schema that comes later.
+        for schema in schema_version.schema:
+            self.__schema_analysis[schema].update_references(self)
 
     @property
     def schemas(self) -> tuple:
@@ -519,11 +556,12 @@ class AnalysisModel(object):
 
     def get_schema_named(self, name: str) -> SchemaObject:
         """
-        The schema object with the given full name.
+        The schema object with the given full name, or else with the given
+        simple name.
         """
-        if name not in self.__schema_by_name:
-            return None
-        return self.__schema_by_name[name]
+        if name in self.__schema_by_name:
+            return self.__schema_by_name[name]
+        return self.__schema_by_simple_name.get(name)
 
     def get_schema_package(self, schema: SchemaObject) -> str:
         """
@@ -559,13 +597,80 @@ class AnalysisModel(object):
             return []
         assert isinstance(sa, SchemaAnalysis)
         ret = []
-        for a in self.__schema_analysis.values():
-            if a != schema and isinstance(a, ColumnSetAnalysis):
-                for fk in a.foreign_keys_analysis:
-                    assert isinstance(fk, ProcessedForeignKeyConstraint)
-                    if fk.fk_table_name == sa.sql_name:
-                        ret.append((a.schema, fk))
-                        break
+        seen = set([schema])
+        for name in (schema.full_name, sa.sql_name, schema.name):
+            for (referencing, fk) in self.__references_to.get(name, ()):
+                # Simple names can be shared between packages.
+                if (referencing not in seen and
+                        self.get_schema_named(fk.fk_table_name) is schema):
+                    seen.add(referencing)
+                    ret.append((referencing, fk))
+        return ret
+
+    def get_schemas_referenced_by(self, schema: str or SchemaObject) -> list:
+        """
+        Find all the schemas that the given schema's foreign keys reference.
+
+        :return: list of (schema, ProcessedForeignKeyConstraint) pairs
+        :rtype: list[(SchemaObject, ProcessedForeignKeyConstraint)]
+        """
+        if isinstance(schema, str):
+            schema = self.get_schema_named(schema)
+        assert isinstance(schema, SchemaObject)
+        ret = []
+        seen = set([schema])
+        for fk in self._get_foreign_keys(schema):
+            referenced = self.get_schema_named(fk.fk_table_name)
+            if referenced is not None and referenced not in seen:
+                seen.add(referenced)
+                ret.append((referenced, fk))
+        return ret
+
+    def get_schema_neighborhood(self, schema: str or SchemaObject,
+                                depth: int) -> list:
+        """
+        Find the schemas within depth foreign keys of the given schema,
+        following the foreign keys in both directions.  Only the
+        neighborhood is visited, not the whole model.
+
+        :return: the schemas, starting with the given schema, closest first.
+        :rtype: list[SchemaObject]
+        """
+        if isinstance(schema, str):
+            schema = self.get_schema_named(schema)
+        assert isinstance(schema, SchemaObject)
+        assert depth >= 0
+        ret = [schema]
+        seen = set(ret)
+        edge = ret
+        for _ in range(depth):
+            next_edge = []
+            for s in edge:
+                for (other, fk) in (self.get_schemas_referenced_by(s) +
+                                    self.get_schemas_referencing(s)):
+                    if other not in seen:
+                        seen.add(other)
+                        next_edge.append(other)
+            if len(next_edge) <= 0:
+                break
+            ret.extend(next_edge)
+            edge = next_edge
+        return ret
+
+    def _get_foreign_keys(self, schema: SchemaObject) -> list:
+        """
+        :rtype: list[ProcessedForeignKeyConstraint]
+        """
+        analysis = self.__schema_analysis.get(schema)
+        if not isinstance(analysis, ColumnSetAnalysis):
+            return []
+        ret = []
+        for cola in analysis.columns_analysis:
+            assert isinstance(cola, ColumnAnalysis)
+            if cola.foreign_key is not None:
+                assert isinstance(cola.foreign_key,
+                                  ProcessedForeignKeyConstraint)
+                ret.append(cola.foreign_key)
         return ret
 
     def _process_schema(self, schema: SchemaObject) -> SchemaAnalysis:
@@ -577,7 +682,6 @@ class AnalysisModel(object):
             analysis = self._process_column_set(schema, True)
         else:
             raise Exception("can't process " + repr(schema))
-        analysis.update_references(self)
         return analysis
 
     def _process_column_set(self, schema: SchemaObject,
@@ -2,9 +2,15 @@
 Handles the conversion of SQL into code or straight up SQL.
 """
 
-from ..model.base import (SqlArgument, SqlSet, LanguageSet, SqlString)
+from ..model.base import (SqlArgument, SqlSet, LanguageSet, SqlTemplate)
 from ..model.schema import (SqlConstraint, LanguageConstraint)
 
+# How a page of rows learns about the rows past it.
+# The total row count is read in the same query with "COUNT(*) OVER()".
+PAGE_COUNT_WINDOW = 'window'
+# One more row than the page size is read, to tell if there are more rows.
+PAGE_COUNT_HAS_MORE = 'has more'
+
 
 class PrepSqlConverter(object):
     """
@@ -41,6 +47,24 @@ class PrepSqlConverter(object):
         """
         return self.__platforms
 
+    def get_page_count_style(self) -> str:
+        """
+        The way paged reads report the rows past the page, either
+        PAGE_COUNT_WINDOW or PAGE_COUNT_HAS_MORE.  The default only relies on
+        LIMIT, as not all platforms support window functions.
+
+        :rtype: str
+        """
+        return PAGE_COUNT_HAS_MORE
+
+    def generate_page_total_column(self, name: str) -> str:
+        """
+        The select column that holds the total row count of the query, for
+        the PAGE_COUNT_WINDOW style.
+        """
+        assert isinstance(name, str)
+        return 'COUNT(*) OVER() AS ' + name
+
     def generate_code(self, output_variable: str, arg):
         """
         Creates the language-specific code related to this SqlSet or
@@ -57,15 +81,18 @@ class PrepSqlConverter(object):
             return self._generate_code_for_lang_set(output_variable, arg.code)
         assert False, "Incorrect type for arg"
 
-    def generate_sql(self, arg):
+    def generate_sql(self, arg, columns=None):
         """
         Creates the SQL that will be escaped and inserted into the correct
         part of the code, for this SqlSet or InputValue or Constraint
+
+        :param columns: dict of the column placeholder names that the sql
+            may use, besides its arguments, to the sql for the column.
         """
         if isinstance(arg, SqlSet):
-            return self._generate_sql_for_sql_set(arg)
+            return self._generate_sql_for_sql_set(arg, columns)
         if isinstance(arg, SqlConstraint):
-            return self._generate_sql_for_sql_set(arg.sql)
+            return self._generate_sql_for_sql_set(arg.sql, columns)
         if isinstance(arg, LanguageConstraint):
             # No-op
             return ''
@@ -92,36 +119,34 @@ class PrepSqlConverter(object):
         argument.
         """
         assert isinstance(sql_set, SqlSet)
-        sql = sql_set.get_for_platform(self.platforms)
-
-        # Split the sql into bits for insertion
-        sql_bits = [[0, sql]]
-
-        has_collections = False
+        template = sql_set.get_template_for_platform(self.platforms)
+        if template is None:
+            raise Exception("platform not supported: " + str(self.platforms))
+        assert isinstance(template, SqlTemplate)
 
+        args = {}
         for arg in sql_set.arguments:
             assert isinstance(arg, SqlArgument)
-            new_bits = []
-            for stype, bit in sql_bits:
-                if stype == 0:
-                    match = '{' + arg.name + '}'
-                    while bit.count(match) > 0:
-                        pos = bit.index(match)
-
-                        if arg.is_collection:
-                            has_collections = True
-                            new_bits.append([0, bit[0: pos]])
-                            new_bits.append([1, arg])
-                            bit = bit[pos + len(match):]
-                        else:
-                            bit = (bit[0:pos] +
-                                   self._generate_sql_parameter(arg.name) +
-                                   bit[pos + len(match):])
-                    if len(bit) > 0:
-                        new_bits.append([0, bit])
-                else:
-                    new_bits.append([stype, bit])
-            sql_bits = new_bits
+            args[arg.name] = arg
+
+        # Split the sql into bits for insertion; the simple arguments become
+        # parameters in the surrounding text.
+        sql_bits = []
+        text = []
+        has_collections = False
+        for is_placeholder, bit in template.tokens:
+            if not is_placeholder:
+                text.append(bit)
+            elif args[bit].is_collection:
+                has_collections = True
+                if len(text) > 0:
+                    sql_bits.append([0, ''.join(text)])
+                    text = []
+                sql_bits.append([1, args[bit]])
+            else:
+                text.append(self._generate_sql_parameter(bit))
+        if len(text) > 0:
+            sql_bits.append([0, ''.join(text)])
 
         if not has_collections:
             return None
@@ -129,26 +154,28 @@ class PrepSqlConverter(object):
         return self._generate_code_for_collection_arguments(output_variable,
             sql_set, sql_bits)
 
-    def _generate_sql_for_sql_set(self, sql_set):
+    def _generate_sql_for_sql_set(self, sql_set, columns=None):
         """
         Generates the SQL for a SqlSet
         """
         assert isinstance(sql_set, SqlSet)
-        sql_str = sql_set.get_for_platform(self.platforms)
-        if sql_str is None:
+        columns = columns or {}
+        template = sql_set.get_template_for_platform(self.platforms,
+                                                     columns.keys())
+        if template is None:
             raise Exception("platform not supported: " + str(self.platforms))
-        assert isinstance(sql_str, SqlString)
-        sql = sql_str.sql
-        for arg in sql_set.simple_arguments:
-            assert isinstance(arg, SqlArgument)
-            if arg.is_collection:
-                return None
-            sql = sql.replace('{' + arg.name + '}',
-                self._generate_sql_parameter(arg.name))
+        assert isinstance(template, SqlTemplate)
 
         # Default implementation does not handle collection arguments; those
-        # are assumed to be handled by code.
-        return sql
+        # are assumed to be handled by code, so they stay as placeholders.
+        values = dict(columns)
+        for arg in sql_set.arguments:
+            assert isinstance(arg, SqlArgument)
+            if arg.is_collection:
+                values[arg.name] = '{' + arg.name + '}'
+            else:
+                values[arg.name] = self._generate_sql_parameter(arg.name)
+        return template.render(values)
 
     def _generate_sql_parameter(self, arg_name):
         """
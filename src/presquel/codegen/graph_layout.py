@@ -0,0 +1,332 @@
+"""
+Lays out the schema graph ahead of time, so the graph UI doesn't need to.
+
+Each package's tables are placed in layers, with a table above the tables
+that reference it through foreign keys, and each layer ordered to keep the
+links short.  The packages themselves are laid out the same way, as the
+collapsed nodes of the clustered view.
+
+The layouts are cached on disk, keyed by a hash of the graphed schema, so a
+layout is only computed again when the tables or their foreign keys change.
+The cache keeps the most recently used layouts, so graphs of the whole model
+and of focused parts of it don't replace each other.
+"""
+
+from ..model.schema import (ColumnarSchemaObject, Column)
+from .analysis import (AnalysisModel, ColumnSetAnalysis, ColumnAnalysis,
+                       ProcessedForeignKeyConstraint)
+import hashlib
+import json
+import os
+
+
+# Pixel sizes used to estimate the size of a node from its text.
+CHAR_WIDTH = 8
+LINE_HEIGHT = 16
+# Pixel gaps between the nodes of a layer, and between the layers.
+NODE_SPACING = 40
+LAYER_SPACING = 80
+# Number of barycenter ordering passes, alternating down and up.
+ORDER_PASSES = 4
+
+LAYOUT_CACHE_FILE_NAME = 'schema.layout.json'
+# Number of layouts kept in the cache file.
+LAYOUT_CACHE_SIZE = 16
+
+
+class NodeBox(object):
+    """
+    The position and size of a node, in pixels.
+    """
+    def __init__(self, x, y, width, height):
+        object.__init__(self)
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def to_list(self):
+        return [self.x, self.y, self.width, self.height]
+
+    @staticmethod
+    def from_list(values):
+        return NodeBox(values[0], values[1], values[2], values[3])
+
+
+class GraphLayout(object):
+    """
+    The boxes for the tables, by full name, placed within their package, and
+    the boxes for the packages, by name, for the clustered view.
+    """
+    def __init__(self, schema_hash, tables, packages):
+        """
+        :type tables: dict[str, NodeBox]
+        :type packages: dict[str, NodeBox]
+        """
+        object.__init__(self)
+        assert isinstance(schema_hash, str)
+        self.schema_hash = schema_hash
+        self.tables = tables
+        self.packages = packages
+
+    def get_table_box(self, full_name):
+        """
+        :rtype: NodeBox
+        """
+        return self.tables.get(full_name)
+
+    def get_package_box(self, package):
+        """
+        :rtype: NodeBox
+        """
+        return self.packages.get(package)
+
+    def to_json(self):
+        return {
+            'hash': self.schema_hash,
+            'tables': dict((k, v.to_list()) for k, v in self.tables.items()),
+            'packages': dict((k, v.to_list())
+                             for k, v in self.packages.items()),
+        }
+
+    @staticmethod
+    def from_json(data):
+        return GraphLayout(
+            data['hash'],
+            dict((k, NodeBox.from_list(v))
+                 for k, v in data['tables'].items()),
+            dict((k, NodeBox.from_list(v))
+                 for k, v in data['packages'].items()))
+
+
+class _GraphShape(object):
+    """
+    What the layout depends upon: the tables with their package and node
+    text, and the foreign key links between the tables.
+    """
+    def __init__(self, amodel, schemas=None):
+        assert isinstance(amodel, AnalysisModel)
+        object.__init__(self)
+        if schemas is None:
+            schemas = amodel.schemas
+        included = set(schemas)
+        # full name -> (package, [lines of text])
+        self.tables = {}
+        self.table_order = []
+        # (referencing full name, referenced full name)
+        self.links = []
+
+        for t in schemas:
+            if not isinstance(t, ColumnarSchemaObject):
+                continue
+            ant = amodel.get_analysis_for(t)
+            assert isinstance(ant, ColumnSetAnalysis)
+            lines = [str(t.name)]
+            for c in t.columns:
+                assert isinstance(c, Column)
+                anc = ant.get_column_analysis(c)
+                assert isinstance(anc, ColumnAnalysis)
+                lines.append(str(anc.sql_name))
+                fkc = anc.foreign_key
+                if fkc is not None:
+                    assert isinstance(fkc, ProcessedForeignKeyConstraint)
+                    target = amodel.get_schema_named(fkc.fk_table_name)
+                    if (target is not None and target is not t and
+                            target in included):
+                        self.links.append((t.full_name, target.full_name))
+            self.tables[t.full_name] = (amodel.get_schema_package(t), lines)
+            self.table_order.append(t.full_name)
+
+    def get_hash(self):
+        digest = hashlib.sha1()
+        for name in self.table_order:
+            package, lines = self.tables[name]
+            digest.update(json.dumps([name, package, lines]).encode('utf-8'))
+        for link in self.links:
+            digest.update(json.dumps(link).encode('utf-8'))
+        return digest.hexdigest()
+
+
+def get_schema_hash(amodel, schemas=None):
+    """
+    A hash of everything in the model that changes the graph layout.
+    """
+    return _GraphShape(amodel, schemas).get_hash()
+
+
+def compute_layout(amodel, schemas=None):
+    """
+    :param schemas: the schemas in the graph, if not the whole model.
+    :rtype: GraphLayout
+    """
+    return _compute_layout(_GraphShape(amodel, schemas))
+
+
+def load_layout(amodel, cache_dir, schemas=None):
+    """
+    Return the layout for the model, reusing one cached in the directory if
+    the graphed schema hasn't changed since, and caching it otherwise.
+
+    :param schemas: the schemas in the graph, if not the whole model.
+    :rtype: GraphLayout
+    """
+    shape = _GraphShape(amodel, schemas)
+    schema_hash = shape.get_hash()
+    cache_file = os.path.join(cache_dir, LAYOUT_CACHE_FILE_NAME)
+    cached = _read_layout_cache(cache_file)
+    for i in range(len(cached)):
+        if cached[i].schema_hash == schema_hash:
+            layout = cached.pop(i)
+            break
+    else:
+        layout = _compute_layout(shape)
+    # The most recently used layout goes first.
+    cached.insert(0, layout)
+    with open(cache_file, 'w') as f:
+        json.dump({
+            'layouts': [cl.to_json() for cl in cached[:LAYOUT_CACHE_SIZE]]
+        }, f)
+    return layout
+
+
+def _read_layout_cache(cache_file):
+    """
+    :rtype: list[GraphLayout]
+    """
+    if not os.path.isfile(cache_file):
+        return []
+    try:
+        with open(cache_file, 'r') as f:
+            data = json.load(f)
+        if 'hash' in data:
+            # A single layout, from before the cache kept several.
+            return [GraphLayout.from_json(data)]
+        return [GraphLayout.from_json(cl) for cl in data['layouts']]
+    except (ValueError, KeyError, IndexError, TypeError):
+        # Corrupt cache; compute it again.
+        return []
+
+
+def _compute_layout(shape):
+    assert isinstance(shape, _GraphShape)
+
+    package_tables = {}
+    package_order = []
+    for name in shape.table_order:
+        package = shape.tables[name][0]
+        if package not in package_tables:
+            package_tables[package] = []
+            package_order.append(package)
+        package_tables[package].append(name)
+
+    package_links = {}
+    table_links = {}
+    for source, target in shape.links:
+        source_package = shape.tables[source][0]
+        target_package = shape.tables[target][0]
+        if source_package == target_package:
+            table_links.setdefault(source_package, []).append(
+                (source, target))
+        else:
+            package_links[(source_package, target_package)] = True
+
+    tables = {}
+    for package in package_order:
+        sizes = {}
+        for name in package_tables[package]:
+            sizes[name] = _text_size(shape.tables[name][1])
+        tables.update(layered_layout(package_tables[package], sizes,
+                                     table_links.get(package, [])))
+
+    sizes = {}
+    for package in package_order:
+        sizes[package] = _text_size([
+            package, str(len(package_tables[package])) + ' tables'])
+    packages = layered_layout(package_order, sizes, list(package_links.keys()))
+
+    return GraphLayout(shape.get_hash(), tables, packages)
+
+
+def _text_size(lines):
+    return (CHAR_WIDTH * (max(len(line) for line in lines) + 2),
+            LINE_HEIGHT * (len(lines) + 1))
+
+
+def layered_layout(nodes, sizes, links):
+    """
+    Place the nodes in layers, so that each link points up from a lower
+    layer, with the layers ordered by the barycenter heuristic.
+
+    :param nodes: list of the node names, in their preferred order.
+    :param sizes: dict of the node name to its (width, height).
+    :param links: list of (source, target) node names.
+    :return: dict of the node name to its NodeBox.
+    :rtype: dict[str, NodeBox]
+    """
+    targets = dict((n, []) for n in nodes)
+    neighbors = dict((n, []) for n in nodes)
+    for source, target in links:
+        if source == target or source not in targets or target not in targets:
+            continue
+        targets[source].append(target)
+        neighbors[source].append(target)
+        neighbors[target].append(source)
+
+    # A node's layer is one below the lowest node it links to.  Links that
+    # close a cycle are ignored.
+    layer_of = {}
+    for root in nodes:
+        if root in layer_of:
+            continue
+        visiting = set([root])
+        stack = [(root, iter(targets[root]))]
+        while len(stack) > 0:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                visiting.discard(node)
+                layer_of[node] = 1 + max(
+                    [layer_of[t] for t in targets[node] if t in layer_of] or
+                    [-1])
+            elif child not in layer_of and child not in visiting:
+                visiting.add(child)
+                stack.append((child, iter(targets[child])))
+
+    layers = []
+    for node in nodes:
+        layer = layer_of[node]
+        while len(layers) <= layer:
+            layers.append([])
+        layers[layer].append(node)
+
+    # Order each layer by the average position of its neighbors, sweeping
+    # down then up through the layers.
+    position = {}
+    for layer in layers:
+        for i, node in enumerate(layer):
+            position[node] = i
+    for order_pass in range(ORDER_PASSES):
+        sweep = layers if order_pass % 2 == 0 else list(reversed(layers))
+        for layer in sweep:
+            def barycenter(node):
+                if len(neighbors[node]) <= 0:
+                    return position[node]
+                return (sum(position[n] for n in neighbors[node]) /
+                        len(neighbors[node]))
+            layer.sort(key=barycenter)
+            for i, node in enumerate(layer):
+                position[node] = i
+
+    widths = [sum(sizes[n][0] for n in layer) +
+              NODE_SPACING * (len(layer) - 1) for layer in layers]
+    full_width = max(widths or [0])
+    ret = {}
+    y = 0
+    for layer, width in zip(layers, widths):
+        x = (full_width - width) // 2
+        for node in layer:
+            ret[node] = NodeBox(x, y, sizes[node][0], sizes[node][1])
+            x += sizes[node][0] + NODE_SPACING
+        y += max(sizes[n][1] for n in layer) + LAYER_SPACING
+    return ret
@@ -1,32 +1,132 @@
 '''
 Converts the model to an XML format that can be used to generate a graph.
+The graph can also be written as JSON.
+
+The graph is streamed to the output as the model is read, rather than built
+up as a document in memory.  If given a layout (see graph_layout), the
+packages and tables carry their position and size, so the UI doesn't need
+to lay out the graph itself.
+
+The graph can be limited to a subset of the schemas, such as the
+neighborhood of one table (see AnalysisModel.get_schema_neighborhood); the
+work done is then proportional to the subset.
 '''
 
 from ..model.schema import (ColumnarSchemaObject, Column, View, Table)
 from .analysis import (AnalysisModel, ColumnSetAnalysis, ColumnAnalysis,
                ProcessedForeignKeyConstraint)
-from xml.dom.minidom import getDOMImplementation
+from .graph_layout import (GraphLayout, NodeBox)
+from xml.sax.saxutils import XMLGenerator
+import io
+import json
+
+
+def generate_graph_xml(amodel, layout=None, schemas=None):
+    """
+    :return: the graph XML, as UTF-8 encoded bytes.
+    """
+    out = io.BytesIO()
+    write_graph_xml(amodel, out, layout, schemas)
+    return out.getvalue()
+
+
+def generate_graph_json(amodel, layout=None, schemas=None):
+    """
+    :return: the graph JSON, as a string.
+    """
+    out = io.StringIO()
+    write_graph_json(amodel, out, layout, schemas)
+    return out.getvalue()
+
 
-def generate_graph_xml(amodel):
+def write_graph_xml(amodel, out, layout=None, schemas=None):
+    """
+    Write the graph XML to the binary stream.
+    """
+    write_graph(amodel, XmlGraphWriter(out), layout, schemas)
+
+
+def write_graph_json(amodel, out, layout=None, schemas=None):
+    """
+    Write the graph JSON to the text stream.
+    """
+    write_graph(amodel, JsonGraphWriter(out), layout, schemas)
+
+
+def write_graph(amodel, writer, layout=None, schemas=None):
+    """
+    Pass the packages, tables, columns, and foreign key edges of the model to
+    the writer, in one pass over the tables.  Every cell gets a unique id; the
+    edges come after all the tables, as they can point to tables that are
+    later in the model.
+
+    :param layout: the precomputed positions of the packages and tables, if
+        any.
+    :param schemas: the schemas to include, if not the whole model.  Foreign
+        keys to schemas outside of these are left out.
+    """
     assert isinstance(amodel, AnalysisModel)
-    data = GraphData()
+    assert isinstance(writer, GraphWriter)
+    assert layout is None or isinstance(layout, GraphLayout)
+    included = None
+    if schemas is None:
+        schemas = amodel.schemas
+    else:
+        included = set(schemas)
 
+    next_cell_id = 0
+    column_ids = {}
     foreign_keys = []
-    for t in amodel.schemas:
+
+    package_ids = {}
+    package_sizes = {}
+    package_order = []
+    for t in schemas:
+        if isinstance(t, ColumnarSchemaObject):
+            package = amodel.get_schema_package(t)
+            if package not in package_sizes:
+                package_sizes[package] = 0
+                package_order.append(package)
+            package_sizes[package] += 1
+
+    writer.start()
+    for package in package_order:
+        package_ids[package] = next_cell_id
+        writer.package(next_cell_id, package, package_sizes[package],
+                       layout is not None and
+                       layout.get_package_box(package) or None)
+        next_cell_id += 1
+
+    for t in schemas:
+        if not isinstance(t, ColumnarSchemaObject):
+            continue
         ant = amodel.get_analysis_for(t)
         assert isinstance(ant, ColumnSetAnalysis)
-        if isinstance(t, ColumnarSchemaObject):
-            t_el = data.mk_table(t)
-            for c in t.columns:
-                assert isinstance(c, Column)
-                anc = ant.get_column_analysis(c)
-                data.mk_column(t_el, t, anc)
-                assert isinstance(anc, ColumnAnalysis)
-                if anc.foreign_key is not None:
-                    foreign_keys.append((t, c, ant, anc))
-
-    for fk in foreign_keys:
-        (t, c, ant, anc) = fk
+        if isinstance(t, View):
+            kind = 'view'
+        elif isinstance(t, Table):
+            kind = 'table'
+        else:
+            raise Exception("unknown type " + str(type(t)))
+        writer.start_table(next_cell_id, str(t.name), kind,
+                           package_ids[amodel.get_schema_package(t)],
+                           layout is not None and
+                           layout.get_table_box(t.full_name) or None)
+        next_cell_id += 1
+        for c in t.columns:
+            assert isinstance(c, Column)
+            anc = ant.get_column_analysis(c)
+            assert isinstance(anc, ColumnAnalysis)
+            column_ids[anc] = next_cell_id
+            writer.column(next_cell_id, str(anc.sql_name),
+                          str(anc.schema.value_type), anc.is_primary_key,
+                          anc.schema.auto_increment)
+            next_cell_id += 1
+            if anc.foreign_key is not None:
+                foreign_keys.append((t, c, anc))
+        writer.end_table()
+
+    for (t, c, anc) in foreign_keys:
         fkc = anc.foreign_key
         assert isinstance(fkc, ProcessedForeignKeyConstraint)
         foreign_table = amodel.get_schema_named(fkc.fk_table_name)
@@ -34,6 +134,8 @@ def generate_graph_xml(amodel):
             print("No foreign table " + fkc.fk_table_name + ", referenced in " +
                   t.name + "." + c.name)
             continue
+        if included is not None and foreign_table not in included:
+            continue
         assert isinstance(foreign_table, ColumnarSchemaObject)
         fta = amodel.get_analysis_for(foreign_table)
         assert isinstance(fta, ColumnSetAnalysis)
@@ -44,83 +146,186 @@ def generate_graph_xml(amodel):
                   t.name + "." + c.name)
             continue
         assert isinstance(foreign_column, ColumnAnalysis)
-        data.mk_column_link(amodel.get_analysis_for(t), anc, fta, foreign_column)
+        if anc not in column_ids or foreign_column not in column_ids:
+            print("No such foreign key: from " + anc.sql_name + " to " +
+                  foreign_column.sql_name)
+            continue
+        writer.edge(next_cell_id, column_ids[anc], column_ids[foreign_column])
+        next_cell_id += 1
+    writer.end()
+
+
+class GraphWriter(object):
+    """
+    Receives the graph cells in order, and writes them out.
+    """
+    def start(self):
+        raise NotImplementedError()
+
+    def package(self, cid, name, table_count, box=None):
+        """
+        :type box: NodeBox
+        """
+        raise NotImplementedError()
+
+    def start_table(self, cid, name, kind, package_id=None, box=None):
+        """
+        :param package_id: the cell id of the table's package.
+        :type box: NodeBox
+        """
+        raise NotImplementedError()
+
+    def column(self, cid, name, value_type, is_primary_key, auto_increment):
+        raise NotImplementedError()
+
+    def end_table(self):
+        raise NotImplementedError()
+
+    def edge(self, cid, source_id, target_id, name=None):
+        raise NotImplementedError()
+
+    def end(self):
+        raise NotImplementedError()
+
+
+class XmlGraphWriter(GraphWriter):
+    def __init__(self, out):
+        """
+        :param out: binary stream
+        """
+        GraphWriter.__init__(self)
+        self.__gen = XMLGenerator(out, 'UTF-8', short_empty_elements=True)
+
+    def start(self):
+        self.__gen.startDocument()
+        self.__gen.startElement('schemagraph', {})
 
-    return data.doc.toxml('UTF-8')
+    def package(self, cid, name, table_count, box=None):
+        attrs = {'id': str(cid), 'name': name, 'tables': str(table_count)}
+        _add_box_attrs(attrs, box)
+        self.__gen.startElement('package', attrs)
+        self.__gen.endElement('package')
 
+    def start_table(self, cid, name, kind, package_id=None, box=None):
+        attrs = {'id': str(cid), 'name': name, 'kind': kind}
+        if package_id is not None:
+            attrs['package'] = str(package_id)
+        _add_box_attrs(attrs, box)
+        self.__gen.startElement('table', attrs)
 
-class GraphData(object):
-    def __init__(self):
-        object.__init__(self)
-        self.doc = getDOMImplementation().createDocument(
-             None, "schemagraph", None)
-        self.root = self.doc.documentElement
-        self.tables = {}
-        self.__columns = {}
+    def column(self, cid, name, value_type, is_primary_key, auto_increment):
+        self.__gen.startElement('column', {
+            'id': str(cid), 'name': name, 'type': value_type,
+            'primaryKey': is_primary_key and '1' or '0',
+            'autoIncrement': auto_increment and '1' or '0'})
+        self.__gen.endElement('column')
 
-        self._next_cell_id = 0
+    def end_table(self):
+        self.__gen.endElement('table')
 
-    def _mk_basic(self, name, parent = None):
-        if parent is None:
-            parent = self.root
-        el = self.doc.createElement(name)
-        parent.appendChild(el)
-        cid = self._next_cell_id
-        self._next_cell_id += 1
-        el.setAttribute('id', str(cid))
-        return (cid, el)
+    def edge(self, cid, source_id, target_id, name=None):
+        attrs = {'id': str(cid), 'source': str(source_id),
+                 'target': str(target_id)}
+        if name is not None:
+            attrs['name'] = name
+        self.__gen.startElement('edge', attrs)
+        self.__gen.endElement('edge')
 
-    def mk_table(self, table_obj):
+    def end(self):
+        self.__gen.endElement('schemagraph')
+        self.__gen.endDocument()
+
+
+def _add_box_attrs(attrs, box):
+    if box is not None:
+        assert isinstance(box, NodeBox)
+        attrs['x'] = str(box.x)
+        attrs['y'] = str(box.y)
+        attrs['width'] = str(box.width)
+        attrs['height'] = str(box.height)
+
+
+class JsonGraphWriter(GraphWriter):
+    """
+    Writes the graph as {"packages": [...], "tables": [...], "edges": [...]},
+    with the columns inside their table, one cell at a time.
+    """
+    def __init__(self, out):
         """
-        Make just the table cell, not the __columns
+        :param out: text stream
         """
-        assert isinstance(table_obj, ColumnarSchemaObject)
+        GraphWriter.__init__(self)
+        self.__out = out
+        self.__first_package = True
+        self.__first_table = True
+        self.__first_column = True
+        self.__first_edge = True
 
-        (cid, el) = self._mk_basic('table')
-        self.tables[table_obj] = cid
+    def start(self):
+        self.__out.write('{"packages": [')
 
-        el.setAttribute('name', str(table_obj.name))
-        if isinstance(table_obj, View):
-            el.setAttribute('kind', 'view')
-        elif isinstance(table_obj, Table):
-            el.setAttribute('kind', 'table')
+    def package(self, cid, name, table_count, box=None):
+        if not self.__first_package:
+            self.__out.write(',')
+        self.__first_package = False
+        package = {'id': cid, 'name': name, 'tables': table_count}
+        _add_box_values(package, box)
+        self.__out.write('\n' + json.dumps(package))
+
+    def start_table(self, cid, name, kind, package_id=None, box=None):
+        if self.__first_table:
+            self.__out.write('\n], "tables": [')
         else:
-            raise Exception("unknown type " + str(type(table_obj)))
-
-        return el
-
-    def mk_column(self, parent_el, table_obj, column_obj):
-        assert isinstance(table_obj, ColumnarSchemaObject)
-        assert isinstance(column_obj, ColumnAnalysis)
-
-        (cid, el) = self._mk_basic('column', parent_el)
-        self.__columns[column_obj] = cid
-
-        el.setAttribute('name', str(column_obj.sql_name))
-        el.setAttribute('type', str(column_obj.schema.value_type))
-        el.setAttribute('primaryKey',
-              column_obj.is_primary_key and '1' or '0')
-        el.setAttribute('autoIncrement',
-              column_obj.schema.auto_increment and '1' or '0')
-        return el
-
-    def mk_column_link(self, src_table, src_col, target_table, target_col, ltype = None):
-        assert isinstance(src_table, ColumnSetAnalysis)
-        assert isinstance(src_col, ColumnAnalysis)
-        assert isinstance(target_table, ColumnSetAnalysis)
-        assert isinstance(target_col, ColumnAnalysis)
-
-        if src_col not in self.__columns or target_col not in self.__columns:
-            print("No such foreign key: from " + src_col.sql_name + " to " +
-                  target_col.sql_name)
-            return
-
-        src_id = self.__columns[src_col]
-        target_id = self.__columns[target_col]
-
-        el = self._mk_basic('edge')[1]
-        el.setAttribute('source', str(src_id))
-        el.setAttribute('target', str(target_id))
-        if ltype is not None:
-            el.setAttribute('name', ltype)
-        return el
+            self.__out.write(',')
+        self.__first_table = False
+        self.__first_column = True
+        table = {'id': cid, 'name': name, 'kind': kind}
+        if package_id is not None:
+            table['package'] = package_id
+        _add_box_values(table, box)
+        # Leave the object open for the columns.
+        self.__out.write('\n' + json.dumps(table)[:-1] + ', "columns": [')
+
+    def column(self, cid, name, value_type, is_primary_key, auto_increment):
+        if not self.__first_column:
+            self.__out.write(',')
+        self.__first_column = False
+        self.__out.write(json.dumps({
+            'id': cid, 'name': name, 'type': value_type,
+            'primaryKey': bool(is_primary_key),
+            'autoIncrement': bool(auto_increment)}))
+
+    def end_table(self):
+        self.__out.write(']}')
+
+    def edge(self, cid, source_id, target_id, name=None):
+        if self.__first_edge:
+            self.__end_tables()
+            self.__out.write('\n], "edges": [')
+        else:
+            self.__out.write(',')
+        self.__first_edge = False
+        edge = {'id': cid, 'source': source_id, 'target': target_id}
+        if name is not None:
+            edge['name'] = name
+        self.__out.write('\n' + json.dumps(edge))
+
+    def end(self):
+        if self.__first_edge:
+            self.__end_tables()
+            self.__out.write('\n], "edges": [')
+        self.__out.write('\n]}\n')
+
+    def __end_tables(self):
+        if self.__first_table:
+            self.__out.write('\n], "tables": [')
+            self.__first_table = False
+
+
+def _add_box_values(values, box):
+    if box is not None:
+        assert isinstance(box, NodeBox)
+        values['x'] = box.x
+        values['y'] = box.y
+        values['width'] = box.width
+        values['height'] = box.height
@@ -0,0 +1,323 @@
+"""
+Checks that the access paths used by the generated data access code are
+backed by an index, so that a generated read does not turn into a full table
+scan once the table grows.
+
+Only tables are checked; views do not have their own indexes.
+"""
+
+import re
+
+from .analysis import (AnalysisModel, ColumnSetAnalysis, ColumnAnalysis,
+                       ProcessedForeignKeyConstraint)
+from ..model.schema import (Table, WhereClause, ExtendedSql)
+from ..model.base import (SqlSet, SqlString)
+from ..model.indexes import (get_index_constraints)
+
+
+class IndexCoverage(object):
+    """
+    How well an index backs an access path.  Should be considered an enum.
+    """
+    def __init__(self, name: str, is_indexed: bool):
+        object.__init__(self)
+        self.__name = name
+        self.__is_indexed = is_indexed
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def is_indexed(self) -> bool:
+        return self.__is_indexed
+
+    def __str__(self):
+        return self.__name
+
+
+# An index leads with all the predicate columns.
+FULL_COVERAGE = IndexCoverage('indexed', True)
+# An index leads with some of the predicate columns, so the server scans a
+# range of the index and filters the rest.
+PARTIAL_COVERAGE = IndexCoverage('partially indexed', True)
+# No index leads with any of the predicate columns.
+NO_COVERAGE = IndexCoverage('full scan', False)
+
+# The kinds of access paths.
+READ_BY_SOURCE = 'readBy'
+JOIN_SOURCE = 'join'
+WHERE_CLAUSE_SOURCE = 'where'
+EXTENDED_SQL_SOURCE = 'extended'
+
+
+class AccessPath(object):
+    """
+    A single way the generated code looks up rows in a table, and the index
+    that backs it.
+    """
+    def __init__(self, table_name: str, source: str, name: str,
+                 column_names: list or tuple, coverage: IndexCoverage,
+                 index_column_names: list or tuple or None,
+                 is_heuristic: bool):
+        """
+        :param source: one of the *_SOURCE values
+        :param column_names: the columns used by the path's predicate
+        :param index_column_names: the columns of the best matching index,
+            or None if no index matches.
+        :param is_heuristic: True if the predicate columns were found by
+            scanning user provided sql, rather than from the schema.
+        :type column_names: list[str] or tuple[str]
+        :type index_column_names: list[str] or tuple[str] or None
+        """
+        object.__init__(self)
+        assert isinstance(coverage, IndexCoverage)
+        self.__table_name = table_name
+        self.__source = source
+        self.__name = name
+        self.__column_names = tuple(column_names)
+        self.__coverage = coverage
+        self.__index_column_names = (
+            None if index_column_names is None
+            else tuple(index_column_names))
+        self.__is_heuristic = is_heuristic
+
+    @property
+    def table_name(self) -> str:
+        return self.__table_name
+
+    @property
+    def source(self) -> str:
+        return self.__source
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def column_names(self) -> tuple:
+        """
+        :rtype: tuple[str]
+        """
+        return self.__column_names
+
+    @property
+    def coverage(self) -> IndexCoverage:
+        return self.__coverage
+
+    @property
+    def index_column_names(self) -> tuple or None:
+        """
+        :rtype: tuple[str] or None
+        """
+        return self.__index_column_names
+
+    @property
+    def is_heuristic(self) -> bool:
+        return self.__is_heuristic
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies the path across runs, for comparing against a baseline.
+        """
+        return self.__table_name + ':' + self.__source + ':' + self.__name
+
+    def __str__(self):
+        ret = (self.key + ' (' + ', '.join(self.__column_names) + ') ' +
+               self.__coverage.name)
+        if self.__index_column_names is not None:
+            ret += ' by (' + ', '.join(self.__index_column_names) + ')'
+        if self.__is_heuristic:
+            ret += ' [from sql]'
+        return ret
+
+
+class IndexCoverageReport(object):
+    """
+    Finds every access path of the generated code for the tables in the
+    model: the `readBy` predicates, the joins pulled in by foreign keys, and
+    the columns compared in the where clauses and extended sql.
+    """
+    def __init__(self, analysis_model: AnalysisModel,
+                 platforms: list or tuple):
+        """
+        :type platforms: list[str] or tuple[str]
+        """
+        object.__init__(self)
+        assert isinstance(analysis_model, AnalysisModel)
+        self.__paths = []
+        for schema in analysis_model.schemas:
+            if not isinstance(schema, Table):
+                continue
+            analysis = analysis_model.get_analysis_for(schema)
+            assert isinstance(analysis, ColumnSetAnalysis)
+            self.__paths.extend(_find_table_paths(
+                analysis_model, analysis, platforms))
+
+    @property
+    def paths(self) -> tuple:
+        """
+        :rtype: tuple[AccessPath]
+        """
+        return tuple(self.__paths)
+
+    @property
+    def unindexed_paths(self) -> tuple:
+        """
+        :rtype: tuple[AccessPath]
+        """
+        return tuple(p for p in self.__paths if not p.coverage.is_indexed)
+
+    def get_new_unindexed_paths(self, baseline_keys: set or list) -> tuple:
+        """
+        The unindexed paths that are not in the baseline of accepted paths.
+
+        :type baseline_keys: set[str] or list[str]
+        :rtype: tuple[AccessPath]
+        """
+        return tuple(p for p in self.unindexed_paths
+                     if p.key not in baseline_keys)
+
+    def to_lines(self) -> list:
+        """
+        :rtype: list[str]
+        """
+        ret = []
+        for path in self.__paths:
+            flag = '  ' if path.coverage.is_indexed else '!!'
+            ret.append(flag + ' ' + str(path))
+        ret.append('')
+        ret.append(str(len(self.unindexed_paths)) + ' of ' +
+                   str(len(self.__paths)) + ' access path(s) are full scans')
+        return ret
+
+
+def get_table_index_columns(table: Table) -> list:
+    """
+    The column names of each index on the table, in index order.
+
+    :rtype: list[tuple[str]]
+    """
+    return [column_names for cst, column_names in get_index_constraints(table)
+            if len(column_names) > 0]
+
+
+def find_index_coverage(indexes: list, column_names: list or tuple) -> tuple:
+    """
+    Find the index whose leading columns best match the predicate columns.
+    Equality predicates can use the index columns in any order, so only the
+    set of leading columns matters.
+
+    :type indexes: list[tuple[str]]
+    :type column_names: list[str] or tuple[str]
+    :return: (coverage, best index column names or None)
+    :rtype: (IndexCoverage, tuple[str] or None)
+    """
+    wanted = set(column_names)
+    best = None
+    best_count = 0
+    for index in indexes:
+        count = 0
+        for name in index:
+            if name not in wanted:
+                break
+            count += 1
+        if count >= len(wanted):
+            return FULL_COVERAGE, tuple(index)
+        if count > best_count:
+            best = tuple(index)
+            best_count = count
+    if best is None:
+        return NO_COVERAGE, None
+    return PARTIAL_COVERAGE, best
+
+
+def find_predicate_columns(sql: str, column_names: list or tuple) -> list:
+    """
+    Scan sql text for the given columns being compared against a value.  This
+    is a heuristic; it does not parse the sql.
+
+    :type column_names: list[str] or tuple[str]
+    :rtype: list[str]
+    """
+    ret = []
+    for name in column_names:
+        col = r'(?<![\w.{])(?:\w+\.)?' + re.escape(name) + r'\b(?!\})'
+        if (re.search(col + r'\s*(?:=|<|>|!=|\bIN\b|\bLIKE\b|\bBETWEEN\b|'
+                      r'\bIS\b)', sql, re.IGNORECASE) or
+                re.search(r'(?:=|<|>)\s*' + col, sql)):
+            ret.append(name)
+    return ret
+
+
+def _find_table_paths(analysis_model: AnalysisModel,
+                      analysis: ColumnSetAnalysis,
+                      platforms: list or tuple) -> list:
+    table = analysis.schema
+    assert isinstance(table, Table)
+    table_name = analysis.sql_name
+    indexes = get_table_index_columns(table)
+    column_names = [col.name for col in table.columns]
+    ret = []
+
+    for read_by_columns in analysis.get_selectable_column_lists():
+        names = [col.name for col in read_by_columns]
+        coverage, index = find_index_coverage(indexes, names)
+        ret.append(AccessPath(table_name, READ_BY_SOURCE, '_x_'.join(names),
+                              names, coverage, index, False))
+
+    for cola in analysis.columns_analysis:
+        assert isinstance(cola, ColumnAnalysis)
+        fkey = cola.foreign_key
+        if fkey is None:
+            continue
+        assert isinstance(fkey, ProcessedForeignKeyConstraint)
+        if not fkey.join:
+            continue
+        remote = analysis_model.get_schema_named(fkey.fk_table_name)
+        if not isinstance(remote, Table):
+            continue
+        coverage, index = find_index_coverage(
+            get_table_index_columns(remote), [fkey.fk_column_name])
+        ret.append(AccessPath(fkey.fk_table_name, JOIN_SOURCE,
+                              table_name + '.' + fkey.column_name,
+                              [fkey.fk_column_name], coverage, index, False))
+
+    for whc in table.where_clauses:
+        assert isinstance(whc, WhereClause)
+        path = _find_sql_path(table_name, WHERE_CLAUSE_SOURCE, whc.name,
+                              whc.sql, platforms, indexes, column_names)
+        if path is not None:
+            ret.append(path)
+
+    for ext in table.extended_sql:
+        assert isinstance(ext, ExtendedSql)
+        path = _find_sql_path(table_name, EXTENDED_SQL_SOURCE, ext.name,
+                              ext.sql, platforms, indexes, column_names)
+        if path is not None:
+            ret.append(path)
+
+    return ret
+
+
+def _find_sql_path(table_name: str, source: str, name: str, sql_set: SqlSet,
+                   platforms: list or tuple, indexes: list,
+                   column_names: list) -> AccessPath or None:
+    sql_str = sql_set.get_for_platform(platforms)
+    if sql_str is None:
+        return None
+    assert isinstance(sql_str, SqlString)
+    sql = sql_str.sql
+    if source == EXTENDED_SQL_SOURCE:
+        # Only the filter of the statement matters, not the selected or
+        # updated columns.
+        pos = sql.upper().rfind('WHERE')
+        if pos < 0:
+            return None
+        sql = sql[pos + 5:]
+    names = find_predicate_columns(sql, column_names)
+    if len(names) <= 0:
+        return None
+    coverage, index = find_index_coverage(indexes, names)
+    return AccessPath(table_name, source, name, names, coverage, index, True)
@@ -2,13 +2,26 @@
 Converter for MySql
 """
 
-from .converter import (PrepSqlConverter)
+from .converter import (PrepSqlConverter, PAGE_COUNT_WINDOW,
+                        PAGE_COUNT_HAS_MORE)
 from .php import (escape_php_string)
 from ..model.base import (SqlSet, SqlArgument)
 
 class MySqlPrepSqlConverter(PrepSqlConverter):
-    def __init__(self, language, platforms):
+    def __init__(self, language, platforms, window_functions=False):
+        """
+        :param window_functions: True if the server supports window
+            functions (MySql 8.0 and later), so paged reads can count the
+            total rows in the same query.
+        """
         PrepSqlConverter.__init__(self, language, platforms)
+        assert isinstance(window_functions, bool)
+        self.__window_functions = window_functions
+
+    def get_page_count_style(self):
+        if self.__window_functions:
+            return PAGE_COUNT_WINDOW
+        return PAGE_COUNT_HAS_MORE
 
     def _generate_code_for_collection_arguments(self, output_variable, sql_set,
             sql_bits):
@@ -41,9 +54,9 @@ class MySqlPrepSqlConverter(PrepSqlConverter):
                         '        foreach ($' + bit.name + ' as $tmpLoop) {',
                         '            $tmpLoopArray[] = "' + escape_php_string(
                             self._generate_sql_parameter(bit.name)) +
-                            '".str($tmpLoopIndex);',
+                            '".strval($tmpLoopIndex);',
                         '            $data["' + escape_php_string(bit.name) +
-                            '".str($tmpLoopIndex)] = $tmpLoop;',
+                            '".strval($tmpLoopIndex)] = $tmpLoop;',
                         '            $tmpLoopIndex += 1;',
                         '        }',
                         '        ' + output_variable +
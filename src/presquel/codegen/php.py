@@ -9,14 +9,31 @@ Tools to help in the generation of PHP source files.
 
 
 from .filegen import (LanguageGenerator, GenConfig)
-from .converter import (PrepSqlConverter)
+from .converter import (PrepSqlConverter, PAGE_COUNT_WINDOW,
+                        PAGE_COUNT_HAS_MORE)
 from .analysis import (ColumnAnalysis)
 from .sql import (ReadQueryData, CreateQuery, UpdateQuery, InputValue)
-from ..model.schema import (WhereClause, ExtendedSql, SqlConstraint, Column)
-from ..model.base import (SqlArgument, SqlSet, LanguageSet)
+from ..model.schema import (WhereClause, ExtendedSql, SqlConstraint, Column,
+                            Table, TableCache)
+from ..model.base import (SqlArgument, SqlSet, SqlString, LanguageSet)
 import time
 
 
+# The default maximum number of dynamically built statements cached by each
+# generated class.
+DEFAULT_STATEMENT_CACHE_SIZE = 100
+
+# The default size limit of each multi-row insert statement, which matches the
+# smallest default max_allowed_packet of the supported MySql servers.
+DEFAULT_MAX_PACKET_BYTES = 4 * 1024 * 1024
+
+# The column that holds the total row count in paged reads.
+PAGE_TOTAL_COLUMN = '__page_total'
+
+# The file with the cache backends used by the cached table classes.
+DBO_CACHE_FILE_NAME = 'DboCache.php'
+
+
 def escape_php_string(php_str):
     """
 
@@ -55,6 +72,95 @@ def generate_php_name(schema_name):
     return ret
 
 
+def generate_dbo_cache(namespace):
+    """
+    Generate the source for the DBO_CACHE_FILE_NAME file, which holds the
+    cache interface used by the cached table classes, and its APCu and
+    in-process array implementations.
+
+    :param namespace: the PHP namespace of the generated classes.
+    :return: a list of strings, one per line for the source
+    """
+    assert isinstance(namespace, str)
+    return [
+        '<?php',
+        '',
+        'namespace ' + namespace + ';',
+        '',
+        '/**',
+        ' * Storage for the rows cached by the generated DBO classes.',
+        ' *',
+        ' * Generated on ' + time.asctime(time.gmtime(time.time())),
+        ' */',
+        'interface DboCache {',
+        '    /**',
+        '     * Returns the value stored for the key.  $found is set to false',
+        '     * if there is no value, or it expired.',
+        '     */',
+        '    public function get($key, &$found);',
+        '',
+        '    /**',
+        '     * Stores the value for $ttl seconds, or until it is deleted if',
+        '     * $ttl is 0.',
+        '     */',
+        '    public function set($key, $value, $ttl);',
+        '',
+        '    public function delete($key);',
+        '}',
+        '',
+        '',
+        '/**',
+        ' * Keeps the values in APCu, so they are shared between requests.',
+        ' */',
+        'class ApcuDboCache implements DboCache {',
+        '    public function get($key, &$found) {',
+        '        $value = apcu_fetch($key, $found);',
+        '        return $found ? $value : null;',
+        '    }',
+        '',
+        '    public function set($key, $value, $ttl) {',
+        '        apcu_store($key, $value, $ttl);',
+        '    }',
+        '',
+        '    public function delete($key) {',
+        '        apcu_delete($key);',
+        '    }',
+        '}',
+        '',
+        '',
+        '/**',
+        ' * Keeps the values in this process only.',
+        ' */',
+        'class ArrayDboCache implements DboCache {',
+        '    private $values = array();',
+        '',
+        '    public function get($key, &$found) {',
+        '        $found = false;',
+        '        if (! isset($this->values[$key])) {',
+        '            return null;',
+        '        }',
+        '        list($value, $expires) = $this->values[$key];',
+        '        if ($expires > 0 && $expires < time()) {',
+        '            unset($this->values[$key]);',
+        '            return null;',
+        '        }',
+        '        $found = true;',
+        '        return $value;',
+        '    }',
+        '',
+        '    public function set($key, $value, $ttl) {',
+        '        $this->values[$key] = array($value, ' +
+            '$ttl > 0 ? time() + $ttl : 0);',
+        '    }',
+        '',
+        '    public function delete($key) {',
+        '        unset($this->values[$key]);',
+        '    }',
+        '}',
+        '',
+    ]
+
+
 class PhpGenConfig(GenConfig):
     """
     A PHP specific configuration.  It will automatically setup many computed
@@ -62,23 +168,69 @@ class PhpGenConfig(GenConfig):
     """
 
     def __init__(self, analysis_obj, output_dir=None, platforms=None,
-                 prep_sql_converter=None, namespace=None, parent_class=None):
+                 prep_sql_converter=None, namespace=None, parent_class=None,
+                 statement_cache=True,
+                 statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE,
+                 max_packet_bytes=DEFAULT_MAX_PACKET_BYTES):
         """
         Creates the new PHP instance of the config.
+
+        :param statement_cache: True if the generated class should reuse its
+            prepared statements for each connection.
+        :param statement_cache_size: the most statements with dynamically
+            built sql to keep per class; the least recently used ones are
+            dropped first.
+        :param max_packet_bytes: the default size limit of the statements
+            that insert many rows at once.
         """
         GenConfig.__init__(self, analysis_obj, output_dir, platforms,
                            prep_sql_converter)
 
         self.namespace = namespace
         self.parent_class = parent_class
+        self.statement_cache = statement_cache
+        self.statement_cache_size = statement_cache_size
+        self.max_packet_bytes = max_packet_bytes
         self.sql_name = analysis_obj.sql_name
         self.class_name = generate_php_name(self.sql_name)
 
+    def get_table_cache(self):
+        """
+        The caching for the table's unique key lookups, or None if the
+        schema doesn't ask for it, or it can't be done.  The cached rows
+        are keyed by primary key, so the table needs one; lookups that also
+        take read arguments aren't cached.
+
+        :rtype: TableCache
+        """
+        schema = self.analysis_obj.schema
+        if not isinstance(schema, Table) or schema.cache is None:
+            return None
+        key_names = [c.sql_name for c in self.analysis_obj.primary_key_columns]
+        if len(key_names) <= 0:
+            return None
+        # The rows are read through the primary key readOneBy method.
+        if not any(
+                [self.analysis_obj.get_column_analysis(c).sql_name
+                 for c in columns] == key_names
+                for columns in
+                self.analysis_obj.get_selectable_column_lists()):
+            return None
+        read_data = ReadQueryData(self.analysis_obj, self.platforms, 'php')
+        if len(read_data.arguments) > 0:
+            return None
+        return schema.cache
+
     def validate(self):
         GenConfig.validate(self)
         assert isinstance(self.namespace, str)
         assert isinstance(self.parent_class, str)
         assert isinstance(self.prep_sql_converter, PrepSqlConverter)
+        assert isinstance(self.statement_cache, bool)
+        assert (isinstance(self.statement_cache_size, int) and
+                self.statement_cache_size > 0)
+        assert (isinstance(self.max_packet_bytes, int) and
+                self.max_packet_bytes > 0)
 
 
 class PhpLanguageGenerator(LanguageGenerator):
@@ -110,6 +262,11 @@ class PhpLanguageGenerator(LanguageGenerator):
             uses,
             '',
         ]
+        if config.get_table_cache() is not None:
+            ret.extend([
+                'require_once __DIR__ . \'/' + DBO_CACHE_FILE_NAME + '\';',
+                '',
+            ])
 
         ret.extend(self.generate_where_clause_classes(config))
 
@@ -200,11 +357,11 @@ class PhpLanguageGenerator(LanguageGenerator):
             default_order_by = config.analysis_obj.primary_key_columns[0]
             assert isinstance(default_order_by, ColumnAnalysis)
             always_order_by_clause = ' ORDER BY '
-        escaped_sql = escape_php_string(read_data.sql)
+        select_from = PhpLanguageGenerator._generate_select_from(config)
         arg_names = []
         arg_arg = ''
         if len(read_data.arguments) > 0:
-            arg_names = [('$' + a) for a in read_data.arguments]
+            arg_names = [('$' + a.name) for a in read_data.arguments]
             arg_arg = ', ' + ', '.join(arg_names)
 
         where_arg = ''
@@ -226,7 +383,7 @@ class PhpLanguageGenerator(LanguageGenerator):
         ])
         ret.extend(PhpLanguageGenerator._generate_where_clause(
             config.analysis_obj, False))
-        ret.extend(self._generate_sql())
+        ret.extend(self._generate_sql(is_static=(len(where_arg) <= 0)))
         ret.extend([
             '        return $this->createReturn($stmt, function ($s) {',
             '            return intval($s->fetchColumn());',
@@ -240,23 +397,27 @@ class PhpLanguageGenerator(LanguageGenerator):
             '     * Reads the row data without filters.',
             '     */',
             '    public function readAll($db' + arg_arg + where_arg +
-            ', $order = false, $start = -1, $end = -1) {'
+            ', $order = false, $start = -1, $end = -1, $columns = null) {'
         ])
         ret.extend(self._generate_invoke_init(config, 'readAll'))
-        ret.append('        $sql = \'' + escaped_sql + '\';')
+        # The readAll and iterateAll share the same sql.
+        read_all_sql = ['        $sql = ' + select_from + ' . \'' +
+                        escape_php_string(read_data.where_clause) + '\';']
         if len(arg_names) > 0:
-            ret.append('        $data = array(')
+            read_all_sql.append('        $data = array(')
             # Notice how this skips the use of arg_names, and recreates those
             # values
             for a in read_data.arguments:
-                ret.append('            \'' + a + '\' => $' + a + ',')
-            ret.append('        );')
+                read_all_sql.append('            \'' + a.name + '\' => $' +
+                                    a.name + ',')
+            read_all_sql.append('        );')
         else:
-            ret.append('        $data = array();')
+            read_all_sql.append('        $data = array();')
         if len(config.analysis_obj.schema.where_clauses) > 0:
-            ret.extend(PhpLanguageGenerator._generate_where_clause(
+            read_all_sql.extend(PhpLanguageGenerator._generate_where_clause(
                 config.analysis_obj, False))
-        ret.append('        $sql .= \'' + always_order_by_clause + '\';')
+        read_all_sql.append('        $sql .= \'' + always_order_by_clause +
+                            '\';')
         order_code = []
         if default_order_by is not None:
             order_code.extend([
@@ -272,7 +433,8 @@ class PhpLanguageGenerator(LanguageGenerator):
                 '            $sql .= " ORDER BY " . $order;',
                 '        }'
             ])
-        ret.extend(order_code)
+        read_all_sql.extend(order_code)
+        ret.extend(read_all_sql)
         ret.extend([
             '        if ($start >= 0 && $end > 0) {',
             '            $sql .= \' LIMIT \'.$start.\',\'.$end;',
@@ -283,22 +445,30 @@ class PhpLanguageGenerator(LanguageGenerator):
             '        return $this->createReturn($stmt, function ($s) {',
             '            $rows = $s->fetchAll();'
         ])
-        replace_cols = []
-        for col in config.analysis_obj.columns_analysis:
-            assert isinstance(col, ColumnAnalysis)
-            extract = PhpLanguageGenerator._convert_to_php_type(col.schema)
-            if extract is not None:
-                replace_cols.append('                ' + extract)
-        if len(replace_cols) > 0:
-            ret.append('            foreach ($rows as &$row) {')
-            ret.extend(replace_cols)
-            ret.append('            }')
+        ret.extend(PhpLanguageGenerator._generate_row_conversion(
+            config.analysis_obj))
         ret.extend([
             '            return $rows;',
             '        });',
             '    }', '',
         ])
 
+        ret.extend([
+            '',
+            '    /**',
+            '     * Iterates over the row data without filters, one row at a',
+            '     * time, rather than reading all the rows into memory.',
+            '     */',
+            '    public function iterateAll($db' + arg_arg + where_arg +
+            ', $order = false, $unbuffered = false, $columns = null) {'
+        ])
+        ret.extend(self._generate_invoke_init(config, 'iterateAll'))
+        ret.extend(read_all_sql)
+        ret.extend(PhpLanguageGenerator._generate_iterate_return(config))
+
+        ret.extend(self._generate_read_page(config, read_data, read_all_sql,
+                                            arg_arg + where_arg))
+
         # NOTE: no where clause object support for the "any"
         ret.extend([
             '',
@@ -340,9 +510,9 @@ class PhpLanguageGenerator(LanguageGenerator):
                 get_selectable_column_lists():
             assert len(read_by_columns) > 0
 
-            # TODO if the read-by is a primary key or unique key, then the
-            # order MUST NOT be part of the query, and even the start/end should
-            # be removed.
+            # If the read-by is a primary key or unique key, then the
+            # readOneBy method below reads the row without the order or the
+            # start/end.
 
             # each column in the column lists comes from the current table, and
             # never from a joined-to table.  So, we don't need to worry about
@@ -354,7 +524,7 @@ class PhpLanguageGenerator(LanguageGenerator):
 
             title = '_x_'.join(read_by_names)
             arg_list = list(read_by_names)
-            arg_list.extend(read_data.arguments)
+            arg_list.extend(a.name for a in read_data.arguments)
             args = '$' + (', $'.join(arg_list))
             where_clause = read_data.where_clause
             if read_data.has_where_clauses:
@@ -373,9 +543,8 @@ class PhpLanguageGenerator(LanguageGenerator):
             setup_code.append('        );')
 
             clause_sql = escape_php_string(read_data.from_clause + where_clause)
-            select = escape_php_string('SELECT ' +
-                         read_data.select_columns_clause +
-                         read_data.from_clause + where_clause)
+            select = (select_from + ' . \'' +
+                      escape_php_string(where_clause) + '\'')
 
             ret.extend([
                 '',
@@ -387,22 +556,26 @@ class PhpLanguageGenerator(LanguageGenerator):
             ret.extend(setup_code)
             ret.extend(PhpLanguageGenerator._generate_where_clause(
                 config.analysis_obj, True))
-            ret.extend(self._generate_sql())
+            ret.extend(self._generate_sql(is_static=(len(where_arg) <= 0)))
             ret.extend([
                 '        return $this->createReturn($stmt, function ($s) {',
                 '            return intval($s->fetchColumn());',
                 '        });',
                 '    }', '' '',
                 '    public function readBy_' + title + '($db, ' + args +
-                where_arg + ', $order = false, $start = -1, $end = -1) {'
+                where_arg + ', $order = false, $start = -1, $end = -1, ' +
+                '$columns = null) {'
             ])
             ret.extend(self._generate_invoke_init(config, 'readBy_' + title))
-            ret.append('        $sql = \'' + select + '\';')
-            ret.extend(setup_code)
-            ret.extend(PhpLanguageGenerator._generate_where_clause(
+            # The readBy and iterateBy share the same sql.
+            read_by_sql = ['        $sql = ' + select + ';']
+            read_by_sql.extend(setup_code)
+            read_by_sql.extend(PhpLanguageGenerator._generate_where_clause(
                 config.analysis_obj, True))
-            ret.append('        $sql .= \'' + always_order_by_clause + '\';')
-            ret.extend(order_code)
+            read_by_sql.append('        $sql .= \'' + always_order_by_clause +
+                               '\';')
+            read_by_sql.extend(order_code)
+            ret.extend(read_by_sql)
             ret.extend([
                 '        if ($start >= 0 && $end > 0) {',
                 '            $sql .= \' LIMIT \'.$start.\',\'.$end;',
@@ -413,21 +586,360 @@ class PhpLanguageGenerator(LanguageGenerator):
                 '        return $this->createReturn($stmt, function ($s) {',
                 '            $rows = $s->fetchAll();'
             ])
-            replace_cols = []
-            for col in config.analysis_obj.columns_analysis:
-                assert isinstance(col, ColumnAnalysis)
-                extract = PhpLanguageGenerator._convert_to_php_type(col.schema)
-                if extract is not None:
-                    replace_cols.append('                ' + extract)
-            if len(replace_cols) > 0:
-                ret.append('            foreach ($rows as &$row) {')
-                ret.extend(replace_cols)
-                ret.append('            }')
+            ret.extend(PhpLanguageGenerator._generate_row_conversion(
+                config.analysis_obj))
             ret.extend([
                 '            return $rows;',
                 '        });',
                 '    }', '',
+                '',
+                '    public function iterateBy_' + title + '($db, ' + args +
+                where_arg + ', $order = false, $unbuffered = false, ' +
+                '$columns = null) {'
+            ])
+            ret.extend(self._generate_invoke_init(config, 'iterateBy_' + title))
+            ret.extend(read_by_sql)
+            ret.extend(PhpLanguageGenerator._generate_iterate_return(config))
+
+            if config.analysis_obj.is_unique_column_list(read_by_columns):
+                ret.extend([
+                    '',
+                    '    /**',
+                    '     * Reads the single row for the unique key, or null if',
+                    '     * there is no such row.',
+                    '     */',
+                    '    public function readOneBy_' + title + '($db, ' + args +
+                    where_arg + ', $columns = null) {'
+                ])
+                ret.extend(self._generate_invoke_init(
+                    config, 'readOneBy_' + title))
+                ret.append('        $sql = ' + select + ';')
+                ret.extend(setup_code)
+                ret.extend(PhpLanguageGenerator._generate_where_clause(
+                    config.analysis_obj, True))
+                ret.append('        $sql .= \' LIMIT 1\';')
+                ret.extend(self._generate_sql(
+                    is_static=('$columns === null' if len(where_arg) <= 0
+                               else False)))
+                ret.extend([
+                    '        return $this->createReturn($stmt, function ($s) {',
+                    '            $row = $s->fetch();',
+                    '            if ($row === false) {',
+                    '                return null;',
+                    '            }',
+                ])
+                for col in config.analysis_obj.columns_analysis:
+                    assert isinstance(col, ColumnAnalysis)
+                    extract = PhpLanguageGenerator._convert_to_php_type(
+                        col.schema)
+                    if extract is not None:
+                        ret.append('            ' + extract)
+                ret.extend([
+                    '            return $row;',
+                    '        });',
+                    '    }', '',
+                ])
+
+            if len(read_by_analysis) == 1:
+                ret.extend(self._generate_read_by_many(
+                    config, read_data, read_by_analysis[0]))
+
+        ret.extend(self._generate_read_after(config, read_data))
+        return ret
+
+    def _generate_read_page(self, config, read_data, read_all_sql, args):
+        """
+        Generate the readPage method, which reads one page of the readAll
+        rows along with what the caller needs to page through the rest, so
+        that a separate countAll query isn't needed.  The converter picks
+        whether that is the total row count or a "has more" flag.
+
+        :param read_all_sql: the code lines that build the readAll sql.
+        :param args: the extra method arguments of readAll.
+        """
+        assert isinstance(config, PhpGenConfig)
+        assert isinstance(read_data, ReadQueryData)
+        converter = config.prep_sql_converter
+        assert isinstance(converter, PrepSqlConverter)
+        style = converter.get_page_count_style()
+        assert style in (PAGE_COUNT_WINDOW, PAGE_COUNT_HAS_MORE)
+
+        ret = [
+            '',
+            '    /**',
+            '     * Reads a page of the rows without filters.  The result is',
+        ]
+        if style == PAGE_COUNT_WINDOW:
+            ret.extend([
+                '     * an array of the "rows" and the "total" number of rows',
+                '     * across all the pages, or null if the page starts past',
+                '     * the last row.',
+            ])
+        else:
+            ret.extend([
+                '     * an array of the "rows", and "hasMore", which is true if',
+                '     * there are rows after this page.',
+            ])
+        ret.extend([
+            '     */',
+            '    public function readPage($db' + args +
+                ', $order = false, $offset = 0, $limit = 100, ' +
+                '$columns = null) {'
+        ])
+        ret.extend(self._generate_invoke_init(config, 'readPage'))
+        page_sql = list(read_all_sql)
+        if style == PAGE_COUNT_WINDOW:
+            # The total is computed before the LIMIT applies.
+            page_sql[0] = ('        $sql = ' +
+                           PhpLanguageGenerator._generate_select_from(
+                               config, converter.generate_page_total_column(
+                                   PAGE_TOTAL_COLUMN)) +
+                           ' . \'' + escape_php_string(
+                               read_data.where_clause) + '\';')
+        ret.extend(page_sql)
+        ret.extend([
+            '        $sql .= \' LIMIT \'.intval($offset).\',\'.' +
+                ('intval($limit)' if style == PAGE_COUNT_WINDOW
+                 else '(intval($limit) + 1)') + ';',
+        ])
+        ret.extend(self._generate_sql())
+        ret.extend([
+            '        return $this->createReturn($stmt, function ($s)' +
+                ('' if style == PAGE_COUNT_WINDOW else ' use ($limit)') +
+                ' {',
+            '            $rows = $s->fetchAll();',
+        ])
+        if style == PAGE_COUNT_WINDOW:
+            ret.extend([
+                '            $total = null;',
+                '            foreach ($rows as &$row) {',
+                '                $total = intval($row["' +
+                    PAGE_TOTAL_COLUMN + '"]);',
+                '                unset($row["' + PAGE_TOTAL_COLUMN + '"]);',
+                '            }',
+                '            unset($row);',
+            ])
+        else:
+            ret.extend([
+                '            $hasMore = sizeof($rows) > intval($limit);',
+                '            if ($hasMore) {',
+                '                array_pop($rows);',
+                '            }',
+            ])
+        ret.extend(PhpLanguageGenerator._generate_row_conversion(
+            config.analysis_obj))
+        if style == PAGE_COUNT_WINDOW:
+            ret.append('            return array("rows" => $rows, ' +
+                       '"total" => $total);')
+        else:
+            ret.append('            return array("rows" => $rows, ' +
+                       '"hasMore" => $hasMore);')
+        ret.extend([
+            '        });',
+            '    }', '',
+        ])
+        return ret
+
+    def _generate_read_by_many(self, config, read_data, column):
+        """
+        Generate the read of many key values at once, so that a caller
+        doesn't need to run one readBy query per value.  The values are
+        sent in chunks as an IN list, and the rows are returned in arrays
+        keyed by the column value.
+        """
+        assert isinstance(config, PhpGenConfig)
+        assert isinstance(read_data, ReadQueryData)
+        assert isinstance(column, ColumnAnalysis)
+
+        has_where_clauses = len(config.analysis_obj.schema.where_clauses) > 0
+        loop_var = 'many_' + column.sql_name
+        in_sql = SqlSet(
+            [SqlString(config.sql_name + '.' + column.sql_name + ' IN ({' +
+                       loop_var + '})', 'universal', ['any'])],
+            [SqlArgument(loop_var, column.schema.data_type, True)])
+        in_code = config.prep_sql_converter.generate_code('$tmpSql', in_sql)
+        assert isinstance(in_code, list)
+
+        arg_list = ['$db', 'array $values']
+        arg_list.extend(('$' + a.name) for a in read_data.arguments)
+        arg_list.append('$chunkSize = 500')
+        if has_where_clauses:
+            arg_list.append('$whereClauses = null')
+        arg_list.append('$columns = null')
+
+        title = 'readByMany_' + column.sql_name
+        ret = [
+            '',
+            '    /**',
+            '     * Reads the rows for each of the ' + column.sql_name +
+                ' values, $chunkSize',
+            '     * values per query.  The result maps each value to its ' +
+                'rows.',
+            '     */',
+            '    public function ' + title + '(' + ', '.join(arg_list) + ') {'
+        ]
+        ret.extend(self._generate_invoke_init(config, title))
+        ret.extend([
+            '        $ret = array("haserror" => false, "rowcount" => 0, ' +
+                '"success" => true, "result" => array());',
+            '        $values = array_values(array_unique($values));',
+            # The rows are grouped by the column, so it must be read.
+            '        if ($columns !== null && ! in_array("' +
+                column.sql_name + '", $columns)) {',
+            '            $columns[] = "' + column.sql_name + '";',
+            '        }',
+            '        foreach (array_chunk($values, max(1, intval($chunkSize))) ' +
+                'as $' + loop_var + ') {',
+        ])
+        if len(read_data.arguments) > 0:
+            ret.append('            $data = array(')
+            for arg in read_data.arguments:
+                ret.append('                \'' + arg.name + '\' => $' +
+                           arg.name + ',')
+            ret.append('            );')
+        else:
+            ret.append('            $data = array();')
+        ret.extend(('    ' + line) for line in in_code)
+        ret.append('            $sql = ' +
+                   PhpLanguageGenerator._generate_select_from(config) +
+                   ' . \'' + escape_php_string(read_data.where_clause) +
+                   (' AND ' if read_data.has_where_clauses else ' WHERE ') +
+                   '\' . $tmpSql;')
+        if has_where_clauses:
+            ret.extend([
+                '            if ($whereClauses !== null && ' +
+                    'sizeof($whereClauses) > 0) {',
+                '                foreach ($whereClauses as $w) {',
+                '                    $w->bindVariables($data);',
+                '                    $sql .= " AND " . $w;',
+                '                }',
+                '            }',
             ])
+        ret.extend(self._generate_sql(indent_str='            '))
+        ret.extend([
+            '            $res = $this->createReturn($stmt, function ($s) {',
+            '                $rows = $s->fetchAll();',
+        ])
+        ret.extend(PhpLanguageGenerator._generate_row_conversion(
+            config.analysis_obj, '                '))
+        ret.extend([
+            '                return $rows;',
+            '            });',
+            '            if ($res["haserror"]) {',
+            '                return $res;',
+            '            }',
+            '            $ret["rowcount"] += $res["rowcount"];',
+            '            foreach ($res["result"] as $row) {',
+            '                $ret["result"][$row["' +
+                escape_php_string(column.sql_name) + '"]][] = $row;',
+            '            }',
+            '        }',
+            '        return $ret;',
+            '    }', '',
+        ])
+        return ret
+
+    def _generate_read_after(self, config, read_data):
+        """
+        Generate the keyset (seek) pagination method.  Rather than skipping
+        over the earlier rows with a LIMIT offset, the caller passes in the
+        key of the last row it read, so that every page costs the same as
+        the first one.
+        """
+        assert isinstance(config, PhpGenConfig)
+        assert isinstance(read_data, ReadQueryData)
+
+        # primary_key_columns falls back to the first unique key.
+        key_columns = config.analysis_obj.primary_key_columns
+        if len(key_columns) <= 0:
+            return []
+        key_names = [c.sql_name for c in key_columns]
+        after_names = [('after_' + n) for n in key_names]
+        qualified_names = [(config.sql_name + '.' + n) for n in key_names]
+        if len(key_names) == 1:
+            key_sql = (qualified_names[0] + ' > :' + after_names[0])
+        else:
+            # Row value comparison, so a composite key seeks as one value.
+            key_sql = ('(' + ', '.join(qualified_names) + ') > (:' +
+                       ', :'.join(after_names) + ')')
+
+        arg_list = list(a.name for a in read_data.arguments)
+        arg_list.extend(a + ' = null' for a in after_names)
+        has_where_clauses = len(config.analysis_obj.schema.where_clauses) > 0
+
+        ret = [
+            '',
+            '    /**',
+            '     * Reads the next page of at most $limit rows, ordered by ' +
+                ', '.join(key_names) + '.',
+            '     * Pass in the key of the last row of the previous page, or',
+            '     * null to read the first page.',
+            '     */',
+            '    public function readAfter($db, $' + ', $'.join(arg_list) +
+                ', $limit = 100' +
+                (', $whereClauses = null' if has_where_clauses else '') +
+                ', $columns = null) {'
+        ]
+        ret.extend(self._generate_invoke_init(config, 'readAfter'))
+        # The key of the last row is needed to read the next page.
+        for name in key_names:
+            ret.extend([
+                '        if ($columns !== null && ! in_array("' + name +
+                    '", $columns)) {',
+                '            $columns[] = "' + name + '";',
+                '        }',
+            ])
+        ret.append('        $sql = ' +
+                   PhpLanguageGenerator._generate_select_from(config) +
+                   ' . \'' + escape_php_string(read_data.where_clause) +
+                   '\';')
+        if len(read_data.arguments) > 0:
+            ret.append('        $data = array(')
+            for arg in read_data.arguments:
+                ret.append('            \'' + arg.name + '\' => $' +
+                           arg.name + ',')
+            ret.append('        );')
+        else:
+            ret.append('        $data = array();')
+        ret.extend([
+            '        $where = \'' +
+                (' AND ' if read_data.has_where_clauses else ' WHERE ') +
+                '\';',
+            '        if ($' + after_names[0] + ' !== null) {',
+            '            $sql .= $where . \'' + escape_php_string(key_sql) +
+                '\';',
+        ])
+        for name in after_names:
+            ret.append('            $data[\'' + name + '\'] = $' + name + ';')
+        ret.extend([
+            '            $where = \' AND \';',
+            '        }',
+        ])
+        if has_where_clauses:
+            ret.extend([
+                '        if ($whereClauses !== null && sizeof($whereClauses) > 0) {',
+                '            foreach ($whereClauses as $w) {',
+                '                $w->bindVariables($data);',
+                '                $sql .= $where . $w;',
+                '                $where = \' AND \';',
+                '            }',
+                '        }',
+            ])
+        ret.append('        $sql .= \'' + escape_php_string(
+            ' ORDER BY ' + ', '.join(qualified_names)) +
+            ' LIMIT \'.intval($limit);')
+        ret.extend(self._generate_sql())
+        ret.extend([
+            '        return $this->createReturn($stmt, function ($s) {',
+            '            $rows = $s->fetchAll();'
+        ])
+        ret.extend(PhpLanguageGenerator._generate_row_conversion(
+            config.analysis_obj))
+        ret.extend([
+            '            return $rows;',
+            '        });',
+            '    }', '',
+        ])
         return ret
 
     def generate_create(self, config):
@@ -550,7 +1062,8 @@ class PhpLanguageGenerator(LanguageGenerator):
                 config.sql_name) +
             ' (".join(", ", $columns).") VALUES (".join(", ", $values).")";'
         ])
-        ret.extend(self._generate_sql())
+        ret.extend(self._generate_sql(
+            is_static=(len(create.optional_input_values) <= 0)))
         ret.extend([
             '        $ret = $this->createReturn($stmt, function ($s) {',
             '            return true;',
@@ -565,6 +1078,8 @@ class PhpLanguageGenerator(LanguageGenerator):
             '    }', ''
         ])
 
+        ret.extend(self._generate_create_batch(config, create))
+
         # -------------------------------------------------------------------
         # Create the upsert command (insert or update if exists)
         # We should only generate this if:
@@ -755,6 +1270,187 @@ class PhpLanguageGenerator(LanguageGenerator):
 
         return ret
 
+    def _generate_create_batch(self, config, create):
+        """
+        Generate the multi-row insert.  Each row is an array keyed by the
+        `create` argument names; a missing optional argument is the same as
+        passing `false` to `create`.  All the rows are validated before any
+        of them are inserted.  The rows are then sent in chunks, one INSERT
+        statement per chunk, and a chunk ends before its estimated size
+        passes the maximum packet size.
+        """
+        assert isinstance(config, PhpGenConfig)
+        assert isinstance(create, CreateQuery)
+
+        # The value restrictions are conditions on the values, not more
+        # columns to insert.
+        required_values = [arg for arg in create.required_input_values
+                           if not arg.is_where_clause]
+        optional_values = [arg for arg in create.optional_input_values
+                           if not arg.is_where_clause]
+        if len(required_values) + len(optional_values) <= 0:
+            return []
+
+        columns = [arg.column_name for arg in required_values]
+        columns.extend(arg.column_name for arg in optional_values)
+        ret = [
+            '',
+            '    /**',
+            '     * Inserts many rows, at most $chunkSize rows and about',
+            '     * $maxPacketBytes bytes per statement.  Returns false if any',
+            '     * row fails validation, in which case nothing is inserted.',
+            '     * The rows are read twice, so they must be an array.',
+            '     */',
+            '    public function createBatch($db, $rows, $chunkSize = 500, ' +
+                '$maxPacketBytes = ' + str(config.max_packet_bytes) + ') {'
+        ]
+        ret.extend(self._generate_invoke_init(config, 'createBatch'))
+        ret.extend([
+            '        foreach ($rows as $row) {',
+            '            list($rowSql, $data) = $this->createBatchRow($row);',
+            '            if (! $this->validateWrite($data)) {',
+            '                return false;',
+            '            }',
+            '        }',
+            '        $ret = array("haserror" => false, "rowcount" => 0, ' +
+                '"success" => true, "result" => null);',
+            '        $chunkSize = max(1, intval($chunkSize));',
+            '        $prefix = "' + escape_php_string(
+                'INSERT INTO ' + config.sql_name + ' (' +
+                ', '.join(columns) + ') VALUES ') + '";',
+            '        $chunk = array();',
+            '        $data = array();',
+            '        $bytes = strlen($prefix);',
+            '        foreach ($rows as $row) {',
+            '            list($rowSql, $rowData) = ' +
+                '$this->createBatchRow($row);',
+            # The values are sent along with the statement, whether the
+            # driver binds them or inlines them.
+            '            $rowBytes = strlen($rowSql) + 2;',
+            '            foreach ($rowData as $value) {',
+            '                $rowBytes += is_string($value) ? ' +
+                'strlen($value) + 2 : 24;',
+            '            }',
+            '            if (count($chunk) > 0 && (count($chunk) >= ' +
+                '$chunkSize ||',
+            '                    $bytes + $rowBytes > $maxPacketBytes)) {',
+            '                $res = $this->createBatchChunk($db, $prefix, ' +
+                '$chunk, $data);',
+            '                if ($res["haserror"]) {',
+            '                    return $res;',
+            '                }',
+            '                $ret["rowcount"] += $res["rowcount"];',
+            '                $chunk = array();',
+            '                $data = array();',
+            '                $bytes = strlen($prefix);',
+            '            }',
+            # Each row needs its own parameter names in the statement.
+            # Numbering them from the start of the chunk gives chunks of
+            # the same size the same sql.
+            '            $rowIndex = count($chunk);',
+            '            $names = array();',
+            '            foreach ($rowData as $key => $value) {',
+            '                $names[":" . $key] = ":" . $key . "_" . $rowIndex;',
+            '                $data[$key . "_" . $rowIndex] = $value;',
+            '            }',
+            '            $chunk[] = strtr($rowSql, $names);',
+            '            $bytes += $rowBytes;',
+            '        }',
+            '        if (count($chunk) > 0) {',
+            '            $res = $this->createBatchChunk($db, $prefix, $chunk, ' +
+                '$data);',
+            '            if ($res["haserror"]) {',
+            '                return $res;',
+            '            }',
+            '            $ret["rowcount"] += $res["rowcount"];',
+            '        }',
+            '        return $ret;',
+            '    }',
+            '',
+            '    /**',
+            '     * The values clause and data of one createBatch row.',
+            '     */',
+            '    private function createBatchRow($row) {',
+        ])
+        for arg in create.required_input_arguments:
+            ret.append('        $' + arg + ' = $row["' + arg + '"];')
+        for arg in create.optional_input_arguments:
+            ret.append('        $' + arg + ' = array_key_exists("' + arg +
+                       '", $row) ? $row["' + arg + '"] : false;')
+        ret.extend([
+            '        $values = array();',
+            '        $data = array();',
+        ])
+
+        for arg in required_values:
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, True)
+            if php_code is not None:
+                ret.extend(php_code)
+                ret.append('        $values[] = $tmpSql;')
+            else:
+                ret.append('        $values[] = "' +
+                    escape_php_string(sql_value) + '";')
+            for anx in create.value_arguments[arg]:
+                ret.append('        $data["' + anx.name +
+                    '"] = $' + anx.name + ';')
+
+        for arg in optional_values:
+            # Every row must have the same columns, so the columns that
+            # aren't given use the column default.
+            optional_arg = []
+            for var in create.value_arguments[arg]:
+                if var.name in create.optional_input_arguments:
+                    optional_arg.append(var.name)
+            ret.append('        if (' + (' && '.join(
+                ('$' + var + ' !== false') for var in optional_arg)) + ') {')
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, True)
+            if php_code is not None:
+                ret.extend('    ' + c for c in php_code)
+                ret.append('            $values[] = $tmpSql;')
+            else:
+                ret.append('            $values[] = "' +
+                    escape_php_string(sql_value) + '";')
+            for anx in create.value_arguments[arg]:
+                ret.append('            $data["' + anx.name +
+                    '"] = $' + anx.name + ';')
+            ret.append('        } else {')
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, False)
+            if php_code is not None:
+                ret.extend('    ' + c for c in php_code)
+                ret.append('            $values[] = $tmpSql;')
+            elif sql_key is not None:
+                ret.append('            $values[] = "' +
+                    escape_php_string(sql_value) + '";')
+            else:
+                ret.append('            $values[] = "DEFAULT";')
+            if php_code is not None or sql_key is not None:
+                for argv in [arg.get_code(False), arg.get_sql(False)]:
+                    if argv is not None:
+                        for argx in argv.arguments:
+                            ret.append('            $data["' + argx.name +
+                                '"] = $' + argx.name + ';')
+            ret.append('        }')
+
+        ret.extend([
+            '        return array("(" . join(", ", $values) . ")", $data);',
+            '    }',
+            '',
+            '    private function createBatchChunk($db, $prefix, $chunk, ' +
+                '$data) {',
+            '        $sql = $prefix . join(", ", $chunk);',
+        ])
+        ret.extend(self._generate_sql())
+        ret.extend([
+            '        return $this->createReturn($stmt, function ($s) {',
+            '            return true;',
+            '        });',
+            '    }', ''
+        ])
+        return ret
+
     def generate_update(self, config):
         assert isinstance(config, PhpGenConfig)
 
@@ -919,7 +1615,7 @@ class PhpLanguageGenerator(LanguageGenerator):
 
         # FIXME check if updated row count was 0, and if so report an error.
         ret.extend([
-            '        $stmt = $db->prepare($sql);',
+            '        $stmt = $this->prepareStatement($db, $sql, false);',
             '        $stmt->execute($data);',
             '        return $this->createReturn($stmt, function ($s) {',
             '            return true;',
@@ -927,6 +1623,190 @@ class PhpLanguageGenerator(LanguageGenerator):
             '    }', ''
         ])
 
+        ret.extend(self._generate_update_batch(config, update))
+        return ret
+
+    def _generate_update_batch(self, config, update):
+        """
+        Generate the multi-row update.  Each row is an array keyed by the
+        `update` argument names.  Each chunk of rows is one UPDATE statement,
+        with a `CASE` on the primary key for every column set by the rows in
+        the chunk; columns that a row doesn't set keep their value.
+        """
+        assert isinstance(config, PhpGenConfig)
+        assert isinstance(update, UpdateQuery)
+
+        if len(update.where_values) > len(update.primary_key_values):
+            # The update has restrictions beyond the primary key, which
+            # can't be applied per row.
+            return []
+
+        key_names = [c.sql_name for c in update.primary_key_columns]
+        if len(key_names) == 1:
+            case_head = 'CASE ' + key_names[0]
+            when_prefix = ''
+            key_expr = key_names[0]
+        else:
+            # Composite keys compare as row values.
+            key_expr = '(' + ', '.join(key_names) + ')'
+            case_head = 'CASE'
+            when_prefix = key_expr + ' = '
+
+        ret = [
+            '',
+            '    /**',
+            '     * Updates many rows by their primary key, $chunkSize rows per',
+            '     * statement.',
+            '     */',
+            '    public function updateBatch($db, $rows, $chunkSize = 500) {'
+        ]
+        ret.extend(self._generate_invoke_init(config, 'updateBatch'))
+        ret.extend([
+            '        $allKeys = array();',
+            '        $allSets = array();',
+            '        $allData = array();',
+            '        foreach ($rows as $row) {',
+            '            $keys = array();',
+        ])
+        for name in key_names:
+            ret.append('            $keys["' + name + '"] = $row["' + name +
+                       '"];')
+        for arg in update.required_input_arguments:
+            ret.append('            $' + arg + ' = $row["' + arg + '"];')
+        for arg in update.optional_input_arguments:
+            ret.append('            $' + arg + ' = array_key_exists("' + arg +
+                       '", $row) ? $row["' + arg + '"] : false;')
+        ret.extend([
+            '            $sets = array();',
+            '            $data = array();',
+        ])
+
+        for arg in update.required_input_values:
+            assert isinstance(arg, InputValue)
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, True)
+            if php_code is not None:
+                ret.extend('    ' + c for c in php_code)
+                ret.append('            $sets["' + arg.column_name +
+                           '"] = $tmpSql;')
+            else:
+                ret.append('            $sets["' + arg.column_name + '"] = "' +
+                           escape_php_string(sql_value) + '";')
+            for anx in update.value_arguments[arg]:
+                ret.append('            $data["' + anx.name + '"] = $' +
+                           anx.name + ';')
+
+        for arg in update.optional_input_values:
+            assert isinstance(arg, InputValue)
+            optional_arg = []
+            for var in update.value_arguments[arg]:
+                if var.name in update.optional_input_arguments:
+                    optional_arg.append(var.name)
+            ret.append('            if (' + (' && '.join(
+                ('$' + var + ' !== false') for var in optional_arg)) + ') {')
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, True)
+            if php_code is not None:
+                ret.extend('        ' + c for c in php_code)
+                ret.append('                $sets["' + arg.column_name +
+                           '"] = $tmpSql;')
+            else:
+                ret.append('                $sets["' + arg.column_name +
+                           '"] = "' + escape_php_string(sql_value) + '";')
+            for anx in update.value_arguments[arg]:
+                ret.append('                $data["' + anx.name + '"] = $' +
+                           anx.name + ';')
+            php_code, sql_key, sql_value = PhpLanguageGenerator._convert_arg(
+                config, arg, False)
+            if php_code is not None or sql_key is not None:
+                ret.append('            } else {')
+                if php_code is not None:
+                    ret.extend('        ' + c for c in php_code)
+                    ret.append('                $sets["' + arg.column_name +
+                               '"] = $tmpSql;')
+                else:
+                    ret.append('                $sets["' + arg.column_name +
+                               '"] = "' + escape_php_string(sql_value) + '";')
+                for argv in [arg.get_code(False), arg.get_sql(False)]:
+                    if argv is not None:
+                        for argx in argv.arguments:
+                            ret.append('                $data["' + argx.name +
+                                       '"] = $' + argx.name + ';')
+            ret.append('            }')
+
+        ret.extend([
+            '            $allKeys[] = $keys;',
+            '            $allSets[] = $sets;',
+            '            $allData[] = $data;',
+            '        }',
+            '        $ret = array("haserror" => false, "rowcount" => 0, ' +
+                '"success" => true, "result" => null);',
+            '        $chunkSize = max(1, intval($chunkSize));',
+            '        for ($start = 0; $start < sizeof($allKeys); ' +
+                '$start += $chunkSize) {',
+            '            $end = min(sizeof($allKeys), $start + $chunkSize);',
+            '            $data = array();',
+            # Each row needs its own parameter names in the statement.
+            # Numbering them from the start of the chunk gives chunks of
+            # the same size the same sql.  A key is used once per column,
+            # and once in the IN list, and each use needs its own name.
+            '            $keySql = function ($i, $use) use (&$allKeys, ' +
+                '&$data, $start) {',
+            '                $names = array();',
+            '                foreach ($allKeys[$i] as $key => $value) {',
+            '                    $name = $key . "_" . ($i - $start) . "_" . ' +
+                '$use;',
+            '                    $data[$name] = $value;',
+            '                    $names[] = ":" . $name;',
+            '                }',
+            '                return sizeof($names) == 1 ? $names[0] : ' +
+                '"(" . join(", ", $names) . ")";',
+            '            };',
+            '            $cases = array();',
+            '            $keys = array();',
+            '            for ($i = $start; $i < $end; $i++) {',
+            '                $rowIndex = $i - $start;',
+            '                $names = array();',
+            '                foreach ($allData[$i] as $key => $value) {',
+            '                    $names[":" . $key] = ":" . $key . "_" . ' +
+                '$rowIndex;',
+            '                    $data[$key . "_" . $rowIndex] = $value;',
+            '                }',
+            '                foreach ($allSets[$i] as $column => $value) {',
+            '                    $cases[$column][] = " WHEN ' +
+                escape_php_string(when_prefix) + '" . $keySql($i, $column) ' +
+                '. " THEN " . strtr($value, $names);',
+            '                }',
+            '                $keys[] = $keySql($i, "in");',
+            '            }',
+            '            if (sizeof($cases) <= 0) {',
+            '                continue;',
+            '            }',
+            '            $pairs = array();',
+            '            foreach ($cases as $column => $whens) {',
+            '                $pairs[] = $column . " = ' +
+                escape_php_string(case_head) + '" . join("", $whens) . ' +
+                '" ELSE " . $column . " END";',
+            '            }',
+            '            $sql = "' + escape_php_string(
+                'UPDATE ' + config.sql_name + ' SET ') +
+                '" . join(", ", $pairs) . "' + escape_php_string(
+                ' WHERE ' + key_expr + ' IN (') +
+                '" . join(", ", $keys) . ")";',
+        ])
+        ret.extend(self._generate_sql(indent_str='            '))
+        ret.extend([
+            '            $res = $this->createReturn($stmt, function ($s) {',
+            '                return true;',
+            '            });',
+            '            if ($res["haserror"]) {',
+            '                return $res;',
+            '            }',
+            '            $ret["rowcount"] += $res["rowcount"];',
+            '        }',
+            '        return $ret;',
+            '    }', ''
+        ])
         return ret
 
     def generate_delete(self, config):
@@ -959,7 +1839,8 @@ class PhpLanguageGenerator(LanguageGenerator):
                 col.sql_name + ',')
         ret.append('        );')
 
-        ret.extend(self._generate_sql(sql_val = '"' + sql + '"'))
+        ret.extend(self._generate_sql(sql_val = '"' + sql + '"',
+                                      is_static=True))
 
         ret.extend([
             '        return $this->createReturn($stmt, function ($s) {',
@@ -969,6 +1850,82 @@ class PhpLanguageGenerator(LanguageGenerator):
             '',
         ])
 
+        ret.extend(self._generate_delete_by_keys(config))
+        return ret
+
+    def _generate_delete_by_keys(self, config):
+        """
+        Generate the multi-row delete.  For a single column primary key, the
+        keys are the column values; for a composite key, each key is an
+        array keyed by the column names.
+        """
+        assert isinstance(config, PhpGenConfig)
+
+        key_names = [c.sql_name
+                     for c in config.analysis_obj.primary_key_columns]
+        if len(key_names) == 1:
+            key_expr = key_names[0]
+        else:
+            key_expr = '(' + ', '.join(key_names) + ')'
+
+        ret = [
+            '',
+            '    /**',
+            '     * Deletes the rows with the given keys, $chunkSize keys per',
+            '     * statement.',
+            '     */',
+            '    public function deleteByKeys($db, array $keys, ' +
+                '$chunkSize = 500) {'
+        ]
+        ret.extend(self._generate_invoke_init(config, 'deleteByKeys'))
+        ret.extend([
+            '        $ret = array("haserror" => false, "rowcount" => 0, ' +
+                '"success" => true, "result" => null);',
+            '        $keys = array_values($keys);',
+            '        $chunkSize = max(1, intval($chunkSize));',
+            '        for ($start = 0; $start < sizeof($keys); ' +
+                '$start += $chunkSize) {',
+            '            $end = min(sizeof($keys), $start + $chunkSize);',
+            '            $data = array();',
+            '            $inList = array();',
+            '            for ($i = $start; $i < $end; $i++) {',
+            # Numbered from the start of the chunk, so chunks of the same
+            # size have the same sql.
+            '                $keyIndex = $i - $start;',
+        ])
+        if len(key_names) == 1:
+            ret.extend([
+                '                $data["' + key_names[0] +
+                    '_" . $keyIndex] = $keys[$i];',
+                '                $inList[] = ":' + key_names[0] +
+                    '_" . $keyIndex;',
+            ])
+        else:
+            for name in key_names:
+                ret.append('                $data["' + name +
+                           '_" . $keyIndex] = $keys[$i]["' + name + '"];')
+            ret.append('                $inList[] = "(' + ', '.join(
+                (':' + name + '_" . $keyIndex . "') for name in key_names) +
+                ')";')
+        ret.extend([
+            '            }',
+            '            $sql = "' + escape_php_string(
+                'DELETE FROM ' + config.analysis_obj.sql_name + ' WHERE ' +
+                key_expr + ' IN (') + '" . join(", ", $inList) . ")";',
+        ])
+        ret.extend(self._generate_sql(indent_str='            '))
+        ret.extend([
+            '            $res = $this->createReturn($stmt, function ($s) {',
+            '                return true;',
+            '            });',
+            '            if ($res["haserror"]) {',
+            '                return $res;',
+            '            }',
+            '            $ret["rowcount"] += $res["rowcount"];',
+            '        }',
+            '        return $ret;',
+            '    }', ''
+        ])
         return ret
 
     def generate_extended_sql(self, config, extended_sql):
@@ -1005,7 +1962,7 @@ class PhpLanguageGenerator(LanguageGenerator):
 
         ret.extend([
             '        );',
-            '        $stmt = $db->prepare($sql);',
+            '        $stmt = $this->prepareStatement($db, $sql, false);',
             '        $stmt->setFetchMode(PDO::FETCH_ASSOC);',
             '        $stmt->execute($data);',
             # No validation can be performed with the results, because we don't
@@ -1053,7 +2010,7 @@ class PhpLanguageGenerator(LanguageGenerator):
         ret.append('        $sql = "' + escape_php_string(
             config.prep_sql_converter.generate_sql(extended_sql.sql)) +
             '";')
-        ret.extend(self._generate_sql())
+        ret.extend(self._generate_sql(is_static=True))
         ret.extend([
             '        $errs = $stmt->errorInfo();',
             '        if ($errs[1] !== null) {',
@@ -1070,7 +2027,7 @@ class PhpLanguageGenerator(LanguageGenerator):
                 config.prep_sql_converter.generate_sql(extended_sql.post_sql)) +
                 '";'
         ])
-        ret.extend(self._generate_sql())
+        ret.extend(self._generate_sql(is_static=True))
         ret.extend([
             '        $errs = $stmt->errorInfo();',
             # Regardless of whether the unlock caused an error or not, use
@@ -1172,12 +2129,325 @@ class PhpLanguageGenerator(LanguageGenerator):
             '        //$stmt->close();',
             '        return $ret;',
             '    }', '',
+        ]
+        ret.extend(self._generate_select_from_function(config))
+        ret.extend(self._generate_statement_cache(config))
+        ret.extend([
+            '',
+            # The statement isn't cached, because the rows are read while
+            # the caller runs other queries.
+            '    private function iterateRows($db, $sql, $data, $unbuffered, ' +
+                '$converter) {',
+            '        if ($unbuffered) {',
+            '            $buffered = $db->getAttribute(' +
+                'PDO::MYSQL_ATTR_USE_BUFFERED_QUERY);',
+            '            $db->setAttribute(' +
+                'PDO::MYSQL_ATTR_USE_BUFFERED_QUERY, false);',
+            '        }',
+            '        try {',
+            '            $stmt = $db->prepare($sql);',
+            '            $stmt->setFetchMode(PDO::FETCH_ASSOC);',
+            '            $stmt->execute($data);',
+            '            $errs = $stmt->errorInfo();',
+            '            if ($errs[1] !== null) {',
+            '                throw new \\RuntimeException($errs[2], ' +
+                'intval($errs[1]));',
+            '            }',
+            '            while (($row = $stmt->fetch()) !== false) {',
+            '                $converter($row);',
+            '                yield $row;',
+            '            }',
+            '            $stmt->closeCursor();',
+            '        } finally {',
+            '            if ($unbuffered) {',
+            '                $db->setAttribute(' +
+                'PDO::MYSQL_ATTR_USE_BUFFERED_QUERY, $buffered);',
+            '            }',
+            '        }',
+            '    }', '',
             '}',
             config.class_name + '::$INSTANCE = new ' + config.class_name + ';',
             ''
+        ])
+        ret.extend(self._generate_cache_class(config))
+        return ret
+
+    def _generate_cache_class(self, config):
+        """
+        Generate the read-through cache class for the table's unique key
+        lookups, if the table asks for one.  It wraps the DBO instance, and
+        passes on the methods that it doesn't cache.
+
+        Rows are cached by primary key, and the other unique keys map to
+        the primary key.  Writes drop the cached rows for the primary keys
+        they change; a mapped key that no longer matches its row is read
+        again.  Lookups that find no row are not cached, so creating rows
+        never leaves stale entries.  Methods that the class can't map to
+        primary keys, such as extended sql, drop the whole table cache.
+        """
+        assert isinstance(config, PhpGenConfig)
+        cache = config.get_table_cache()
+        if cache is None:
+            return []
+        assert isinstance(cache, TableCache)
+
+        cls = config.class_name
+        cached_cls = cls + 'Cached'
+        key_names = [c.sql_name for c in config.analysis_obj.primary_key_columns]
+        pk_title = '_x_'.join(key_names)
+        has_where = len(config.analysis_obj.schema.where_clauses) > 0
+        where_arg = ', $whereClauses = null' if has_where else ''
+
+        if cache.backend == 'apcu':
+            new_cache = 'new ApcuDboCache()'
+        elif cache.backend == 'array':
+            new_cache = 'new ArrayDboCache()'
+        else:
+            new_cache = ('function_exists(\'apcu_fetch\') ? ' +
+                         'new ApcuDboCache() : new ArrayDboCache()')
+
+        def key_from(var):
+            return 'array(' + ', '.join(
+                (var + '["' + name + '"]') for name in key_names) + ')'
+
+        ret = [
+            '',
+            '',
+            '/**',
+            ' * Read-through cache for the ' + config.sql_name +
+                ' unique key lookups.',
+            ' * Methods that aren\'t cached are passed on to the DBO.  Use this',
+            ' * class for the writes too, so the cache sees the changes.',
+            ' */',
+            'class ' + cached_cls + ' {',
+            '    private $dbo;',
+            '    private $cache;',
+            '    private $ttl;',
+            '',
+            '    public function __construct(DboCache $cache = null, ' +
+                '$ttl = ' + str(cache.ttl) + ', $dbo = null) {',
+            '        if ($cache === null) {',
+            '            $cache = ' + new_cache + ';',
+            '        }',
+            '        $this->cache = $cache;',
+            '        $this->ttl = $ttl;',
+            '        $this->dbo = $dbo === null ? ' + cls +
+                '::$INSTANCE : $dbo;',
+            '    }',
+            '',
+            '    public function __call($name, $args) {',
+            '        $ret = call_user_func_array(array($this->dbo, $name), ' +
+                '$args);',
+            '        switch ($name) {',
+            '            case "create":',
+            '            case "createBatch":',
+            '            case "clearStatementCache":',
+            '                break;',
+            '            case "update":',
+            '            case "upsert":',
+            '            case "remove":',
+            # These all take the primary key first.
+            '                $this->forget(array_slice($args, 1, ' +
+                str(len(key_names)) + '));',
+            '                break;',
+            '            case "updateBatch":',
+            '                foreach ($args[1] as $row) {',
+            '                    $this->forget(' + key_from('$row') + ');',
+            '                }',
+            '                break;',
+            '            case "deleteByKeys":',
+            '                foreach ($args[1] as $key) {',
+            '                    $this->forget(' + (
+                'array($key)' if len(key_names) == 1
+                else key_from('$key')) + ');',
+            '                }',
+            '                break;',
+            '            default:',
+            '                if (! preg_match(\'/^(read|count|iterate)/\', ' +
+                '$name)) {',
+            '                    $this->clear();',
+            '                }',
+            '        }',
+            '        return $ret;',
+            '    }',
+            '',
+            '    /**',
+            '     * Drops every cached row for the table.',
+            '     */',
+            '    public function clear() {',
+            '        $this->cache->set(__CLASS__, uniqid("", true), 0);',
+            '    }',
+            '',
+            '    private function forget($key) {',
+            '        $this->cache->delete($this->cacheKey("", $key));',
+            '    }',
+            '',
+            # The generation is part of every key, so changing it drops all
+            # the cached rows.
+            '    private function cacheKey($name, $values) {',
+            '        $generation = $this->cache->get(__CLASS__, $found);',
+            '        if (! $found) {',
+            '            $generation = uniqid("", true);',
+            '            $this->cache->set(__CLASS__, $generation, 0);',
+            '        }',
+            '        return __CLASS__ . ":" . $generation . ":" . $name . ' +
+                '":" . json_encode(array_map("strval", $values));',
+            '    }',
+            '',
+            '    private function readKey($db, $key) {',
+            '        $cacheKey = $this->cacheKey("", $key);',
+            '        $row = $this->cache->get($cacheKey, $found);',
+            '        if ($found) {',
+            '            return array("haserror" => false, "rowcount" => 1, ' +
+                '"success" => true, "result" => $row);',
+            '        }',
+            '        $ret = $this->dbo->readOneBy_' + pk_title + '($db, ' +
+                ', '.join(('$key[' + str(i) + ']')
+                          for i in range(len(key_names))) + ');',
+            '        if ($ret["success"] && $ret["result"] !== null) {',
+            '            $this->cache->set($cacheKey, $ret["result"], ' +
+                '$this->ttl);',
+            '        }',
+            '        return $ret;',
+            '    }',
         ]
+
+        for columns in config.analysis_obj.get_selectable_column_lists():
+            if not config.analysis_obj.is_unique_column_list(columns):
+                continue
+            names = [config.analysis_obj.get_column_analysis(c).sql_name
+                     for c in columns]
+            title = '_x_'.join(names)
+            args = '$' + ', $'.join(names)
+            pass_args = ('$db, ' + args + (', $whereClauses' if has_where
+                                           else '') + ', $columns')
+            ret.extend([
+                '',
+                '    public function readOneBy_' + title + '($db, ' + args +
+                    where_arg + ', $columns = null) {',
+                '        if (' + ('$whereClauses !== null || ' if has_where
+                                  else '') + '$columns !== null) {',
+                '            return $this->dbo->readOneBy_' + title + '(' +
+                    pass_args + ');',
+                '        }',
+            ])
+            if names == key_names:
+                ret.extend([
+                    '        return $this->readKey($db, array(' + args + '));',
+                    '    }',
+                ])
+                continue
+            ret.extend([
+                '        $aliasKey = $this->cacheKey("' + title +
+                    '", array(' + args + '));',
+                '        $key = $this->cache->get($aliasKey, $found);',
+                '        if ($found) {',
+                '            $ret = $this->readKey($db, $key);',
+                '            $row = $ret["result"];',
+                '            if ($ret["success"] && $row !== null && ' +
+                    ' && '.join(('$row["' + name + '"] == $' + name)
+                                for name in names) + ') {',
+                '                return $ret;',
+                '            }',
+                '        }',
+                '        $ret = $this->dbo->readOneBy_' + title + '($db, ' +
+                    args + ');',
+                '        $row = $ret["result"];',
+                '        if ($ret["success"] && $row !== null) {',
+                '            $key = ' + key_from('$row') + ';',
+                '            $this->cache->set($this->cacheKey("", $key), ' +
+                    '$row, $this->ttl);',
+                '            $this->cache->set($aliasKey, $key, $this->ttl);',
+                '        }',
+                '        return $ret;',
+                '    }',
+            ])
+        ret.extend([
+            '}',
+            '',
+        ])
         return ret
 
+    def _generate_statement_cache(self, config):
+        """
+        Generate the prepared statement cache.  Statements are cached per
+        connection and sql text.  The statements for sql that is always the
+        same are kept, while the statements for dynamically built sql are
+        limited to the configured size, dropping the least recently used.
+        """
+        assert isinstance(config, PhpGenConfig)
+
+        if not config.statement_cache:
+            return [
+                '',
+                '    private function prepareStatement($db, $sql, $isStatic) {',
+                '        return $db->prepare($sql);',
+                '    }', '',
+                '    public function clearStatementCache($db = null) {',
+                '    }', '',
+            ]
+
+        return [
+            '',
+            '    private $stmtCache = array();',
+            '    private $dynamicStmtCache = array();',
+            '',
+            '    private function prepareStatement($db, $sql, $isStatic) {',
+            '        $dbKey = spl_object_hash($db);',
+            '        if ($isStatic) {',
+            '            if (isset($this->stmtCache[$dbKey][$sql])) {',
+            '                $stmt = $this->stmtCache[$dbKey][$sql];',
+            '                $stmt->closeCursor();',
+            '                return $stmt;',
+            '            }',
+            '            $stmt = $db->prepare($sql);',
+            '            if ($stmt !== false) {',
+            '                $this->stmtCache[$dbKey][$sql] = $stmt;',
+            '            }',
+            '            return $stmt;',
+            '        }',
+            '        $key = $dbKey . ":" . $sql;',
+            '        if (isset($this->dynamicStmtCache[$key])) {',
+            '            $stmt = $this->dynamicStmtCache[$key];',
+            '            $stmt->closeCursor();',
+            # Move the statement to the end, as the most recently used.
+            '            unset($this->dynamicStmtCache[$key]);',
+            '            $this->dynamicStmtCache[$key] = $stmt;',
+            '            return $stmt;',
+            '        }',
+            '        $stmt = $db->prepare($sql);',
+            '        if ($stmt !== false) {',
+            '            if (sizeof($this->dynamicStmtCache) >= ' +
+                str(config.statement_cache_size) + ') {',
+            '                reset($this->dynamicStmtCache);',
+            '                unset($this->dynamicStmtCache[' +
+                'key($this->dynamicStmtCache)]);',
+            '            }',
+            '            $this->dynamicStmtCache[$key] = $stmt;',
+            '        }',
+            '        return $stmt;',
+            '    }', '',
+            '    /**',
+            '     * Drops the cached statements for the connection, or for all',
+            '     * connections if none is given.  Call this before closing a',
+            '     * connection.',
+            '     */',
+            '    public function clearStatementCache($db = null) {',
+            '        if ($db === null) {',
+            '            $this->stmtCache = array();',
+            '            $this->dynamicStmtCache = array();',
+            '            return;',
+            '        }',
+            '        $dbKey = spl_object_hash($db);',
+            '        unset($this->stmtCache[$dbKey]);',
+            '        foreach (array_keys($this->dynamicStmtCache) as $key) {',
+            '            if (strpos($key, $dbKey . ":") === 0) {',
+            '                unset($this->dynamicStmtCache[$key]);',
+            '            }',
+            '        }',
+            '    }', '',
+        ]
+
     def _generate_invoke_init(self, config, method_name):
         """
         Generate some code that starts at the beginning of a method call.  This
@@ -1191,13 +2461,21 @@ class PhpLanguageGenerator(LanguageGenerator):
                      stmt_var = '$stmt',
                      db_var = '$db',
                      sql_val = '$sql',
-                     data_val = '$data'):
+                     data_val = '$data',
+                     is_static = False):
         """
         Generate the sql execute statements.
+
+        :param is_static: True if the sql text is always the same for the
+            method, so its statement can stay in the statement cache.
+            Otherwise, the statement goes into the size-limited cache of
+            dynamically built sql.  This can also be a PHP expression string.
         """
+        if isinstance(is_static, bool):
+            is_static = 'true' if is_static else 'false'
         ret = [
-            indent_str + stmt_var + ' = ' + db_var + '->prepare(' + sql_val +
-                ');',
+            indent_str + stmt_var + ' = $this->prepareStatement(' + db_var +
+                ', ' + sql_val + ', ' + is_static + ');',
             indent_str + stmt_var + '->setFetchMode(PDO::FETCH_ASSOC);',
             indent_str + stmt_var + '->execute(' + data_val + ');'
         ]
@@ -1232,6 +2510,160 @@ class PhpLanguageGenerator(LanguageGenerator):
             ret.append('        }')
         return ret
 
+    @staticmethod
+    def _generate_select_from(config, extra_column=None):
+        """
+        The PHP expression for the select and from clauses of the read
+        methods, limited to the `$columns` of the method.
+
+        :param extra_column: sql for a column to select before the table
+            columns.
+        """
+        assert isinstance(config, PhpGenConfig)
+        args = ['$columns']
+        if len(config.analysis_obj.schema.where_clauses) > 0:
+            args.append('$whereClauses')
+        if extra_column is not None:
+            if len(args) < 2:
+                args.append('null')
+            args.append("'" + escape_php_string(extra_column) + "'")
+        return '$this->selectFrom(' + ', '.join(args) + ')'
+
+    def _generate_select_from_function(self, config):
+        """
+        Generate the column whitelist, and the function that builds the
+        select and from clauses for a subset of the columns.  Joins are only
+        added for the joined columns that are requested, unless where
+        clauses need them.
+        """
+        assert isinstance(config, PhpGenConfig)
+        read_data = ReadQueryData(config.analysis_obj, config.platforms, 'php')
+
+        ret = [
+            '',
+            '    /**',
+            '     * The columns the read methods can return.',
+            '     */',
+            '    public static $READ_COLUMNS = array(',
+        ]
+        for name, query in zip(read_data.column_names,
+                               read_data.column_queries):
+            ret.append('        "' + escape_php_string(name) + '" => "' +
+                       escape_php_string(query) + '",')
+        ret.append('    );')
+        if len(read_data.joins) > 0:
+            ret.append('    private static $READ_COLUMN_JOINS = array(')
+            for name in read_data.column_names:
+                if name in read_data.column_joins:
+                    ret.append('        "' + escape_php_string(name) +
+                               '" => "' + read_data.column_joins[name] + '",')
+            ret.extend([
+                '    );',
+                '    private static $READ_JOINS = array(',
+            ])
+            for alias, join in read_data.joins:
+                ret.append('        "' + alias + '" => "' +
+                           escape_php_string(join) + '",')
+            ret.append('    );')
+
+        ret.extend([
+            '',
+            '    private function selectFrom($columns, ' +
+                '$whereClauses = null, $extraColumn = null) {',
+            '        if ($columns === null) {',
+            '            if ($extraColumn === null) {',
+            '                return \'' + escape_php_string(
+                'SELECT ' + read_data.select_columns_clause +
+                read_data.from_clause) + '\';',
+            '            }',
+            '            return \'SELECT \' . $extraColumn . \'' +
+                escape_php_string(',' + read_data.select_columns_clause +
+                                  read_data.from_clause) + '\';',
+            '        }',
+            '        $select = array();',
+        ])
+        if len(read_data.joins) > 0:
+            ret.append('        $joins = array();')
+        ret.extend([
+            '        foreach ($columns as $column) {',
+            '            if (! array_key_exists($column, self::$READ_COLUMNS)) {',
+            '                throw new \\InvalidArgumentException(' +
+                '"unknown column " . $column);',
+            '            }',
+            '            $select[] = self::$READ_COLUMNS[$column];',
+        ])
+        if len(read_data.joins) > 0:
+            ret.extend([
+                '            if (array_key_exists($column, ' +
+                    'self::$READ_COLUMN_JOINS)) {',
+                '                $joins[self::$READ_COLUMN_JOINS[$column]] = ' +
+                    'true;',
+                '            }',
+            ])
+        ret.extend([
+            '        }',
+            '        if ($extraColumn !== null) {',
+            '            array_unshift($select, $extraColumn);',
+            '        }',
+            '        $sql = "SELECT " . join(",", $select) . "' +
+                escape_php_string(' FROM ' + config.sql_name) + '";',
+        ])
+        if len(read_data.joins) > 0:
+            # The where clauses may use the joined tables.
+            keep_joins = 'true' if read_data.has_where_clauses else (
+                '$whereClauses !== null && sizeof($whereClauses) > 0')
+            ret.extend([
+                '        $allJoins = ' + keep_joins + ';',
+                '        foreach (self::$READ_JOINS as $alias => $join) {',
+                '            if ($allJoins || isset($joins[$alias])) {',
+                '                $sql .= $join;',
+                '            }',
+                '        }',
+            ])
+        ret.extend([
+            '        return $sql;',
+            '    }',
+        ])
+        return ret
+
+    @staticmethod
+    def _generate_iterate_return(config):
+        """
+        Generate the end of an iterate method, which returns the generator
+        over the rows of `$sql`, along with the row type conversion.
+        """
+        assert isinstance(config, PhpGenConfig)
+        ret = ['        return $this->iterateRows($db, $sql, $data, ' +
+               '$unbuffered, function (&$row) {']
+        for col in config.analysis_obj.columns_analysis:
+            assert isinstance(col, ColumnAnalysis)
+            extract = PhpLanguageGenerator._convert_to_php_type(col.schema)
+            if extract is not None:
+                ret.append('            ' + extract)
+        ret.extend([
+            '        });',
+            '    }', '',
+        ])
+        return ret
+
+    @staticmethod
+    def _generate_row_conversion(analysis_obj, indent_str='            '):
+        """
+        Generate the loop that converts the fetched `$rows` into PHP types.
+        """
+        replace_cols = []
+        for col in analysis_obj.columns_analysis:
+            assert isinstance(col, ColumnAnalysis)
+            extract = PhpLanguageGenerator._convert_to_php_type(col.schema)
+            if extract is not None:
+                replace_cols.append(indent_str + '    ' + extract)
+        if len(replace_cols) <= 0:
+            return []
+        ret = [indent_str + 'foreach ($rows as &$row) {']
+        ret.extend(replace_cols)
+        ret.append(indent_str + '}')
+        return ret
+
     @staticmethod
     def _convert_arg(config, arg, is_required):
         assert isinstance(config, PhpGenConfig)
@@ -1253,7 +2685,9 @@ class PhpLanguageGenerator(LanguageGenerator):
             if sql is not None:
                 assert isinstance(sql, SqlSet)
                 sql_key = arg.column_name
-                sql_value = config.prep_sql_converter.generate_sql(sql)
+                # Column constraints can refer to their own column.
+                sql_value = config.prep_sql_converter.generate_sql(
+                    sql, {arg.column.schema.name: arg.column_name})
 
         return php_code, sql_key, sql_value
 
@@ -1269,6 +2703,9 @@ class PhpLanguageGenerator(LanguageGenerator):
         assert isinstance(col, Column)
 
         rowval = '$row["' + escape_php_string(col.name) + '"]'
+        # The row only has the columns that the caller asked for.
+        guard = ('if (array_key_exists("' + escape_php_string(col.name) +
+                 '", $row)) ')
 
         dty = col.data_type.upper()
         # Strip off any size parameter for the type
@@ -1279,12 +2716,13 @@ class PhpLanguageGenerator(LanguageGenerator):
         if dty in ['INT', 'INTEGER', 'SMALLINT', 'TINYINT', 'MEDIUMINT',
                    'BIGINT', 'BIT']:
             # integer type
-            return rowval + ' = intval(' + rowval + ');'
+            return guard + rowval + ' = intval(' + rowval + ');'
         if dty in ['BOOL', 'BOOLEAN']:
             # convert int val to boolean
-            return rowval + ' = intval(' + rowval + ') == 0 ? FALSE : TRUE;'
+            return (guard + rowval + ' = intval(' + rowval +
+                    ') == 0 ? FALSE : TRUE;')
         if dty in ['FLOAT', 'DECIMAL', 'NUMERIC', 'DOUBLE', 'CURRENCY']:
-            return rowval + ' = floatval(' + rowval + ');'
+            return guard + rowval + ' = floatval(' + rowval + ');'
 
         # Strings, enums, blobs, clobs, and dates are all returned as-is
         return None
@@ -25,6 +25,10 @@ class ReadQueryData(object):
         col_query = []
         arguments = []
         where_ands = []
+        # column name -> the join alias it needs
+        column_joins = {}
+        # (join alias, join clause)
+        joins = []
 
         for column in analysis_obj.columns_for_read:
             assert isinstance(column, ColumnAnalysis)
@@ -35,18 +39,15 @@ class ReadQueryData(object):
                 assert isinstance(constraint, SqlConstraint)
                 sql_set = constraint.sql
                 assert isinstance(sql_set, SqlSet)
-                value = sql_set.get_for_platform(platforms).sql
+                template = sql_set.get_template_for_platform(platforms)
 
-                if value is not None:
+                if template is not None:
                     handled = True
                     col_names.append(column.sql_name)
-                    for arg in sql_set.arguments:
-                        # FIXME this is mysql specific syntax.
-                        # FIXME this should instead use the SqlConstraint
-                        # method to get the replaced string.
-                        assert isinstance(arg, SqlArgument)
-                        value = value.replace('{' + arg.name + '}',
-                                              ':' + arg.name)
+                    # FIXME this is mysql specific syntax.
+                    # FIXME this should instead use the SqlConstraint
+                    # method to get the replaced string.
+                    value = template.render(_sql_parameters(sql_set))
                     # FIXME is this the correct thing to do?
                     col_query.append(value + ' AS ' + column.sql_name)
                     arguments.extend(sql_set.arguments)
@@ -64,21 +65,20 @@ class ReadQueryData(object):
                 assert isinstance(constraint, SqlConstraint)
                 sql_set = constraint.sql
                 assert isinstance(sql_set, SqlSet)
-                value = sql_set.get_for_platform(platforms)
-                if value is not None:
-                    for arg in constraint.sql.arguments:
-                        assert isinstance(arg, SqlArgument)
-
-                        # FIXME check if the argument is a collection
-                        # FIXME use a real conversion
-
-                        value = value.replace('{' + arg.name + '}',
-                                              ':' + arg.name)
-                        arguments.append(arg)
-                    where_ands.append(value)
+                template = sql_set.get_template_for_platform(platforms)
+                if template is not None:
+                    # FIXME check if the argument is a collection
+                    # FIXME use a real conversion
+                    where_ands.append(
+                        template.render(_sql_parameters(sql_set)))
+                    arguments.extend(sql_set.arguments)
 
         fki = 0
-        for fkey in analysis_obj.foreign_keys_analysis:
+        for column_analysis in analysis_obj.columns_analysis:
+            assert isinstance(column_analysis, ColumnAnalysis)
+            fkey = column_analysis.foreign_key
+            if fkey is None:
+                continue
             assert isinstance(fkey, ProcessedForeignKeyConstraint)
             # Even if the foreign key is an "owner" for this table, we can pull
             # it in if the declaration says so.
@@ -87,15 +87,15 @@ class ReadQueryData(object):
                 fki += 1
                 fk_name = 'k' + str(fki)
 
-                column_analysis = analysis_obj.get_column_analysis(fkey.column)
-                assert isinstance(column_analysis, ColumnAnalysis)
                 if column_analysis.is_nullable:
-                    join_clause += ' LEFT OUTER JOIN '
+                    join = ' LEFT OUTER JOIN '
                 else:
-                    join_clause += ' INNER JOIN '
-                join_clause += (fkey.fk_table_name + ' ' + fk_name + ' ON ' +
-                                fk_name + '.' + fkey.fk_column_name + ' = ' +
-                                analysis_obj.sql_name + '.' + fkey.column_name)
+                    join = ' INNER JOIN '
+                join += (fkey.fk_table_name + ' ' + fk_name + ' ON ' +
+                         fk_name + '.' + fkey.fk_column_name + ' = ' +
+                         analysis_obj.sql_name + '.' + fkey.column_name)
+                join_clause += join
+                joins.append((fk_name, join))
                 if fkey.remote_table is not None:
                     rtab = fkey.remote_table
                     assert (isinstance(rtab, Table) or
@@ -104,8 +104,10 @@ class ReadQueryData(object):
                         assert isinstance(fcol, Column)
                         query_name = fkey.fk_table_name + '__' + fcol.name
                         col_names.append(query_name)
-                        col_query.append(fkey.fk_table_name + '.' + fcol.name +
+                        # The joined table is only known by its alias.
+                        col_query.append(fk_name + '.' + fcol.name +
                                          ' AS ' + query_name)
+                        column_joins[query_name] = fk_name
 
         from_clause = ' FROM ' + analysis_obj.sql_name + join_clause
         where_clause = ''
@@ -116,6 +118,8 @@ class ReadQueryData(object):
 
         self.column_names = col_names
         self.column_queries = col_query
+        self.column_joins = column_joins
+        self.joins = joins
         self.analysis_obj = analysis_obj
         self.arguments = arguments
         self.select_columns_clause = select_columns_clause
@@ -441,7 +445,7 @@ class UpdateQuery(UpdateCreateQuery):
         self.__primary_key_values = []
         for col in analysis_obj.columns_analysis:
             assert isinstance(col, ColumnAnalysis)
-            if col.is_primary_key:
+            if _is_primary_key_column(analysis_obj, col):
                 self.__primary_key_columns.append(col)
                 if col in self.column_to_values:
                     self.where_values.extend(self.column_to_values[col])
@@ -472,7 +476,7 @@ class UpdateQuery(UpdateCreateQuery):
         ret = []
         for col in analysis_obj.columns_for_update:
             assert isinstance(col, ColumnAnalysis)
-            if not col.is_primary_key:
+            if not _is_primary_key_column(analysis_obj, col):
                 ret.append(col)
         return ret
 
@@ -502,6 +506,36 @@ class UpdateQuery(UpdateCreateQuery):
         return ret
 
 
+def _is_primary_key_column(analysis_obj, column):
+    """
+    Is the column part of the primary key, either from its own constraint or
+    from a table level (possibly composite) primary key?
+    """
+    assert isinstance(analysis_obj, ColumnSetAnalysis)
+    assert isinstance(column, ColumnAnalysis)
+    if column.is_primary_key:
+        return True
+    pk_constraint = analysis_obj.top_analysis.primary_key_constraint
+    if pk_constraint is None:
+        return False
+    assert isinstance(pk_constraint, AbstractProcessedConstraint)
+    return column.sql_name in pk_constraint.constraint.column_names
+
+
+def _sql_parameters(sql_set):
+    """
+    The prepared statement parameter for each argument of the sql set.
+
+    :rtype: dict[str, str]
+    """
+    assert isinstance(sql_set, SqlSet)
+    ret = {}
+    for arg in sql_set.arguments:
+        assert isinstance(arg, SqlArgument)
+        ret[arg.name] = ':' + arg.name
+    return ret
+
+
 class CreateQuery(UpdateCreateQuery):
     """
     Handles the creation of the parts of the insert query.
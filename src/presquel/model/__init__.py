@@ -5,3 +5,4 @@ from .base import *
 from .change import *
 from .schema import *
 from .version import *
+from .indexes import *
@@ -5,6 +5,7 @@ The model is intended to be read-only.
 """
 
 import functools
+import re
 
 class Order(object):
     def __init__(self, order: list or tuple,
@@ -301,6 +302,83 @@ class BaseObject(object):
         return ret
 
 
+# A "{name}" placeholder in the sql text.
+PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+
+class SqlTemplate(object):
+    """
+    Sql text split once into literal text and "{name}" placeholders, so
+    that substituting the placeholders is a single pass over the tokens,
+    rather than a scan of the text for every name.
+    """
+    def __init__(self, sql):
+        object.__init__(self)
+        assert isinstance(sql, str)
+        tokens = []
+        names = []
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(sql):
+            if match.start() > pos:
+                tokens.append((False, sql[pos:match.start()]))
+            tokens.append((True, match.group(1)))
+            names.append(match.group(1))
+            pos = match.end()
+        if pos < len(sql):
+            tokens.append((False, sql[pos:]))
+        self.__sql = sql
+        self.__tokens = tuple(tokens)
+        self.__names = frozenset(names)
+
+    @property
+    def tokens(self):
+        """
+        The (is_placeholder, text) pairs that make up the sql; for a
+        placeholder, the text is the placeholder name.
+
+        :rtype: tuple[(bool, str)]
+        """
+        return self.__tokens
+
+    @property
+    def names(self):
+        """
+        :rtype: frozenset[str]
+        """
+        return self.__names
+
+    def validate(self, names):
+        """
+        Raises an error if the sql uses a placeholder that isn't in names.
+
+        :param names: iterable of the allowed placeholder names
+        """
+        unknown = self.__names.difference(names)
+        if len(unknown) > 0:
+            raise Exception("unknown placeholders " +
+                            ', '.join(('{' + n + '}') for n in sorted(unknown)) +
+                            " in sql: " + self.__sql)
+
+    def render(self, values):
+        """
+        Replace each placeholder with its value.
+
+        :param values: dict of the placeholder name to its replacement text;
+            it must have a value for every placeholder.
+        :rtype: str
+        """
+        parts = []
+        for is_placeholder, text in self.__tokens:
+            if is_placeholder:
+                if text not in values:
+                    raise Exception("no value for placeholder {" + text +
+                                    "} in sql: " + self.__sql)
+                parts.append(values[text])
+            else:
+                parts.append(text)
+        return ''.join(parts)
+
+
 class SqlString(object):
     def __init__(self, sql, syntax, platforms):
         object.__init__(self)
@@ -311,6 +389,7 @@ class SqlString(object):
         self.__sql = sql
         self.__syntax = syntax.strip().lower()
         self.__platforms = [p.strip().lower() for p in platforms]
+        self.__template = None
 
     # TODO allow for priorities on the platform
 
@@ -318,6 +397,17 @@ class SqlString(object):
     def sql(self):
         return self.__sql
 
+    @property
+    def template(self):
+        """
+        The sql compiled into a template, on first use.
+
+        :rtype: SqlTemplate
+        """
+        if self.__template is None:
+            self.__template = SqlTemplate(self.__sql)
+        return self.__template
+
     @property
     def syntax(self):
         return self.__syntax
@@ -395,6 +485,27 @@ class SqlSet(object):
                 return sql
         return None
 
+    def get_template_for_platform(
+            self, platforms: str or list or tuple,
+            other_names=()) -> None or SqlTemplate:
+        """
+        Returns the template of the most appropriate SqlString, checked so
+        that it only uses this set's arguments as placeholders.
+
+        :param platforms: tuple[str] or list[str] or str
+        :param other_names: more placeholder names allowed by the caller,
+            such as column names.
+        :return: SqlTemplate if match, or None if no match.
+        """
+        sql = self.get_for_platform(platforms)
+        if sql is None:
+            return None
+        template = sql.template
+        names = [arg.name for arg in self.__arguments]
+        names.extend(other_names)
+        template.validate(names)
+        return template
+
     @property
     def arguments(self):
         return self.__arguments
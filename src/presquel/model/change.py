@@ -89,14 +89,68 @@ class SchemaChange(Change):
         return self.__previous_name
 
 
+# The placeholders a chunked SqlChange uses to restrict its statement to
+# the current key range.
+CHUNK_START_ARGUMENT = 'chunk_start'
+CHUNK_END_ARGUMENT = 'chunk_end'
+
+
+class ChunkedExecution(object):
+    """
+    Describes how a data migration is split into ranges of an integer key
+    column, so that each range runs and commits on its own.  This keeps the
+    lock time and undo log of a migration over a large table bounded.
+
+    The SQL restricts itself to the half-open key range
+    `[{chunk_start}, {chunk_end})`.
+    """
+    def __init__(self, table_name: str, key_column: str, batch_size: int):
+        object.__init__(self)
+        assert isinstance(table_name, str)
+        assert isinstance(key_column, str)
+        assert isinstance(batch_size, int) and batch_size > 0
+        self.__table_name = table_name
+        self.__key_column = key_column
+        self.__batch_size = batch_size
+
+    @property
+    def table_name(self) -> str:
+        """
+        The table whose key range is walked.
+        """
+        return self.__table_name
+
+    @property
+    def key_column(self) -> str:
+        """
+        The integer column used to split the table into ranges; usually the
+        primary key.
+        """
+        return self.__key_column
+
+    @property
+    def batch_size(self) -> int:
+        """
+        The width of each key range.
+        """
+        return self.__batch_size
+
+    def __repr__(self):
+        return "ChunkedExecution(table_name={}, key_column={}, " \
+               "batch_size={})".format(
+                   self.table_name, self.key_column, self.batch_size)
+
+
 class SqlChange(Change):
     """
     An explicit set of SQL instructions to run to perform the change.
     """
-    def __init__(self, order, comment, object_type, sql_set):
+    def __init__(self, order, comment, object_type, sql_set, chunked=None):
         Change.__init__(self, order, comment, object_type, SQL_CHANGE)
         assert isinstance(sql_set, SqlSet)
+        assert chunked is None or isinstance(chunked, ChunkedExecution)
         self.__sql_set = sql_set
+        self.__chunked = chunked
 
     @property
     def sql_set(self):
@@ -106,9 +160,19 @@ class SqlChange(Change):
         """
         return self.__sql_set
 
+    @property
+    def chunked(self):
+        """
+        How the change is split into key ranges, or None if the change runs
+        as a single statement.
+
+        :return: ChunkedExecution or None
+        """
+        return self.__chunked
+
     def __repr__(self):
         return (
             "SqlChange(order={}, comment={}, object_type={}, " +
-            "sql_set={})".format(
-                self.order, self.comment, self.object_type, self.sql_set)
-        )
+            "sql_set={}, chunked={})").format(
+                self.order, self.comment, self.object_type, self.sql_set,
+                self.chunked)
@@ -0,0 +1,285 @@
+"""
+Finds indexes that cost write throughput and memory without helping any
+query: exact duplicates, and indexes made redundant by a wider index that
+starts with the same columns.  Also finds foreign key columns that have no
+index to support the lookups from the referenced table.
+
+This is platform independent.  The loader reports these problems as
+warnings on each schema version.
+"""
+
+import json
+
+from .schema import (Table, Constraint, NamedConstraint)
+
+
+"""INDEX_CONSTRAINT_TYPES: constraint types that are backed by a real index or
+key in the database."""
+INDEX_CONSTRAINT_TYPES = (
+    'primarykey', 'primaryindex',
+    'uniquekey', 'uniqueindex',
+    'key', 'index',
+    'fulltextkey', 'fulltextindex',
+    'spatialkey', 'spatialindex',
+    'foreignkey',
+)
+
+PRIMARY_KEY_CONSTRAINT_TYPES = ('primarykey', 'primaryindex')
+
+FOREIGN_KEY_CONSTRAINT_TYPES = ('foreignkey', 'codeforeignkey')
+
+
+class IndexProblemType(object):
+    """
+    The kind of index problem.  Should be considered an enum.
+    """
+    def __init__(self, name: str):
+        object.__init__(self)
+        self.__name = name
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    def __str__(self):
+        return self.__name
+
+
+DUPLICATE_INDEX = IndexProblemType('duplicate index')
+REDUNDANT_INDEX = IndexProblemType('redundant index')
+UNINDEXED_FOREIGN_KEY = IndexProblemType('unindexed foreign key')
+INDEX_PROBLEM_TYPES = (
+    DUPLICATE_INDEX, REDUNDANT_INDEX, UNINDEXED_FOREIGN_KEY)
+
+
+class IndexProblem(object):
+    """
+    A single index problem on a table.  For duplicate and redundant indexes,
+    the "covering" constraint is the index that makes this one unnecessary.
+    """
+    def __init__(self, table: Table, problem_type: IndexProblemType,
+                 constraint: Constraint, column_names: tuple,
+                 covering_constraint: Constraint or None=None,
+                 covering_column_names: tuple or None=None):
+        """
+        :type column_names: tuple[str]
+        :type covering_column_names: tuple[str] or None
+        """
+        object.__init__(self)
+        assert isinstance(table, Table)
+        assert isinstance(problem_type, IndexProblemType)
+        assert isinstance(constraint, Constraint)
+        self.__table = table
+        self.__problem_type = problem_type
+        self.__constraint = constraint
+        self.__column_names = tuple(column_names)
+        self.__covering_constraint = covering_constraint
+        self.__covering_column_names = (
+            None if covering_column_names is None
+            else tuple(covering_column_names))
+
+    @property
+    def table(self) -> Table:
+        return self.__table
+
+    @property
+    def problem_type(self) -> IndexProblemType:
+        return self.__problem_type
+
+    @property
+    def constraint(self) -> Constraint:
+        return self.__constraint
+
+    @property
+    def column_names(self) -> tuple:
+        """
+        :rtype: tuple[str]
+        """
+        return self.__column_names
+
+    @property
+    def covering_constraint(self) -> Constraint or None:
+        return self.__covering_constraint
+
+    @property
+    def covering_column_names(self) -> tuple or None:
+        """
+        :rtype: tuple[str] or None
+        """
+        return self.__covering_column_names
+
+    @property
+    def message(self) -> str:
+        ret = (self.__table.name + ': ' + self.__problem_type.name + ' ' +
+               _describe(self.__constraint, self.__column_names))
+        if self.__problem_type == DUPLICATE_INDEX:
+            ret += ' duplicates ' + _describe(
+                self.__covering_constraint, self.__covering_column_names)
+        elif self.__problem_type == REDUNDANT_INDEX:
+            ret += ' is a left prefix of ' + _describe(
+                self.__covering_constraint, self.__covering_column_names)
+        elif self.__problem_type == UNINDEXED_FOREIGN_KEY:
+            ret += ' has no index that starts with its column'
+        return ret
+
+    def to_dict(self) -> dict:
+        """
+        The problem as a JSON compatible dictionary.
+        """
+        ret = {
+            'table': self.__table.name,
+            'problem': self.__problem_type.name,
+            'constraint': _constraint_name(self.__constraint),
+            'constraintType': self.__constraint.constraint_type,
+            'columns': list(self.__column_names),
+        }
+        if self.__covering_constraint is not None:
+            ret['coveredBy'] = {
+                'constraint': _constraint_name(self.__covering_constraint),
+                'constraintType': self.__covering_constraint.constraint_type,
+                'columns': list(self.__covering_column_names),
+            }
+        return ret
+
+    def __str__(self):
+        return self.message
+
+
+def get_index_constraints(table: Table) -> list:
+    """
+    Find all the index and key constraints for the table, both the ones
+    declared on the columns and the ones declared on the table.
+
+    :return: list of (constraint, column names) pairs, in declaration order.
+    :rtype: list[(Constraint, tuple[str])]
+    """
+    assert isinstance(table, Table)
+    ret = []
+    for col in table.columns:
+        for cst in col.constraints:
+            if cst.constraint_type in INDEX_CONSTRAINT_TYPES:
+                ret.append((cst, (col.name,)))
+    for cst in table.constraints:
+        if cst.constraint_type in INDEX_CONSTRAINT_TYPES:
+            ret.append((cst, tuple(cst.column_names)))
+    return ret
+
+
+def find_index_problems(table: Table) -> list:
+    """
+    :rtype: list[IndexProblem]
+    """
+    assert isinstance(table, Table)
+    indexes = []
+    foreign_keys = []
+    for cst, column_names in get_index_constraints(table):
+        if len(column_names) <= 0:
+            continue
+        if cst.constraint_type in FOREIGN_KEY_CONSTRAINT_TYPES:
+            foreign_keys.append((cst, column_names))
+        else:
+            indexes.append((cst, column_names))
+    # Code foreign keys are not index constraints, but are still looked up.
+    for col in table.columns:
+        for cst in col.constraints:
+            if cst.constraint_type == 'codeforeignkey':
+                foreign_keys.append((cst, (col.name,)))
+
+    ret = []
+    redundant = set()
+    for i in range(len(indexes)):
+        cst, column_names = indexes[i]
+        for j in range(len(indexes)):
+            if i == j or j in redundant:
+                continue
+            other, other_names = indexes[j]
+            if _index_kind(cst) != _index_kind(other):
+                continue
+            if column_names == other_names:
+                # Keep the index that enforces the most; for true
+                # duplicates, keep the first one.
+                if _enforce_rank(cst) > _enforce_rank(other):
+                    continue
+                if (_enforce_rank(cst) == _enforce_rank(other) and
+                        i < j):
+                    continue
+                ret.append(IndexProblem(table, DUPLICATE_INDEX, cst,
+                                        column_names, other, other_names))
+                redundant.add(i)
+                break
+            if (len(column_names) < len(other_names) and
+                    other_names[0:len(column_names)] == column_names and
+                    _enforce_rank(cst) == 0):
+                ret.append(IndexProblem(table, REDUNDANT_INDEX, cst,
+                                        column_names, other, other_names))
+                redundant.add(i)
+                break
+
+    for cst, column_names in foreign_keys:
+        supported = False
+        for other, other_names in indexes:
+            if (_index_kind(other) == 'btree' and
+                    other_names[0:len(column_names)] == column_names):
+                supported = True
+                break
+        if not supported:
+            ret.append(IndexProblem(table, UNINDEXED_FOREIGN_KEY, cst,
+                                    column_names))
+    return ret
+
+
+def find_schema_index_problems(schema: list or tuple) -> list:
+    """
+    Find the index problems for all the tables in the schema list.
+
+    :type schema: list[SchemaObject] or tuple[SchemaObject]
+    :rtype: list[IndexProblem]
+    """
+    ret = []
+    for sch in schema:
+        if isinstance(sch, Table):
+            ret.extend(find_index_problems(sch))
+    return ret
+
+
+def index_problems_to_json(problems: list or tuple) -> str:
+    """
+    :type problems: list[IndexProblem] or tuple[IndexProblem]
+    """
+    return json.dumps({
+        'problems': [p.to_dict() for p in problems],
+    }, indent=2, sort_keys=True)
+
+
+def _index_kind(cst: Constraint) -> str:
+    # Full text and spatial indexes can't serve the same queries as the
+    # normal (b-tree) indexes.
+    if cst.constraint_type.startswith('fulltext'):
+        return 'fulltext'
+    if cst.constraint_type.startswith('spatial'):
+        return 'spatial'
+    return 'btree'
+
+
+def _enforce_rank(cst: Constraint) -> int:
+    # Unique and primary keys enforce a constraint, so they are never
+    # redundant because of a wider index.
+    if cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+        return 2
+    if cst.constraint_type.startswith('unique'):
+        return 1
+    return 0
+
+
+def _constraint_name(cst: Constraint) -> str or None:
+    if isinstance(cst, NamedConstraint):
+        return cst.name
+    return None
+
+
+def _describe(cst: Constraint, column_names: tuple) -> str:
+    ret = cst.constraint_type
+    name = _constraint_name(cst)
+    if name is not None:
+        ret += ' ' + name
+    return ret + ' (' + ', '.join(column_names) + ')'
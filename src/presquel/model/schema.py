@@ -367,6 +367,38 @@ class WhereClause(object):
         return self.__sqlset
 
 
+# Seconds that a cached row stays valid, if the table doesn't say.
+DEFAULT_CACHE_TTL = 300
+# Where the generated code keeps the cached rows.  "auto" uses APCu when it
+# is installed, and an in-process array otherwise.
+CACHE_BACKENDS = ('auto', 'apcu', 'array')
+
+
+class TableCache(object):
+    """
+    Caching of the unique key lookups for a table, for tables that rarely
+    change, such as lookup tables.
+    """
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, backend='auto'):
+        """
+        :param int ttl: seconds that a cached row stays valid; 0 means
+            until it is invalidated.
+        :param str backend: one of CACHE_BACKENDS
+        """
+        assert isinstance(ttl, int) and ttl >= 0
+        assert backend in CACHE_BACKENDS
+        self.__ttl = ttl
+        self.__backend = backend
+
+    @property
+    def ttl(self):
+        return self.__ttl
+
+    @property
+    def backend(self):
+        return self.__backend
+
+
 class ExtendedSql(object):
     """
     Defines extra Sql statements that should be added to the generated code.
@@ -515,14 +547,16 @@ class Table(ColumnarSchemaObject):
 
     def __init__(self, order, comment, catalog_name, schema_name, table_name,
                  table_space, columns, table_constraints, changes,
-                 where_clauses, extended_sql):
+                 where_clauses, extended_sql, cache=None):
         ColumnarSchemaObject.__init__(self, order, comment, catalog_name,
                                       schema_name, table_name, columns,
                                       table_constraints, TABLE_TYPE, changes,
                                       where_clauses, extended_sql)
 
+        assert cache is None or isinstance(cache, TableCache)
         self.__table_name = table_name
         self.__table_space = table_space
+        self.__cache = cache
 
     @property
     def table_name(self):
@@ -532,6 +566,14 @@ class Table(ColumnarSchemaObject):
     def table_space(self):
         return self.__table_space
 
+    @property
+    def cache(self):
+        """
+        :return: the caching for the table, or None if it isn't cached.
+        :rtype: TableCache
+        """
+        return self.__cache
+
 
 class View(ColumnarSchemaObject):
     def __init__(self, order, comment, catalog_name, replace_if_exists,
@@ -74,8 +74,18 @@ class ErrorObject(BaseObject):
         assert isinstance(source, BaseObject)
         self.__source = source
 
+    @property
+    def is_error(self) -> bool:
+        """
+        True if the problem prevents using the schema; warnings and notes
+        only need to be reported.
+        """
+        return self.object_type in (FATAL_TYPE, ERROR_TYPE)
+
     def __str__(self):
-        return "Error: {} ; {}".format(self.comment, self.source_location)
+        return "{}: {} ; {}".format(
+            self.object_type.name.capitalize(), self.comment,
+            self.source_location)
 
 
 class SchemaVersionNumber(object):
@@ -521,34 +531,32 @@ class SchemaPackage(object):
         parent has been added yet.
         """
 
+        # Adding a branch resolves the parents again, so each item is taken
+        # off of its list before it is added.
         search = True
         while search and (
                 len(self.__unresolved_parents_loaded) +
                 len(self.__unresolved_parents_lazy) > 0):
             search = False
-            remove = []
-            for item in self.__unresolved_parents_loaded:
+            for item in list(self.__unresolved_parents_loaded):
                 parent, branch = item
                 assert isinstance(parent, SchemaVersionNumber)
                 assert isinstance(branch, SchemaVersion)
-                if parent in self:
+                if (item in self.__unresolved_parents_loaded and
+                        parent in self):
+                    self.__unresolved_parents_loaded.remove(item)
                     self.add_branch_version(branch, parent)
-                    remove.append(item)
                     search = True
-            for item in remove:
-                self.__unresolved_parents_loaded.remove(item)
-            remove = []
-            for item in self.__unresolved_parents_lazy:
+            for item in list(self.__unresolved_parents_lazy):
                 parent, branch_loader, version = item
                 assert isinstance(parent, SchemaVersionNumber)
                 assert callable(branch_loader)
                 assert isinstance(version, SchemaVersionNumber)
-                if parent in self:
+                if (item in self.__unresolved_parents_lazy and
+                        parent in self):
+                    self.__unresolved_parents_lazy.remove(item)
                     self.add_branch_loader(branch_loader, version, parent)
-                    remove.append(item)
                     search = True
-            for item in remove:
-                self.__unresolved_parents_lazy.remove(item)
 
     def __len__(self) -> int:
         return len(self.__version_map)
@@ -1,7 +1,8 @@
 
 from ..model.change import (
     Change, SchemaChange, SqlChange, ChangeType, CHANGE_TYPES, SQL_CHANGE,
-    ERROR_CHANGE_TYPE)
+    ERROR_CHANGE_TYPE, ChunkedExecution, CHUNK_START_ARGUMENT,
+    CHUNK_END_ARGUMENT)
 from ..model.base import (
     SCHEMA_OBJECT_TYPES, TABLE_TYPE, VIEW_TYPE, CONSTRAINT_TYPE, COLUMN_TYPE,
     SqlString, SqlArgument, BaseObject, SchemaObjectType, Order)
@@ -9,7 +10,8 @@ from ..model.schema import (
     Table, View, SchemaObject,
     Column, SqlConstraint, LanguageConstraint, Constraint,
     NamedConstraint, WhereClause, ExtendedSql,
-    ValueTypeValue, SqlSet, LanguageSet)
+    ValueTypeValue, SqlSet, LanguageSet, TableCache, DEFAULT_CACHE_TTL,
+    CACHE_BACKENDS)
 from ..model.version import (
     ErrorObject, FATAL_TYPE, ERROR_TYPE, WARNING_TYPE, NOTE_TYPE
 )
@@ -84,7 +86,7 @@ class BaseObjectBuilder(object):
         if isinstance(val, int):
             return val
         if isinstance(val, float):
-            return int(float)
+            return int(val)
         if isinstance(val, str) and val.isdecimal():
             return int(val)
         else:
@@ -384,6 +386,7 @@ class SchemaParser(object):
         sql_set = []
         schema_type = None
         change_type = SQL_CHANGE
+        chunked = None
 
         for (key, val) in top_change_dict.items():
             key = _strip_key(key)
@@ -407,6 +410,8 @@ class SchemaParser(object):
                 }
                 sql = SqlStatementBuilder(change_obj)
                 sql_set.append(sql.make(chv))
+            elif key in ['chunk', 'chunked', 'chunks']:
+                chunked = self._parse_chunked(val, change_obj)
 
             # Changes (e.g. upgrades) are not part of auto-generated code,
             # so there are no arguments.
@@ -423,11 +428,54 @@ class SchemaParser(object):
             self.problem("did not specify schema type for change", FATAL_TYPE)
             return None
 
+        if chunked is not None:
+            for sql in sql_set:
+                if (sql is not None and (
+                        '{' + CHUNK_START_ARGUMENT + '}' not in sql.sql or
+                        '{' + CHUNK_END_ARGUMENT + '}' not in sql.sql)):
+                    change_obj.problem(
+                        "chunked change sql must restrict itself to the "
+                        "key range with {" + CHUNK_START_ARGUMENT + "} and {" +
+                        CHUNK_END_ARGUMENT + "}", FATAL_TYPE)
+
         ret = SqlChange(change_obj.mk_order(), change_obj.comment, schema_type,
-                        SqlSet(sql_set, None))
+                        SqlSet(sql_set, None), chunked)
         change_obj.finish(ret)
         return ret
 
+    def _parse_chunked(self, chunk_dict, change_obj: BaseObjectBuilder):
+        """
+        Parse the chunked execution settings for a top-level change.
+        """
+        if not isinstance(chunk_dict, dict):
+            change_obj.problem("chunk value is not a dictionary", FATAL_TYPE)
+            return None
+
+        table_name = None
+        key_column = None
+        batch_size = None
+        for (key, val) in chunk_dict.items():
+            key = _strip_key(key)
+            if key in ['table', 'tablename']:
+                table_name = change_obj.to_str(key, val).strip()
+            elif key in ['key', 'keycolumn', 'column']:
+                key_column = change_obj.to_str(key, val).strip()
+            elif key in ['size', 'batchsize', 'chunksize', 'batch']:
+                batch_size = change_obj.to_int(key, val)
+            else:
+                change_obj.unknown_key(key, val)
+
+        if table_name is None or key_column is None:
+            change_obj.problem("chunk requires 'table' and 'key'", FATAL_TYPE)
+            return None
+        if batch_size is None:
+            change_obj.problem("chunk requires 'size'", FATAL_TYPE)
+            return None
+        if batch_size <= 0:
+            change_obj.problem("chunk size must be positive", FATAL_TYPE)
+            return None
+        return ChunkedExecution(table_name, key_column, batch_size)
+
     def _parse_table(self, table_dict):
         if not isinstance(table_dict, dict):
             self.problem('"table" must be a dictionary', FATAL_TYPE)
@@ -438,12 +486,15 @@ class SchemaParser(object):
         columns = []
         wheres = []
         extended = []
+        cache = None
 
         for (key, val) in table_dict.items():
             key = _strip_key(key)
             if table_obj.parse(key, val):
                 # handled by parse
                 pass
+            elif key == 'cache':
+                cache = self._parse_table_cache(val, table_obj)
             elif key == 'column':
                 columns.append(self._parse_column(val))
             elif key == 'columns':
@@ -466,7 +517,40 @@ class SchemaParser(object):
             table_obj.mk_order(), table_obj.comment, table_obj.catalog_name,
             table_obj.schema_name, table_obj.name, table_obj.table_space,
             columns, table_obj.constraints, table_obj.changes, wheres,
-            extended))
+            extended, cache))
+
+    def _parse_table_cache(self, val, parent: BaseObjectBuilder):
+        """
+        The cache can be a boolean, the time to live in seconds, or a
+        dictionary with "ttl" and "backend" keys.
+        """
+        if val is True or val is False or isinstance(val, str):
+            if parent.to_boolean('cache', val):
+                return TableCache()
+            return None
+        if isinstance(val, int):
+            return TableCache(max(0, val))
+        if not isinstance(val, dict):
+            parent.problem('"cache" must be a boolean, number, or dictionary',
+                           ERROR_TYPE)
+            return None
+
+        ttl = DEFAULT_CACHE_TTL
+        backend = 'auto'
+        for (key, v) in val.items():
+            key = _strip_key(key)
+            if key in ['ttl', 'timetolive']:
+                ttl = max(0, parent.to_int(key, v))
+            elif key == 'backend':
+                backend = parent.to_str(key, v).strip().lower()
+                if backend not in CACHE_BACKENDS:
+                    parent.problem('cache backend must be one of ' +
+                                   ', '.join(CACHE_BACKENDS) + '; found ' +
+                                   repr(v), ERROR_TYPE)
+                    backend = 'auto'
+            else:
+                parent.unknown_key(key, v)
+        return TableCache(ttl, backend)
 
     def _parse_view(self, d):
         if not isinstance(d, dict):
@@ -840,7 +924,7 @@ class SchemaParser(object):
                     d_list = []
                     for chv in val:
                         if isinstance(chv, str):
-                            column_names.append([chv.strip()])
+                            column_names.append(chv.strip())
                         elif isinstance(chv, dict):
                             d_list.append(chv)
                         else:
@@ -14,10 +14,12 @@ extension (.json, .xml, .yaml) are read as a schema file.
 
 from . import PARSERS_BY_EXTENSION
 from ..model.version import (
-    SchemaVersion, SchemaPackage, SchemaVersionNumber, ErrorObject
+    SchemaVersion, SchemaPackage, SchemaVersionNumber, ErrorObject,
+    WARNING_TYPE
 )
 from ..model.change import (Change)
-from ..model.schema import (SchemaObject)
+from ..model.schema import (SchemaObject, Table)
+from ..model.indexes import (find_index_problems)
 import os
 import re
 import math
@@ -265,6 +267,11 @@ class VersionMetadata(object):
                             changes.append(value)
                         elif isinstance(value, SchemaObject):
                             schema.append(value)
+                            if isinstance(value, Table):
+                                for prb in find_index_problems(value):
+                                    errors.append(ErrorObject(
+                                        value, prb.message, name,
+                                        level=WARNING_TYPE))
                         elif isinstance(value, ErrorObject):
                             errors.append(value)
                         else:
@@ -0,0 +1,16 @@
+__author__ = 'Groboclown'
+
+"""
+Runs the generated schema scripts against a database, over a DB-API
+connection.
+
+Unlike the schemagen classes, these do interact with the database; they
+are a stand-in for the runner each project would otherwise write for the
+generated scripts.
+"""
+
+
+from .statements import *
+from .upgrade import *
+from .rehearsal import *
+from .bundle import *
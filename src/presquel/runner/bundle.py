@@ -0,0 +1,68 @@
+"""
+Bundles all the steps of an upgrade into a single script, for deployments
+that run the upgrade with the database's own client in one session.
+
+Each step is guarded by a checkpoint in the version tables used by the
+upgrade runner: the step only runs if the step table has no record of it,
+and it records itself when it finishes.  Running the script again after a
+failure skips the completed steps.  As the steps are numbered the same way,
+the runner and the script can finish each other's upgrades.
+"""
+
+from ..schemagen.base import (SchemaScriptGenerator)
+from ..model.version import (SchemaPackage)
+from .upgrade import (VersionTable, UpgradeStep, plan_upgrade,
+                      render_version_sql, _quote)
+import time
+
+
+def generate_upgrade_bundle(package, generator, current_version,
+                            target_version=None, version_table=None):
+    """
+    Generate the script that upgrades the database from the current version
+    to the target version.
+
+    :param current_version: the version the script upgrades, or None for a
+        script that installs the target version.
+    :type current_version: SchemaVersionNumber or None
+    :rtype: list[str]
+    """
+    assert isinstance(package, SchemaPackage)
+    assert isinstance(generator, SchemaScriptGenerator)
+    version_table = version_table or VersionTable()
+    steps = plan_upgrade(package, generator, current_version, target_version)
+
+    ret = ['-- Upgrade of ' + package.package + ' from version ' + (
+        str(current_version) if current_version is not None else '(none)') +
+        '\n-- Generated on ' + time.asctime(time.gmtime(time.time())) +
+        '\n\n']
+    for statement in version_table.create:
+        ret.append(statement.strip().rstrip(';') + ';\n')
+
+    versions = []
+    for step in steps:
+        assert isinstance(step, UpgradeStep)
+        if len(step.scripts) <= 0:
+            continue
+        if step.version not in versions:
+            versions.append(step.version)
+        done = str(step.index) + ' IN (' + render_version_sql(
+            version_table.step_query, package.package,
+            {'version': str(step.version)}) + ')'
+        record = render_version_sql(
+            version_table.step_insert, package.package, {
+                'version': str(step.version), 'step': str(step.index),
+                'name': step.name})
+        ret.append('\n-- Version ' + str(step.version) + ' step ' +
+                   str(step.index) + ': ' + step.name + '\n')
+        ret.extend(generator.generate_checkpoint(
+            done, step.statements, record))
+
+    for version in versions:
+        done = _quote(str(version)) + ' IN (' + render_version_sql(
+            version_table.query, package.package, {}) + ')'
+        record = render_version_sql(
+            version_table.insert, package.package, {'version': str(version)})
+        ret.append('\n-- Version ' + str(version) + ' installed\n')
+        ret.extend(generator.generate_checkpoint(done, [], record))
+    return ret
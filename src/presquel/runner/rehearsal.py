@@ -0,0 +1,271 @@
+"""
+Rehearses the upgrades of a schema package in in-memory SQLite databases.
+
+For each version with a parent, one database is created at the parent
+version and upgraded with the generated upgrade scripts, and a second
+database is created fresh at the version.  The two catalogs must match;
+any difference means the upgrade scripts and the base scripts disagree.
+
+The version pairs are independent, so they run in parallel worker
+processes.  Each worker loads the package once.
+"""
+
+from ..model.version import (SchemaPackage, SchemaBranch)
+from ..parser import (load_package)
+from ..schemagen import (get_generator)
+from ..schemagen.base import (SchemaScriptGenerator)
+from .upgrade import (UpgradeRunner, VersionTable, load_version_table,
+                      get_upgrade_problems, get_upgrade_warnings)
+import multiprocessing
+import traceback
+import sqlite3
+import re
+
+
+PLATFORM = 'sqlite'
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class RehearsalResult(object):
+    """
+    The outcome of rehearsing the upgrade from a branch's parent to the
+    branch.
+    """
+    def __init__(self, version, parent_version, differences, error=None,
+                 warnings=()):
+        """
+        :param version: the upgraded version
+        :type version: str
+        :param parent_version: the version that was upgraded
+        :type parent_version: str
+        :param differences: each difference between the upgraded and fresh
+            catalogs.
+        :type differences: list[str]
+        :param error: the error that stopped the rehearsal, if any.
+        :type error: str or None
+        :param warnings: the warnings in the upgraded version, which don't
+            fail the rehearsal.
+        :type warnings: list[str]
+        """
+        object.__init__(self)
+        self.version = version
+        self.parent_version = parent_version
+        self.differences = tuple(differences)
+        self.error = error
+        self.warnings = tuple(warnings)
+
+    @property
+    def passed(self):
+        """
+        :rtype: bool
+        """
+        return self.error is None and len(self.differences) <= 0
+
+    def __str__(self):
+        return self.parent_version + ' -> ' + self.version + ': ' + (
+            'passed' if self.passed else
+            'error' if self.error is not None else
+            str(len(self.differences)) + ' difference(s)')
+
+
+def read_catalog(connection):
+    """
+    Read the schema of a SQLite database, as comparable values keyed by the
+    object type and name.
+
+    Table columns are compared by name, not position, as an added column is
+    always placed at the end of the table.  Index names that SQLite chooses
+    on its own (for unique and primary key constraints) are replaced by the
+    index columns.
+
+    :param connection: sqlite3 connection
+    :rtype: dict[str, object]
+    """
+    ret = {}
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT type, name, tbl_name, sql FROM sqlite_master "
+            "WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name")
+        objects = cursor.fetchall()
+        for obj_type, name, table_name, sql in objects:
+            if obj_type == 'table':
+                ret['table ' + name] = _read_columns(cursor, name)
+                ret['foreign keys ' + name] = _read_foreign_keys(cursor, name)
+                for key, val in _read_indexes(cursor, name).items():
+                    ret['index ' + name + '.' + key] = val
+            elif obj_type in ('view', 'trigger'):
+                ret[obj_type + ' ' + name] = _normalize_sql(sql)
+    finally:
+        cursor.close()
+    return ret
+
+
+def diff_catalogs(expected, actual):
+    """
+    :param expected: the catalog of the freshly created version.
+    :param actual: the catalog of the upgraded version.
+    :rtype: list[str]
+    """
+    ret = []
+    for key in sorted(set(expected.keys()) | set(actual.keys())):
+        if key not in actual:
+            ret.append('missing after upgrade: ' + key)
+        elif key not in expected:
+            ret.append('not in a fresh install: ' + key)
+        elif isinstance(expected[key], dict):
+            for name in sorted(set(expected[key].keys()) |
+                               set(actual[key].keys())):
+                if name not in actual[key]:
+                    ret.append('missing after upgrade: ' + key + '.' + name)
+                elif name not in expected[key]:
+                    ret.append('not in a fresh install: ' + key + '.' + name)
+                elif expected[key][name] != actual[key][name]:
+                    ret.append('differs: ' + key + '.' + name +
+                               '; expected ' + repr(expected[key][name]) +
+                               ', found ' + repr(actual[key][name]))
+        elif expected[key] != actual[key]:
+            ret.append('differs: ' + key + '; expected ' +
+                       repr(expected[key]) + ', found ' + repr(actual[key]))
+    return ret
+
+
+def rehearse_branch(package, generator, branch, version_table=None):
+    """
+    Rehearse the upgrade from the branch's parent version to the branch.
+
+    :rtype: RehearsalResult
+    """
+    assert isinstance(package, SchemaPackage)
+    assert isinstance(generator, SchemaScriptGenerator)
+    assert isinstance(branch, SchemaBranch)
+    assert branch.parent is not None
+    version_table = version_table or VersionTable()
+    version = str(branch.version)
+    parent_version = str(branch.parent.version)
+    problems = get_upgrade_problems(package, branch.parent.version,
+                                    branch.version)
+    if len(problems) > 0:
+        return RehearsalResult(version, parent_version, [],
+                               '\n'.join(problems))
+    warnings = get_upgrade_warnings(package, branch.parent.version,
+                                    branch.version)
+    upgraded = sqlite3.connect(':memory:', isolation_level=None)
+    fresh = sqlite3.connect(':memory:', isolation_level=None)
+    try:
+        runner = UpgradeRunner(upgraded, package, generator, version_table,
+                               begin_statement='BEGIN')
+        runner.run(branch.parent.version)
+        runner.run(branch.version)
+        UpgradeRunner(fresh, package, generator, version_table,
+                      begin_statement='BEGIN').run(branch.version)
+        differences = diff_catalogs(read_catalog(fresh),
+                                    read_catalog(upgraded))
+        return RehearsalResult(version, parent_version, differences,
+                               warnings=warnings)
+    except Exception:
+        return RehearsalResult(version, parent_version, [],
+                               traceback.format_exc(), warnings)
+    finally:
+        upgraded.close()
+        fresh.close()
+
+
+def rehearse_package(base_dir, package_name=None, processes=None):
+    """
+    Rehearse the upgrade to every version of the package that has a parent.
+
+    :param processes: the number of worker processes; defaults to the number
+        of CPUs.  With 1, the rehearsals run in this process.
+    :rtype: list[RehearsalResult]
+    """
+    _init_worker(base_dir, package_name)
+    package = _WORKER_STATE['package']
+    assert isinstance(package, SchemaPackage)
+    versions = []
+    for branch in package.branches:
+        if branch.parent is not None:
+            versions.append(branch.version)
+    versions.sort()
+    versions = [str(version) for version in versions]
+    if processes == 1 or len(versions) <= 1:
+        return [_rehearse_version(version) for version in versions]
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (base_dir, package_name))
+    try:
+        return pool.map(_rehearse_version, versions)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# The package loaded by this worker process.
+_WORKER_STATE = {}
+
+
+def _init_worker(base_dir, package_name):
+    if _WORKER_STATE.get('key') == (base_dir, package_name):
+        return
+    gens = get_generator(PLATFORM)
+    if len(gens) <= 0:
+        raise Exception("no generator found for " + PLATFORM)
+    _WORKER_STATE['key'] = (base_dir, package_name)
+    _WORKER_STATE['package'] = load_package(base_dir, package_name)
+    _WORKER_STATE['generator'] = gens[0]
+    _WORKER_STATE['version_table'] = load_version_table(base_dir)
+
+
+def _rehearse_version(version_name):
+    package = _WORKER_STATE['package']
+    for branch in package.branches:
+        if branch.version.is_version(version_name):
+            return rehearse_branch(package, _WORKER_STATE['generator'],
+                                   branch, _WORKER_STATE['version_table'])
+    raise Exception("no version " + version_name + " in package " +
+                    package.package)
+
+
+def _read_columns(cursor, table_name):
+    ret = {}
+    cursor.execute('PRAGMA table_info(' + _quote_name(table_name) + ')')
+    for cid, name, col_type, not_null, default, pk in cursor.fetchall():
+        ret[name] = (str(col_type).upper(), bool(not_null), default, pk)
+    return ret
+
+
+def _read_foreign_keys(cursor, table_name):
+    keys = {}
+    cursor.execute('PRAGMA foreign_key_list(' + _quote_name(table_name) + ')')
+    for row in cursor.fetchall():
+        fk_id, seq, ref_table, from_col, to_col, on_update, on_delete = row[:7]
+        keys.setdefault(fk_id, []).append(
+            (seq, ref_table, from_col, to_col, on_update, on_delete))
+    ret = {}
+    for columns in keys.values():
+        columns.sort()
+        name = ','.join(col[2] for col in columns)
+        ret[name] = tuple(col[1:] for col in columns)
+    return ret
+
+
+def _read_indexes(cursor, table_name):
+    ret = {}
+    cursor.execute('PRAGMA index_list(' + _quote_name(table_name) + ')')
+    for row in cursor.fetchall():
+        name, unique = row[1], row[2]
+        origin = row[3] if len(row) > 3 else 'c'
+        cursor.execute('PRAGMA index_info(' + _quote_name(name) + ')')
+        columns = tuple(col[2] for col in sorted(cursor.fetchall()))
+        if origin != 'c':
+            name = origin + '(' + ','.join(columns) + ')'
+        ret[name] = (bool(unique), columns)
+    return ret
+
+
+def _normalize_sql(sql):
+    return WHITESPACE_PATTERN.sub(' ', sql or '').strip()
+
+
+def _quote_name(name):
+    return '"' + name.replace('"', '""') + '"'
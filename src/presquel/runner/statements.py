@@ -0,0 +1,137 @@
+"""
+Splits the generated scripts into the individual statements, as DB-API
+connections run one statement at a time.
+"""
+
+import re
+
+
+DEFAULT_DELIMITER = ';'
+
+# "delimiter //" lines, as understood by the mysql client.
+DELIMITER_PATTERN = re.compile(r'^\s*delimiter\s+(\S+)\s*$', re.IGNORECASE)
+
+# SQLite triggers contain ';' inside their BEGIN ... END block.
+TRIGGER_PATTERN = re.compile(
+    r'^\s*CREATE\s+(TEMP\s+|TEMPORARY\s+)?TRIGGER\b', re.IGNORECASE)
+END_PATTERN = re.compile(r'\bEND\s*$', re.IGNORECASE)
+
+
+def split_sql_statements(script):
+    """
+    Split the script into its statements, without their delimiter or
+    comments.  Understands quoted text, "--" and "/* */" comments, the mysql
+    client "delimiter" command, and SQLite trigger bodies.
+
+    :param script: str
+    :rtype: list[str]
+    """
+    assert isinstance(script, str)
+    ret = []
+    delimiter = DEFAULT_DELIMITER
+    current = []
+    for line in script.splitlines(True):
+        if len(_strip_comments(''.join(current)).strip()) <= 0:
+            match = DELIMITER_PATTERN.match(line)
+            if match:
+                delimiter = match.group(1)
+                current = []
+                continue
+        current.append(line)
+        text = ''.join(current)
+        statements, rest = _split_text(text, delimiter)
+        ret.extend(statements)
+        current = [rest]
+    last = _strip_comments(''.join(current)).strip()
+    if len(last) > 0:
+        ret.append(last)
+    return ret
+
+
+def _split_text(text, delimiter):
+    """
+    Split off every complete statement in the text.
+
+    :return: (the statements, the remaining text)
+    """
+    statements = []
+    start = 0
+    pos = 0
+    quote = None
+    length = len(text)
+    while pos < length:
+        c = text[pos]
+        if quote is not None:
+            if c == '\\' and quote != '`':
+                pos += 2
+                continue
+            if c == quote:
+                quote = None
+            pos += 1
+        elif c in ('"', "'", '`'):
+            quote = c
+            pos += 1
+        elif text.startswith('--', pos):
+            end = text.find('\n', pos)
+            if end < 0:
+                # The comment runs to the end of the text, which can still
+                # grow; wait for the rest of the line.
+                break
+            pos = end + 1
+        elif text.startswith('/*', pos):
+            end = text.find('*/', pos + 2)
+            if end < 0:
+                break
+            pos = end + 2
+        elif text.startswith(delimiter, pos):
+            statement = _strip_comments(text[start:pos]).strip()
+            if (delimiter == DEFAULT_DELIMITER and
+                    TRIGGER_PATTERN.match(statement) and
+                    not END_PATTERN.search(statement)):
+                # Still in the trigger body.
+                pos += len(delimiter)
+                continue
+            if len(statement) > 0:
+                statements.append(statement)
+            pos += len(delimiter)
+            start = pos
+        else:
+            pos += 1
+    return statements, text[start:]
+
+
+def _strip_comments(text):
+    """
+    Remove the comments that are outside of quoted text.
+    """
+    parts = []
+    pos = 0
+    quote = None
+    start = 0
+    length = len(text)
+    while pos < length:
+        c = text[pos]
+        if quote is not None:
+            if c == '\\' and quote != '`':
+                pos += 2
+                continue
+            if c == quote:
+                quote = None
+            pos += 1
+        elif c in ('"', "'", '`'):
+            quote = c
+            pos += 1
+        elif text.startswith('--', pos) or text.startswith('/*', pos):
+            parts.append(text[start:pos])
+            if c == '-':
+                end = text.find('\n', pos)
+                pos = length if end < 0 else end + 1
+            else:
+                end = text.find('*/', pos + 2)
+                pos = length if end < 0 else end + 2
+            parts.append(' ')
+            start = pos
+        else:
+            pos += 1
+    parts.append(text[start:])
+    return ''.join(parts)
@@ -0,0 +1,608 @@
+"""
+Upgrades a database to a version of a schema package.
+
+The installed version is read from a version table, and the steps from
+there to the requested version are run in order.  Each step is recorded in
+a step table in the same transaction that runs it, so a failed run resumes
+at the step that failed.
+
+The tables are configured by the "version table" entry in the package's
+_manifest.yaml:
+
+    manifest:
+    - version table:
+        create:
+        - CREATE TABLE IF NOT EXISTS ...
+        query: SELECT Version FROM VERSION WHERE Product = {package}
+        insert: INSERT INTO VERSION (Product, Version) VALUES (
+            {package}, {version})
+        step query: ...
+        step insert: ...
+
+The {package}, {version}, {step} and {name} placeholders are replaced with
+quoted values.
+"""
+
+from ..model.base import (SqlTemplate)
+from ..model.version import (SchemaPackage, SchemaBranch, SchemaVersionNumber)
+from ..model.change import (Change)
+from ..schemagen.base import (SchemaScriptGenerator)
+from ..schemagen.upgrade import (BranchUpgradeAnalysis, UpgradeAnalysis)
+from ..schemagen.dependencies import (build_upgrade_graph)
+from .statements import (split_sql_statements)
+from yaml import load as load_yaml
+from concurrent.futures import (ThreadPoolExecutor, wait, FIRST_COMPLETED)
+import threading
+import os
+
+
+MANIFEST_FILE_NAME = '_manifest.yaml'
+
+DEFAULT_VERSION_TABLE_CREATE = (
+    'CREATE TABLE IF NOT EXISTS PRESQUEL_VERSION ('
+    'Package VARCHAR(255) NOT NULL, Version VARCHAR(64) NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS PRESQUEL_UPGRADE_STEP ('
+    'Package VARCHAR(255) NOT NULL, Version VARCHAR(64) NOT NULL, '
+    'Step INTEGER NOT NULL, Name VARCHAR(255))',
+)
+DEFAULT_VERSION_QUERY = (
+    'SELECT Version FROM PRESQUEL_VERSION WHERE Package = {package}')
+DEFAULT_VERSION_INSERT = (
+    'INSERT INTO PRESQUEL_VERSION (Package, Version) '
+    'VALUES ({package}, {version})')
+DEFAULT_STEP_QUERY = (
+    'SELECT Step FROM PRESQUEL_UPGRADE_STEP '
+    'WHERE Package = {package} AND Version = {version}')
+DEFAULT_STEP_INSERT = (
+    'INSERT INTO PRESQUEL_UPGRADE_STEP (Package, Version, Step, Name) '
+    'VALUES ({package}, {version}, {step}, {name})')
+
+
+class VersionTable(object):
+    """
+    The sql that reads and records the installed version, and the completed
+    steps of the version being installed.
+    """
+    def __init__(self, create=DEFAULT_VERSION_TABLE_CREATE,
+                 query=DEFAULT_VERSION_QUERY, insert=DEFAULT_VERSION_INSERT,
+                 step_query=DEFAULT_STEP_QUERY,
+                 step_insert=DEFAULT_STEP_INSERT):
+        """
+        :param create: the statements that create the tables, if they don't
+            exist.
+        :type create: tuple[str] or list[str]
+        """
+        object.__init__(self)
+        if isinstance(create, str):
+            create = [create]
+        self.create = tuple(create)
+        self.query = SqlTemplate(query)
+        self.insert = SqlTemplate(insert)
+        self.step_query = SqlTemplate(step_query)
+        self.step_insert = SqlTemplate(step_insert)
+
+
+def load_version_table(package_dir):
+    """
+    Read the version table definition from the package's manifest, or use
+    the default tables if it has none.
+
+    :rtype: VersionTable
+    """
+    manifest_file = os.path.join(package_dir, MANIFEST_FILE_NAME)
+    if not os.path.isfile(manifest_file):
+        return VersionTable()
+    with open(manifest_file, 'r', encoding='UTF-8') as stream:
+        manifest = load_yaml(stream)
+    if isinstance(manifest, dict):
+        manifest = manifest.get('manifest', [])
+    if not isinstance(manifest, list):
+        raise Exception("manifest must be a list, in " + manifest_file)
+    for entry in manifest:
+        if not isinstance(entry, dict):
+            continue
+        for key, val in entry.items():
+            if _strip_key(key) != 'versiontable':
+                continue
+            if not isinstance(val, dict):
+                raise Exception("version table must be a dictionary, in " +
+                                manifest_file)
+            kwargs = {}
+            for name, sql in val.items():
+                name = _strip_key(name)
+                if name == 'create':
+                    kwargs['create'] = sql
+                elif name == 'query':
+                    kwargs['query'] = sql
+                elif name == 'insert':
+                    kwargs['insert'] = sql
+                elif name == 'stepquery':
+                    kwargs['step_query'] = sql
+                elif name == 'stepinsert':
+                    kwargs['step_insert'] = sql
+                else:
+                    raise Exception("unknown version table key " + name +
+                                    ", in " + manifest_file)
+            return VersionTable(**kwargs)
+    return VersionTable()
+
+
+class UpgradeStep(object):
+    """
+    One generated change of a version upgrade (or one schema object of a new
+    install), which runs in a single transaction.
+    """
+    def __init__(self, version, index, name, scripts, source=None):
+        """
+        :type version: SchemaVersionNumber
+        :type scripts: list[str]
+        :param source: the analysis, change or schema object that the
+            scripts are generated from.
+        :type source: UpgradeAnalysis or Change or SchemaObject
+        """
+        object.__init__(self)
+        assert isinstance(version, SchemaVersionNumber)
+        self.version = version
+        self.index = index
+        self.name = name
+        self.scripts = tuple(scripts)
+        self.source = source
+
+    @property
+    def statements(self):
+        """
+        :rtype: list[str]
+        """
+        ret = []
+        for script in self.scripts:
+            ret.extend(split_sql_statements(script))
+        return ret
+
+    def __str__(self):
+        return str(self.version) + ' #' + str(self.index) + ' ' + self.name
+
+
+def find_upgrade_path(package, current_version, target_version=None):
+    """
+    Find the branches to upgrade through, from the branch after the current
+    version up to the target version.
+
+    :param current_version: the installed version, or None for a new install,
+        which only needs the target branch.
+    :param target_version: the version to upgrade to; defaults to the newest.
+    :rtype: list[SchemaBranch]
+    """
+    assert isinstance(package, SchemaPackage)
+    if target_version is None:
+        target = package.get_newest_version()
+    else:
+        target = package.get_version(target_version)
+    if target is None:
+        raise Exception("no version " + str(target_version) + " in package " +
+                        package.package)
+    assert isinstance(target, SchemaBranch)
+    if current_version is None:
+        return [target]
+
+    ret = []
+    branch = target
+    while branch is not None and branch.version != current_version:
+        ret.insert(0, branch)
+        branch = branch.parent
+    if branch is None:
+        raise Exception("version " + str(target.version) +
+                        " is not an upgrade of the installed version " +
+                        str(current_version))
+    return ret
+
+
+def get_upgrade_problems(package, current_version, target_version=None):
+    """
+    Find the problems that stop the upgrade from the current version to the
+    target version, with the same checks as genUpgradeSql.py: the errors in
+    each version along the way (and in the current version), and the errors
+    and warnings in the upgrade changes.
+
+    :rtype: list[str]
+    """
+    assert isinstance(package, SchemaPackage)
+    ret = []
+    for number in package.unresolved_branch_versions:
+        ret.append("package references unknown version number " +
+                   str(number))
+    path = find_upgrade_path(package, current_version, target_version)
+    versions = [branch.schema_version for branch in path]
+    if current_version is not None and len(path) > 0:
+        versions.insert(0, path[0].parent.schema_version)
+    for schema_version in versions:
+        for prb in schema_version.problems:
+            if prb.is_error:
+                ret.append("({}) {}".format(schema_version.version, prb))
+    if current_version is not None:
+        for branch in path:
+            upgrade_set = BranchUpgradeAnalysis(branch).upgrade_set
+            if upgrade_set is None:
+                continue
+            for prb in list(upgrade_set.errors) + list(upgrade_set.warnings):
+                ret.append("({}) {}".format(branch.version, prb))
+    return ret
+
+
+def get_upgrade_warnings(package, current_version, target_version=None):
+    """
+    Find the warnings in the versions the upgrade installs, such as the
+    index problems the loader finds.  They don't stop the upgrade.
+
+    :rtype: list[str]
+    """
+    assert isinstance(package, SchemaPackage)
+    ret = []
+    for branch in find_upgrade_path(package, current_version, target_version):
+        for prb in branch.schema_version.problems:
+            if not prb.is_error:
+                ret.append("({}) {}".format(branch.version, prb))
+    return ret
+
+
+def plan_upgrade(package, generator, current_version, target_version=None):
+    """
+    Generate the steps to move from the current version to the target version.
+    Raises an exception if the upgrade has problems.
+
+    :rtype: list[UpgradeStep]
+    """
+    assert isinstance(generator, SchemaScriptGenerator)
+    problems = get_upgrade_problems(package, current_version, target_version)
+    if len(problems) > 0:
+        raise Exception("cannot upgrade " + package.package + ":\n  " +
+                        "\n  ".join(problems))
+    ret = []
+    for branch in find_upgrade_path(package, current_version, target_version):
+        if current_version is None:
+            for schema in branch.schema_version.schema:
+                ret.append(UpgradeStep(
+                    branch.version, len(ret), schema.name,
+                    generator.generate_base(schema), schema))
+            continue
+        analysis = BranchUpgradeAnalysis(branch)
+        index = 0
+        for change in analysis.changes:
+            if isinstance(change, UpgradeAnalysis):
+                name = change.name
+            else:
+                assert isinstance(change, Change)
+                name = 'change'
+            ret.append(UpgradeStep(branch.version, index, name,
+                                   generator.generate_upgrade(change),
+                                   change))
+            index += 1
+    return ret
+
+
+class UpgradeRunner(object):
+    """
+    Runs the upgrade steps over a DB-API connection.
+
+    The steps are batched into transactions of steps_per_commit steps; each
+    step is recorded in the step table within its transaction, so a batch
+    that fails is rolled back and run again on the next run.  Some databases
+    (such as MySql) commit on each DDL statement, in which case a failed step
+    can leave some of its statements applied.  A step with statements that
+    must run outside of a transaction (see
+    SchemaScriptGenerator.split_non_transactional) is a batch of its own.
+
+    run_parallel runs the steps over several connections, following the
+    dependencies between the steps.
+    """
+    def __init__(self, connection, package, generator, version_table=None,
+                 steps_per_commit=1, begin_statement=None, log=None):
+        """
+        :param connection: DB-API 2.0 connection
+        :param begin_statement: the statement that starts a transaction, for
+            connections that don't start one on their own (such as sqlite3
+            connections with isolation_level None).
+        :param log: function called with a message for each step.
+        """
+        object.__init__(self)
+        assert isinstance(package, SchemaPackage)
+        assert isinstance(generator, SchemaScriptGenerator)
+        assert steps_per_commit >= 1
+        self.__connection = connection
+        self.__package = package
+        self.__generator = generator
+        self.__version_table = version_table or VersionTable()
+        self.__steps_per_commit = steps_per_commit
+        self.__begin_statement = begin_statement
+        self.__log = log or (lambda message: None)
+        self.__prepared = False
+
+    @property
+    def package(self):
+        return self.__package
+
+    def get_installed_version(self):
+        """
+        The newest installed version of the package, or None if it isn't
+        installed.
+
+        :rtype: SchemaVersionNumber
+        """
+        self.__prepare()
+        ret = None
+        for row in self.__query(self.__version_table.query, {}):
+            version = self.__find_version(str(row[0]))
+            if version is not None and (ret is None or version > ret):
+                ret = version
+        return ret
+
+    def get_completed_steps(self, version):
+        """
+        :rtype: set[int]
+        """
+        self.__prepare()
+        return set(int(row[0]) for row in self.__query(
+            self.__version_table.step_query, {'version': str(version)}))
+
+    def plan(self, target_version=None):
+        """
+        :rtype: list[UpgradeStep]
+        """
+        return plan_upgrade(self.__package, self.__generator,
+                            self.get_installed_version(), target_version)
+
+    def run(self, target_version=None):
+        """
+        Upgrade the database to the target version, skipping the steps
+        already recorded by an earlier run.
+
+        :return: the steps that ran.
+        :rtype: list[UpgradeStep]
+        """
+        steps = self.plan(target_version)
+        ret = []
+        completed = {}
+        batch = []
+        for step in steps:
+            key = str(step.version)
+            if key not in completed:
+                completed[key] = self.get_completed_steps(step.version)
+            if step.index in completed[key]:
+                self.__log("skipping completed step " + str(step))
+                continue
+            split = self.__generator.split_non_transactional(step.statements)
+            if len(split[0]) > 0 or len(split[2]) > 0:
+                if len(batch) > 0:
+                    self.__run_batch(batch)
+                    ret.extend(batch)
+                    batch = []
+                self.__run_batch([step])
+                ret.append(step)
+                continue
+            batch.append(step)
+            if len(batch) >= self.__steps_per_commit:
+                self.__run_batch(batch)
+                ret.extend(batch)
+                batch = []
+        if len(batch) > 0:
+            self.__run_batch(batch)
+            ret.extend(batch)
+
+        for version_steps in _group_by_version(steps):
+            self.__record_version(version_steps[0].version)
+        return ret
+
+    def run_parallel(self, connect, jobs, target_version=None):
+        """
+        Upgrade the database like run, but run the steps of each version that
+        don't depend on each other at the same time, each over its own
+        connection.  Every step is its own transaction, whatever the
+        steps_per_commit.  The versions still run one after the other.
+
+        :param connect: function that opens a new DB-API connection to the
+            same database; it is called once for each job.
+        :param jobs: the number of steps to run at the same time.
+        :return: the steps that ran.
+        :rtype: list[UpgradeStep]
+        """
+        assert jobs >= 1
+        steps = self.plan(target_version)
+        local = threading.local()
+        lock = threading.Lock()
+        connections = []
+
+        def run_step(step):
+            if not hasattr(local, 'connection'):
+                local.connection = connect()
+                with lock:
+                    connections.append(local.connection)
+            with lock:
+                self.__log("running step " + str(step))
+            before, statements, after = (
+                self.__generator.split_non_transactional(step.statements))
+            _run_in_transaction(
+                local.connection, self.__begin_statement,
+                statements + [self.__render_step_insert(step)],
+                before, after, self.__generator.is_check_statement)
+
+        ret = []
+        executor = ThreadPoolExecutor(jobs)
+        try:
+            for version_steps in _group_by_version(steps):
+                ret.extend(self.__run_graph(executor, run_step, version_steps))
+                self.__record_version(version_steps[0].version)
+        finally:
+            executor.shutdown()
+            for connection in connections:
+                connection.close()
+        return ret
+
+    def __run_graph(self, executor, run_step, steps):
+        graph = build_upgrade_graph([step.source for step in steps])
+        completed = self.get_completed_steps(steps[0].version)
+        waiting = {}
+        for node in graph.nodes:
+            assert steps[node.index].index == node.index
+            if node.index in completed:
+                self.__log("skipping completed step " + str(steps[node.index]))
+            else:
+                waiting[node.index] = set(node.depends_on) - completed
+        ret = []
+        running = {}
+        failure = None
+        while len(waiting) > 0 or len(running) > 0:
+            if failure is None:
+                for index in sorted(waiting):
+                    if len(waiting[index]) <= 0:
+                        del waiting[index]
+                        future = executor.submit(run_step, steps[index])
+                        running[future] = index
+            if len(running) <= 0:
+                break
+            finished, not_finished = wait(
+                running.keys(), return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = running.pop(future)
+                if future.exception() is not None:
+                    if failure is None:
+                        failure = future.exception()
+                    continue
+                ret.append(steps[index])
+                for depends_on in waiting.values():
+                    depends_on.discard(index)
+        if failure is not None:
+            raise failure
+        return ret
+
+    def __record_version(self, version):
+        self.__in_transaction([
+            self.__render(self.__version_table.insert,
+                          {'version': str(version)})])
+        self.__log("installed version " + str(version))
+
+    def __run_batch(self, batch):
+        before = []
+        statements = []
+        after = []
+        for step in batch:
+            self.__log("running step " + str(step))
+            step_before, step_statements, step_after = (
+                self.__generator.split_non_transactional(step.statements))
+            before.extend(step_before)
+            statements.extend(step_statements)
+            statements.append(self.__render_step_insert(step))
+            after.extend(step_after)
+        _run_in_transaction(self.__connection, self.__begin_statement,
+                            statements, before, after,
+                            self.__generator.is_check_statement)
+
+    def __render_step_insert(self, step):
+        return self.__render(self.__version_table.step_insert, {
+            'version': str(step.version), 'step': str(step.index),
+            'name': step.name})
+
+    def __in_transaction(self, statements):
+        _run_in_transaction(self.__connection, self.__begin_statement,
+                            statements)
+
+    def __prepare(self):
+        if self.__prepared:
+            return
+        self.__in_transaction(self.__version_table.create)
+        self.__prepared = True
+
+    def __query(self, template, values):
+        cursor = self.__connection.cursor()
+        try:
+            cursor.execute(self.__render(template, values))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def __render(self, template, values):
+        return render_version_sql(template, self.__package.package, values)
+
+    def __find_version(self, name):
+        for version in self.__package.get_versions():
+            if version.is_version(name):
+                return version
+        return None
+
+
+def render_version_sql(template, package_name, values):
+    """
+    Fill in the placeholders of one of the version table's statements.
+
+    :param values: the version, step and name values, as str.
+    :rtype: str
+    """
+    assert isinstance(template, SqlTemplate)
+    quoted = {'package': _quote(package_name)}
+    for key, val in values.items():
+        if key == 'step':
+            quoted[key] = val
+        else:
+            quoted[key] = _quote(val)
+    template.validate(quoted.keys())
+    return template.render(quoted)
+
+
+def _run_in_transaction(connection, begin_statement, statements, before=(),
+                        after=(), is_check=None):
+    """
+    Run the statements in one transaction, with the before statements run
+    ahead of it and the after statements run once it ends, whether it
+    commits or not.
+
+    :param is_check: function that tells if a statement is a check, which
+        rolls back the transaction when it returns any row.
+    """
+    cursor = connection.cursor()
+    try:
+        for statement in before:
+            cursor.execute(statement)
+        try:
+            if begin_statement is not None:
+                cursor.execute(begin_statement)
+            for statement in statements:
+                cursor.execute(statement)
+                if is_check is not None and is_check(statement):
+                    rows = cursor.fetchall()
+                    if len(rows) > 0:
+                        raise Exception("check failed with " +
+                                        str(len(rows)) + " row(s), such as " +
+                                        repr(tuple(rows[0])) + ": " +
+                                        statement)
+            connection.commit()
+        except:
+            connection.rollback()
+            raise
+        finally:
+            for statement in after:
+                cursor.execute(statement)
+    finally:
+        cursor.close()
+
+
+def _group_by_version(steps):
+    """
+    Split the steps into the steps of each version, in order.
+
+    :rtype: list[list[UpgradeStep]]
+    """
+    ret = []
+    for step in steps:
+        if len(ret) <= 0 or ret[-1][0].version != step.version:
+            ret.append([])
+        ret[-1].append(step)
+    return ret
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _strip_key(key):
+    assert isinstance(key, str)
+    for c in ' \r\n\t_-':
+        key = key.replace(c, '')
+    return key.lower()
@@ -12,9 +12,13 @@ but instead produces scripts that can be used.
 
 from .base import *
 from .mysql import *
+from .sqlite import *
 from .upgrade import *
+from .alter import *
+from .dependencies import *
+from .estimate import *
 
-GENERATORS = (MySqlScriptGenerator(), )
+GENERATORS = (MySqlScriptGenerator(), SqliteScriptGenerator())
 
 
 def get_generator(platforms):
@@ -0,0 +1,455 @@
+"""
+Breaks a table upgrade down into the individual alter operations needed to
+move the table from the previous version to the current version.
+
+This is platform independent; the platform generators decide how each
+operation turns into SQL, and what that costs on the server.
+"""
+
+from ..model.change import (SchemaChange, RENAME_CHANGE, REMOVE_CHANGE)
+from ..model.base import (COLUMN_TYPE)
+from ..model.schema import (
+    Table, Column, Constraint, NamedConstraint, ValueTypeValue)
+from ..model.indexes import (
+    get_index_constraints, INDEX_CONSTRAINT_TYPES,
+    PRIMARY_KEY_CONSTRAINT_TYPES)
+from .upgrade import (TableUpgradeAnalysis)
+
+
+class AlterOperationType(object):
+    """
+    Describes the kind of alter operation.  Should be considered an enum.
+
+    The phase defines the order in which the operations must run: constraint
+    removal first, followed by column removal, then column rename, then column
+    modification and addition, then the remaining constraint changes.
+    """
+    def __init__(self, name: str, phase: int):
+        object.__init__(self)
+        self.__name = name
+        self.__phase = phase
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def phase(self) -> int:
+        return self.__phase
+
+    def __str__(self):
+        return self.__name
+
+
+CREATE_TABLE_OPERATION = AlterOperationType('create table', 0)
+DROP_TABLE_OPERATION = AlterOperationType('drop table', 0)
+RENAME_TABLE_OPERATION = AlterOperationType('rename table', 0)
+DROP_FOREIGN_KEY_OPERATION = AlterOperationType('drop foreign key', 1)
+DROP_INDEX_OPERATION = AlterOperationType('drop index', 1)
+DROP_COLUMN_OPERATION = AlterOperationType('drop column', 2)
+RENAME_COLUMN_OPERATION = AlterOperationType('rename column', 3)
+MODIFY_COLUMN_OPERATION = AlterOperationType('modify column', 4)
+ADD_COLUMN_OPERATION = AlterOperationType('add column', 4)
+REPLACE_PRIMARY_KEY_OPERATION = AlterOperationType('replace primary key', 5)
+DROP_PRIMARY_KEY_OPERATION = AlterOperationType('drop primary key', 5)
+ADD_PRIMARY_KEY_OPERATION = AlterOperationType('add primary key', 5)
+ADD_INDEX_OPERATION = AlterOperationType('add index', 6)
+ADD_FOREIGN_KEY_OPERATION = AlterOperationType('add foreign key', 7)
+ALTER_OPERATION_TYPES = (
+    CREATE_TABLE_OPERATION, DROP_TABLE_OPERATION, RENAME_TABLE_OPERATION,
+    DROP_FOREIGN_KEY_OPERATION, DROP_INDEX_OPERATION, DROP_COLUMN_OPERATION,
+    RENAME_COLUMN_OPERATION, MODIFY_COLUMN_OPERATION, ADD_COLUMN_OPERATION,
+    REPLACE_PRIMARY_KEY_OPERATION, DROP_PRIMARY_KEY_OPERATION,
+    ADD_PRIMARY_KEY_OPERATION, ADD_INDEX_OPERATION, ADD_FOREIGN_KEY_OPERATION)
+
+# The kinds of column modifications.
+TYPE_MODIFICATION = 'type'
+NULLABLE_MODIFICATION = 'nullable'
+DEFAULT_MODIFICATION = 'default'
+AUTO_INCREMENT_MODIFICATION = 'autoincrement'
+
+
+class AlterOperation(object):
+    """
+    A single, atomic change to a table.
+    """
+    def __init__(self, operation_type: AlterOperationType, table_name: str,
+                 column: Column or None=None,
+                 before_column: Column or None=None,
+                 constraint: Constraint or None=None,
+                 before_constraint: Constraint or None=None,
+                 column_names: tuple or list or None=None,
+                 modifications: tuple or list or None=None,
+                 previous_column: Column or None=None,
+                 is_trailing: bool=True):
+        """
+        :param previous_column: for added columns, the column that the new
+            column is placed after, or None if it is the first column.
+        :param is_trailing: for added columns, True if the column, and every
+            column after it, is new; that is, the column is appended to the
+            end of the table.
+        :type column_names: tuple[str] or list[str] or None
+        :type modifications: tuple[str] or list[str] or None
+        """
+        object.__init__(self)
+        assert isinstance(operation_type, AlterOperationType)
+        assert isinstance(table_name, str)
+        self.__operation_type = operation_type
+        self.__table_name = table_name
+        self.__column = column
+        self.__before_column = before_column
+        self.__constraint = constraint
+        self.__before_constraint = before_constraint
+        self.__column_names = tuple(column_names or [])
+        self.__modifications = tuple(modifications or [])
+        self.__previous_column = previous_column
+        self.__is_trailing = is_trailing
+
+    @property
+    def operation_type(self) -> AlterOperationType:
+        return self.__operation_type
+
+    @property
+    def table_name(self) -> str:
+        return self.__table_name
+
+    @property
+    def column(self) -> Column or None:
+        """
+        The column as it will be after the operation runs.
+        """
+        return self.__column
+
+    @property
+    def before_column(self) -> Column or None:
+        """
+        The column as it was before the operation runs.
+        """
+        return self.__before_column
+
+    @property
+    def constraint(self) -> Constraint or None:
+        """
+        The index or key constraint as it will be after the operation runs.
+        """
+        return self.__constraint
+
+    @property
+    def before_constraint(self) -> Constraint or None:
+        """
+        The index or key constraint as it was before the operation runs.
+        """
+        return self.__before_constraint
+
+    @property
+    def column_names(self) -> tuple:
+        """
+        For index operations, the indexed column names.
+
+        :rtype: tuple[str]
+        """
+        return self.__column_names
+
+    @property
+    def modifications(self) -> tuple:
+        """
+        For modify column operations, what was changed about the column.
+
+        :rtype: tuple[str]
+        """
+        return self.__modifications
+
+    @property
+    def previous_column(self) -> Column or None:
+        return self.__previous_column
+
+    @property
+    def is_trailing(self) -> bool:
+        return self.__is_trailing
+
+    @property
+    def phase(self) -> int:
+        return self.__operation_type.phase
+
+    @property
+    def description(self) -> str:
+        """
+        A short, human readable description of the operation.
+        """
+        ret = self.__operation_type.name
+        if self.__column is not None:
+            ret += ' ' + self.__column.name
+        elif self.__before_column is not None:
+            ret += ' ' + self.__before_column.name
+        elif (self.__constraint is not None or
+                self.__before_constraint is not None):
+            cst = self.__constraint or self.__before_constraint
+            if isinstance(cst, NamedConstraint):
+                ret += ' ' + cst.name
+            ret += ' (' + ', '.join(self.__column_names) + ')'
+        if (self.__operation_type == RENAME_COLUMN_OPERATION and
+                self.__before_column is not None):
+            ret += ' (was ' + self.__before_column.name + ')'
+        if len(self.__modifications) > 0:
+            ret += ' [' + ', '.join(self.__modifications) + ']'
+        return ret
+
+    def __str__(self):
+        return self.__table_name + ': ' + self.description
+
+
+class TableAlterAnalysis(object):
+    """
+    Compares the before and after versions of a table from a
+    TableUpgradeAnalysis, and computes the ordered list of alter operations.
+    """
+    def __init__(self, upgrade: TableUpgradeAnalysis):
+        object.__init__(self)
+        assert isinstance(upgrade, TableUpgradeAnalysis)
+        self.__upgrade = upgrade
+
+        before = upgrade.before
+        after = upgrade.after
+        if after is not None and not isinstance(after, Table):
+            # A remove change.
+            after = None
+        assert before is None or isinstance(before, Table)
+
+        ops = []
+        if before is None:
+            ops.append(AlterOperation(CREATE_TABLE_OPERATION, after.name))
+            self.__table_name = after.name
+        elif after is None:
+            ops.append(AlterOperation(DROP_TABLE_OPERATION, before.name))
+            self.__table_name = before.name
+        else:
+            self.__table_name = after.name
+            if before.name != after.name:
+                ops.append(AlterOperation(RENAME_TABLE_OPERATION, after.name))
+            ops.extend(_diff_tables(before, after))
+
+        # Stable sort, so the operations stay in column order within a phase.
+        ops.sort(key=lambda x: x.phase)
+        self.__operations = tuple(ops)
+
+    @property
+    def upgrade(self) -> TableUpgradeAnalysis:
+        return self.__upgrade
+
+    @property
+    def table_name(self) -> str:
+        """
+        The name of the table after the upgrade.
+        """
+        return self.__table_name
+
+    @property
+    def operations(self) -> tuple:
+        """
+        :rtype: tuple[AlterOperation]
+        """
+        return self.__operations
+
+    def has_operations(self) -> bool:
+        return len(self.__operations) > 0
+
+
+def is_column_nullable(column: Column) -> bool:
+    """
+    Columns allow null unless they have a "not null" constraint.
+    """
+    for cst in column.constraints:
+        if cst.constraint_type == 'notnull':
+            return False
+    return True
+
+
+def _diff_tables(before: Table, after: Table) -> list:
+    """
+    :rtype: list[AlterOperation]
+    """
+    table_name = after.name
+    ops = []
+
+    # Explicit column removals and renames.
+    removed_names = []
+    for change in after.changes:
+        if (isinstance(change, SchemaChange) and
+                change.object_type == COLUMN_TYPE and
+                change.change_type == REMOVE_CHANGE):
+            removed_names.append(change.previous_name)
+    renamed_from = {}
+    for col in after.columns:
+        for change in col.changes:
+            if (isinstance(change, SchemaChange) and
+                    change.change_type == RENAME_CHANGE):
+                renamed_from[col.name] = change.previous_name
+
+    before_columns = {}
+    for col in before.columns:
+        before_columns[col.name] = col
+    after_names = [col.name for col in after.columns]
+
+    # before name -> after name
+    column_name_map = {}
+    matched_before = []
+    for idx in range(len(after.columns)):
+        col = after.columns[idx]
+        previous_name = renamed_from.get(col.name, col.name)
+        if (previous_name in before_columns and
+                previous_name not in removed_names):
+            prev = before_columns[previous_name]
+            matched_before.append(previous_name)
+            column_name_map[previous_name] = col.name
+            if previous_name != col.name:
+                ops.append(AlterOperation(
+                    RENAME_COLUMN_OPERATION, table_name, column=col,
+                    before_column=prev))
+            modifications = _column_modifications(prev, col)
+            if len(modifications) > 0:
+                ops.append(AlterOperation(
+                    MODIFY_COLUMN_OPERATION, table_name, column=col,
+                    before_column=prev, modifications=modifications))
+        else:
+            previous_column = None
+            if idx > 0:
+                previous_column = after.columns[idx - 1]
+            is_trailing = True
+            for later in after.columns[idx + 1:]:
+                later_name = renamed_from.get(later.name, later.name)
+                if (later_name in before_columns and
+                        later_name not in removed_names):
+                    is_trailing = False
+                    break
+            ops.append(AlterOperation(
+                ADD_COLUMN_OPERATION, table_name, column=col,
+                previous_column=previous_column, is_trailing=is_trailing))
+
+    for col in before.columns:
+        if col.name not in matched_before:
+            ops.append(AlterOperation(
+                DROP_COLUMN_OPERATION, table_name, before_column=col))
+    dropped_columns = [col.name for col in before.columns
+                       if col.name not in matched_before]
+
+    # Indexes and keys.  Match up the before constraints by identity (the
+    # constraint name, or its type and columns if it isn't named), with the
+    # column names translated through any column renames.
+    before_indexes = {}
+    for cst, column_names in get_index_constraints(before):
+        column_names = tuple(column_name_map.get(name, name)
+                             for name in column_names)
+        before_indexes[_constraint_key(cst, column_names)] = (cst, column_names)
+    after_indexes = {}
+    after_order = []
+    for cst, column_names in get_index_constraints(after):
+        key = _constraint_key(cst, column_names)
+        after_indexes[key] = (cst, column_names)
+        after_order.append(key)
+
+    before_pk = None
+    after_pk = None
+    for key, (cst, column_names) in before_indexes.items():
+        if cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+            before_pk = (cst, column_names)
+    for key, (cst, column_names) in after_indexes.items():
+        if cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+            after_pk = (cst, column_names)
+
+    for key, (cst, column_names) in before_indexes.items():
+        if cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+            continue
+        if (key in after_indexes and
+                _same_constraint(cst, column_names, *after_indexes[key])):
+            continue
+        if (len(column_names) > 0 and
+                set(column_names).issubset(dropped_columns) and
+                cst.constraint_type != 'foreignkey'):
+            # Dropping all of the columns removes the index, too.
+            continue
+        if cst.constraint_type == 'foreignkey':
+            ops.append(AlterOperation(
+                DROP_FOREIGN_KEY_OPERATION, table_name,
+                before_constraint=cst, column_names=column_names))
+        else:
+            ops.append(AlterOperation(
+                DROP_INDEX_OPERATION, table_name,
+                before_constraint=cst, column_names=column_names))
+
+    if before_pk is not None and after_pk is not None:
+        if not _same_constraint(before_pk[0], before_pk[1], *after_pk):
+            ops.append(AlterOperation(
+                REPLACE_PRIMARY_KEY_OPERATION, table_name,
+                constraint=after_pk[0], before_constraint=before_pk[0],
+                column_names=after_pk[1]))
+    elif before_pk is not None:
+        if not set(before_pk[1]).issubset(dropped_columns):
+            ops.append(AlterOperation(
+                DROP_PRIMARY_KEY_OPERATION, table_name,
+                before_constraint=before_pk[0], column_names=before_pk[1]))
+    elif after_pk is not None:
+        ops.append(AlterOperation(
+            ADD_PRIMARY_KEY_OPERATION, table_name,
+            constraint=after_pk[0], column_names=after_pk[1]))
+
+    for key in after_order:
+        cst, column_names = after_indexes[key]
+        if cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+            continue
+        if (key in before_indexes and
+                _same_constraint(cst, column_names, *before_indexes[key])):
+            continue
+        if cst.constraint_type == 'foreignkey':
+            ops.append(AlterOperation(
+                ADD_FOREIGN_KEY_OPERATION, table_name,
+                constraint=cst, column_names=column_names))
+        else:
+            ops.append(AlterOperation(
+                ADD_INDEX_OPERATION, table_name,
+                constraint=cst, column_names=column_names))
+
+    return ops
+
+
+def _column_modifications(before: Column, after: Column) -> list:
+    """
+    :rtype: list[str]
+    """
+    ret = []
+    if (before.value_type.strip().upper() !=
+            after.value_type.strip().upper()):
+        ret.append(TYPE_MODIFICATION)
+    if is_column_nullable(before) != is_column_nullable(after):
+        ret.append(NULLABLE_MODIFICATION)
+    if (_value_type_value_key(before.default_value) !=
+            _value_type_value_key(after.default_value)):
+        ret.append(DEFAULT_MODIFICATION)
+    if bool(before.auto_increment) != bool(after.auto_increment):
+        ret.append(AUTO_INCREMENT_MODIFICATION)
+    return ret
+
+
+def _value_type_value_key(vtv: ValueTypeValue or None) -> tuple or None:
+    if vtv is None:
+        return None
+    computed = None
+    if vtv.computed_value is not None:
+        computed = tuple(sql.sql for sql in vtv.computed_value.get())
+    return (vtv.str_value, vtv.numeric_value, vtv.boolean_value,
+            vtv.date_value, computed)
+
+
+def _constraint_key(cst: Constraint, column_names: tuple) -> tuple:
+    if isinstance(cst, NamedConstraint):
+        return 'name', cst.name
+    return 'type', cst.constraint_type, tuple(column_names)
+
+
+def _same_constraint(before: Constraint, before_columns: tuple,
+                     after: Constraint, after_columns: tuple) -> bool:
+    if before.constraint_type != after.constraint_type:
+        return False
+    if tuple(before_columns) != tuple(after_columns):
+        return False
+    return (sorted((k, repr(v)) for k, v in before.details.items()) ==
+            sorted((k, repr(v)) for k, v in after.details.items()))
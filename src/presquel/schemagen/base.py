@@ -2,9 +2,10 @@
 Base classes used for the generation of code based on the model objects.
 """
 
-from ..model.base import (SqlSet)
+from ..model.base import (SqlSet, SqlTemplate)
 from ..model.schema import (SchemaObject, View, Table, Sequence, Procedure)
-from ..model.change import (Change, SqlChange)
+from ..model.change import (
+    Change, SqlChange, CHUNK_START_ARGUMENT, CHUNK_END_ARGUMENT)
 from .upgrade import (
     UpgradeAnalysis, TableUpgradeAnalysis, ViewUpgradeAnalysis,
     SequenceUpgradeAnalysis, ProcedureUpgradeAnalysis
@@ -12,6 +13,29 @@ from .upgrade import (
 from .upgrade_change import (TopLevelUpgradeChanges, UpgradeChange)
 
 
+def parse_server_version(version: str) -> tuple:
+    """
+    Parse a database server version string, such as "5.7.22" or
+    "8.0.30-log", into a comparable tuple of 3 ints.
+
+    :rtype: tuple[int]
+    """
+    assert isinstance(version, str)
+    parts = []
+    for part in version.strip().split('.')[0:3]:
+        digits = ''
+        for c in part:
+            if not c.isdigit():
+                break
+            digits += c
+        if len(digits) <= 0:
+            raise Exception("invalid server version: " + version)
+        parts.append(int(digits))
+    while len(parts) < 3:
+        parts.append(0)
+    return tuple(parts)
+
+
 class UpgradeSchemaPlatformGenerator(object):
     """
     Base class for performing upgrades.
@@ -53,17 +77,87 @@ class SchemaScriptGenerator(object):
         """
         raise NotImplementedError("not implemented")
 
-    def _get_sql_for_platform(self, sql_set: SqlSet) -> str:
+    def _get_sql_for_platform(self, sql_set: SqlSet) -> str or None:
+        """
+        Finds the sql text in the SqlSet for this generator's platform.
+
+        :return: the sql text, or None if the set has no sql for the platform.
+        """
         raise NotImplementedError()
 
-    def generate_base(self, top_object) -> list:
+    def for_server_version(self, server_version: tuple):
+        """
+        Returns a generator that targets the given database server version.
+        Generators that don't change their output based on the server version
+        return themselves.
+
+        :type server_version: tuple[int]
+        :rtype: SchemaScriptGenerator
+        """
+        return self
+
+    def generate_upgrade_report(self, changes: list) -> list:
+        """
+        Describes how the database server will run the upgrade for the list
+        of changes, so that expensive operations can be reviewed before the
+        upgrade runs.  Default implementation has nothing to report.
+
+        :type changes: list[UpgradeChange]
+        :rtype: list[str]
+        """
+        return []
+
+    def generate_checkpoint(self, done_condition: str, statements: list,
+                            record: str) -> list:
+        """
+        Wraps the statements of one upgrade step, so that they only run when
+        the done condition is false, followed by the record statement that
+        makes the condition true.  This lets a single script be run again
+        after a failure, skipping the steps that completed.
+
+        :param done_condition: sql boolean expression
+        :param statements: the step's statements, without their delimiter.
+        :type statements: list[str]
+        :param record: the statement that records the step as done.
+        :rtype: list[str]
+        """
+        raise NotImplementedError("not implemented")
+
+    def split_non_transactional(self, statements: list) -> tuple:
+        """
+        Separate the statements of one upgrade step that have no effect
+        inside a transaction, and so must run before the transaction starts
+        or after it ends.
+
+        :param statements: the step's statements, without their delimiter.
+        :type statements: list[str]
+        :return: (statements to run before the transaction, statements to
+            run in the transaction, statements to run after it)
+        :rtype: tuple[list[str], list[str], list[str]]
+        """
+        return [], list(statements), []
+
+    def is_check_statement(self, statement: str) -> bool:
+        """
+        True if the upgrade statement is a check that returns the rows which
+        break a constraint, so the upgrade must fail if it returns any.
+
+        :param statement: the statement, without its delimiter.
+        """
+        return False
+
+    def generate_base(self, top_object, defer_indexes: bool=False) -> list:
         """
 
         :param top_object:
+        :param defer_indexes: if True, tables are created with only their
+            primary key; the secondary indexes and foreign keys are left
+            for the `generate_deferred_indexes` script, which runs after
+            the data is bulk loaded.
         :rtype: list[str]
         """
         if isinstance(top_object, SchemaObject):
-            return self._generate_base_schema(top_object)
+            return self._generate_base_schema(top_object, defer_indexes)
         elif isinstance(top_object, Change):
             # Nothing to do for the generation of the base schema with
             # a change
@@ -71,6 +165,19 @@ class SchemaScriptGenerator(object):
         else:
             raise Exception("Cannot generate schema with " + str(top_object))
 
+    def generate_deferred_indexes(self, top_object) -> list:
+        """
+        Generates the script that adds the secondary indexes and foreign keys
+        left out of the base schema when it was generated with
+        `defer_indexes`.  Only tables have deferred indexes.
+
+        :param top_object:
+        :rtype: list[str]
+        """
+        if isinstance(top_object, Table):
+            return self._generate_deferred_indexes_table(top_object)
+        return []
+
     def generate_upgrade(
             self, change: UpgradeChange) -> list:
         """
@@ -84,7 +191,8 @@ class SchemaScriptGenerator(object):
             raise Exception("Cannot generate upgrade schema with " +
                             str(change))
 
-    def _generate_base_schema(self, top_object) -> list:
+    def _generate_base_schema(self, top_object,
+                              defer_indexes: bool=False) -> list:
         """
         Generates the "creation" script for a given schema object.  It does
         not produce the upgrade script.
@@ -93,7 +201,7 @@ class SchemaScriptGenerator(object):
         :rtype: list[str]
         """
         if isinstance(top_object, Table):
-            return self._generate_base_table(top_object)
+            return self._generate_base_table(top_object, defer_indexes)
         elif isinstance(top_object, View):
             return self._generate_base_view(top_object)
         elif isinstance(top_object, Sequence):
@@ -127,10 +235,22 @@ class SchemaScriptGenerator(object):
         else:
             raise Exception("unknown schema " + str(change))
 
-    def _generate_base_table(self, table: Table) -> list:
+    def _generate_base_table(self, table: Table,
+                             defer_indexes: bool=False) -> list:
         """
         Generate the creation script for a Table.
 
+        :param table:
+        :param defer_indexes: only include the primary key.
+        :rtype: list[str]
+        """
+        raise NotImplementedError("not implemented")
+
+    def _generate_deferred_indexes_table(self, table: Table) -> list:
+        """
+        Generate the script that adds the secondary indexes and foreign keys
+        to a Table created with deferred indexes.
+
         :param table:
         :rtype: list[str]
         """
@@ -168,15 +288,50 @@ class SchemaScriptGenerator(object):
         Generates the upgrade sql for a SqlChange object.  This can be called
         if the platforms don't match.
 
-        Default implementation just returns the sql text.
+        Default implementation just returns the sql text, unless the change
+        is chunked.
 
         :param sql_change:
         :rtype: list[str]
         """
-        if self.is_platform(sql_change.sql_set.platforms):
-            return [self._get_sql_for_platform(sql_change.sql_set)]
-        else:
+        sql = self._get_sql_for_platform(sql_change.sql_set)
+        if sql is None:
             return []
+        if sql_change.chunked is not None:
+            return self._generate_upgrade_chunked_sqlchange(sql_change, sql)
+        return [sql]
+
+    def _generate_upgrade_chunked_sqlchange(
+            self, sql_change: SqlChange, sql: str) -> list:
+        """
+        Generates the upgrade sql for a SqlChange that runs over ranges of
+        its key column, with a commit after each range.
+
+        :param sql: the platform sql for the change, which contains the
+            chunk range placeholders.
+        :rtype: list[str]
+        """
+        raise NotImplementedError("not implemented")
+
+    @staticmethod
+    def _render_chunk_range(template: SqlTemplate, chunk_start: str,
+                            chunk_end: str) -> str:
+        """
+        Fill in the chunk range placeholders of a chunked change.
+
+        :param chunk_start: sql for the first key of the range.
+        :param chunk_end: sql for the key just past the range.
+        :return: the change's sql, without its ending ';'.
+        """
+        values = {
+            CHUNK_START_ARGUMENT: chunk_start,
+            CHUNK_END_ARGUMENT: chunk_end,
+        }
+        template.validate(values.keys())
+        sql = template.render(values).strip()
+        if sql.endswith(';'):
+            sql = sql[:-1]
+        return sql
 
     def _generate_upgrade_table(self, table: TableUpgradeAnalysis) -> list:
         """
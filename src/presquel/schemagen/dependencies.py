@@ -0,0 +1,275 @@
+"""
+Finds the dependencies between the steps of an upgrade (or of a new
+install), so that the steps on unrelated objects can run at the same time.
+
+A step must run after another step when:
+
+* its order says so, with the ``before`` and ``after`` lists of object names;
+* it is a table with a foreign key to the other step's table, or the other
+  step's table has a foreign key to it; the steps keep their order, as two
+  tables can reference each other;
+* its sql (for sql changes and views) names the other step's object; or
+* both steps change the same object.
+
+A step with none of these (such as a stored procedure) is not understood
+well enough to run next to anything else, so it waits for all the steps
+before it, and all the steps after it wait for it.
+"""
+
+from ..model.base import (SqlSet, SqlString)
+from ..model.change import (Change, SqlChange)
+from ..model.schema import (SchemaObject, Table, View)
+from .upgrade import (UpgradeAnalysis)
+from .alter import (get_index_constraints)
+import re
+
+
+class UpgradeStepNode(object):
+    """
+    One step of the upgrade, and the steps that must finish before it starts.
+    """
+    def __init__(self, index: int, item):
+        """
+        :param item: the analysis, change or schema object that the step is
+            generated from.
+        :type item: UpgradeAnalysis or Change or SchemaObject
+        """
+        object.__init__(self)
+        self.__index = index
+        self.__item = item
+        self.__depends_on = set()
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def item(self):
+        """
+        :rtype: UpgradeAnalysis or Change or SchemaObject
+        """
+        return self.__item
+
+    @property
+    def name(self) -> str:
+        if isinstance(self.__item, Change):
+            return 'change'
+        return self.__item.name
+
+    @property
+    def order(self):
+        return self.__item.order
+
+    @property
+    def depends_on(self) -> tuple:
+        """
+        The index of each step that must finish before this one starts.
+
+        :rtype: tuple[int]
+        """
+        return tuple(sorted(self.__depends_on))
+
+    def _add_dependency(self, index: int):
+        if index != self.__index:
+            self.__depends_on.add(index)
+
+    def __str__(self):
+        return '#' + str(self.__index) + ' ' + self.name
+
+
+class UpgradeDependencyGraph(object):
+    """
+    The steps of an upgrade, in their sorted order, with the dependencies
+    between them.  The graph has no cycles.
+    """
+    def __init__(self, nodes: list):
+        object.__init__(self)
+        self.__nodes = tuple(nodes)
+        self.__waves = _find_waves(self.__nodes)
+
+    @property
+    def nodes(self) -> tuple:
+        """
+        :rtype: tuple[UpgradeStepNode]
+        """
+        return self.__nodes
+
+    @property
+    def waves(self) -> tuple:
+        """
+        The steps grouped so that each group only depends on the groups
+        before it; the steps in one group can all run at the same time.
+
+        :rtype: tuple[tuple[int]]
+        """
+        return self.__waves
+
+    def get_dependents(self, index: int) -> tuple:
+        """
+        The steps that wait for the given step.
+
+        :rtype: tuple[int]
+        """
+        return tuple(node.index for node in self.__nodes
+                     if index in node.depends_on)
+
+    def to_json(self, files: list or tuple or None=None) -> dict:
+        """
+        The machine readable form of the graph.
+
+        :param files: the file name of each step's script, or None for steps
+            that generate no script.
+        """
+        steps = []
+        for node in self.__nodes:
+            step = {
+                'step': node.index,
+                'name': node.name,
+                'order': list(node.order.items()),
+                'dependsOn': list(node.depends_on),
+            }
+            if files is not None:
+                step['file'] = files[node.index]
+            steps.append(step)
+        return {
+            'steps': steps,
+            'waves': [list(wave) for wave in self.__waves],
+        }
+
+
+def build_upgrade_graph(items: list or tuple) -> UpgradeDependencyGraph:
+    """
+    Find the dependencies between the steps.
+
+    :param items: the steps, in the order they would run one at a time; as
+        returned by ``BranchUpgradeAnalysis.changes``, or the schema of a
+        version.
+    :type items: list[UpgradeAnalysis or Change or SchemaObject]
+    """
+    nodes = [UpgradeStepNode(i, items[i]) for i in range(len(items))]
+
+    defined_by = {}
+    for node in nodes:
+        for name in _defined_names(node.item):
+            defined_by.setdefault(name.lower(), []).append(node.index)
+
+    def steps_defining(name):
+        return defined_by.get(name.lower(), [])
+
+    for node in nodes:
+        # Steps that change the same object keep their order.
+        for name in _defined_names(node.item):
+            for other in steps_defining(name):
+                if other < node.index:
+                    node._add_dependency(other)
+
+        order = node.order
+        for name in order.occurs_after:
+            for other in steps_defining(name):
+                node._add_dependency(other)
+        for name in order.occurs_before:
+            for other in steps_defining(name):
+                nodes[other]._add_dependency(node.index)
+
+        tables = _tables(node.item)
+        sql_sets = _sql_sets(node.item)
+        if len(tables) > 0:
+            for table in tables:
+                for referenced in _foreign_key_tables(table):
+                    for other in steps_defining(referenced):
+                        if other < node.index:
+                            node._add_dependency(other)
+                        else:
+                            nodes[other]._add_dependency(node.index)
+        elif len(sql_sets) > 0:
+            text = ' '.join(_sql_texts(sql_sets))
+            if isinstance(node.item, SqlChange) and node.item.chunked:
+                text += ' ' + node.item.chunked.table_name
+            for name, others in defined_by.items():
+                if not _names_object(text, name):
+                    continue
+                for other in others:
+                    if other < node.index:
+                        node._add_dependency(other)
+                    else:
+                        nodes[other]._add_dependency(node.index)
+        else:
+            for other in nodes:
+                if other.index < node.index:
+                    node._add_dependency(other.index)
+                elif other.index > node.index:
+                    other._add_dependency(node.index)
+
+    return UpgradeDependencyGraph(nodes)
+
+
+def _find_waves(nodes: tuple) -> tuple:
+    done = set()
+    ret = []
+    while len(done) < len(nodes):
+        wave = tuple(
+            node.index for node in nodes
+            if node.index not in done and
+            all(dep in done for dep in node.depends_on))
+        if len(wave) <= 0:
+            raise Exception(
+                "upgrade steps depend on each other: " + ', '.join(
+                    str(node) for node in nodes if node.index not in done))
+        done.update(wave)
+        ret.append(wave)
+    return tuple(ret)
+
+
+def _defined_names(item) -> list:
+    ret = []
+    if isinstance(item, UpgradeAnalysis):
+        for obj in (item.before, item.after):
+            if isinstance(obj, SchemaObject) and obj.name not in ret:
+                ret.append(obj.name)
+    elif isinstance(item, SchemaObject):
+        ret.append(item.name)
+    return ret
+
+
+def _tables(item) -> list:
+    if isinstance(item, UpgradeAnalysis):
+        return [obj for obj in (item.before, item.after)
+                if isinstance(obj, Table)]
+    if isinstance(item, Table):
+        return [item]
+    return []
+
+
+def _sql_sets(item) -> list:
+    if isinstance(item, SqlChange):
+        return [item.sql_set]
+    if isinstance(item, UpgradeAnalysis):
+        return [obj.select_query for obj in (item.before, item.after)
+                if isinstance(obj, View)]
+    if isinstance(item, View):
+        return [item.select_query]
+    return []
+
+
+def _sql_texts(sql_sets: list) -> list:
+    ret = []
+    for sql_set in sql_sets:
+        assert isinstance(sql_set, SqlSet)
+        for sql in sql_set.get():
+            assert isinstance(sql, SqlString)
+            ret.append(sql.sql)
+    return ret
+
+
+def _foreign_key_tables(table: Table) -> list:
+    ret = []
+    for cst, column_names in get_index_constraints(table):
+        if cst.constraint_type == 'foreignkey' and 'table' in cst.details:
+            if cst.details['table'] not in ret:
+                ret.append(cst.details['table'])
+    return ret
+
+
+def _names_object(text: str, name: str) -> bool:
+    return re.search(r'\b' + re.escape(name) + r'\b', text,
+                     re.IGNORECASE) is not None
@@ -0,0 +1,330 @@
+"""
+Estimates how much I/O each step of a MySql upgrade does, and how long it
+takes, from the row counts and average row sizes of the tables.
+
+Each step is classified as:
+
+* metadata only: the server changes the table definition without touching
+  the rows (instant alters, renames, dropping an index, creating a table);
+* index build: the server reads the table and writes the new index entries;
+* full copy: the server rebuilds the table, reading and writing every row;
+* data migration: a sql change, which is assumed to read and write every
+  row of each table it names.
+
+The durations are a rough guide from a single I/O rate, not a prediction;
+they are meant for finding the steps that need a maintenance window.
+"""
+
+from ..model.base import (SqlString)
+from ..model.change import (SqlChange)
+from ..model.schema import (SchemaObject)
+from .upgrade import (TableUpgradeAnalysis, UpgradeAnalysis)
+from .alter import (ADD_INDEX_OPERATION)
+from .mysql import (MySqlScriptGenerator, OnlineDdlStep, INSTANT_ALGORITHM)
+import json
+import re
+
+
+METADATA_ONLY_STEP = 'metadata only'
+INDEX_BUILD_STEP = 'index build'
+FULL_COPY_STEP = 'full copy'
+DATA_MIGRATION_STEP = 'data migration'
+
+# 50 MiB per second.
+DEFAULT_IO_RATE = 50 * 1024 * 1024
+
+# Bytes written for each row of a new secondary index.
+DEFAULT_INDEX_ENTRY_SIZE = 32
+
+
+class TableStatistics(object):
+    """
+    The size of one table before the upgrade.
+    """
+    def __init__(self, name: str, rows: int, avg_row_size: int):
+        object.__init__(self)
+        assert isinstance(name, str)
+        assert rows >= 0 and avg_row_size >= 0
+        self.__name = name
+        self.__rows = rows
+        self.__avg_row_size = avg_row_size
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def rows(self) -> int:
+        return self.__rows
+
+    @property
+    def avg_row_size(self) -> int:
+        return self.__avg_row_size
+
+    @property
+    def size(self) -> int:
+        """
+        The bytes of row data in the table.
+        """
+        return self.__rows * self.__avg_row_size
+
+
+class UpgradeStatistics(object):
+    """
+    The table statistics, and the rates used to turn them into a duration.
+    """
+    def __init__(self, tables: list or tuple, io_rate: int=DEFAULT_IO_RATE,
+                 index_entry_size: int=DEFAULT_INDEX_ENTRY_SIZE):
+        """
+        :type tables: list[TableStatistics]
+        :param io_rate: bytes read or written each second.
+        """
+        object.__init__(self)
+        assert io_rate > 0
+        self.__tables = {}
+        for table in tables:
+            assert isinstance(table, TableStatistics)
+            self.__tables[table.name.lower()] = table
+        self.__io_rate = io_rate
+        self.__index_entry_size = index_entry_size
+
+    @property
+    def tables(self) -> tuple:
+        """
+        :rtype: tuple[TableStatistics]
+        """
+        return tuple(self.__tables.values())
+
+    @property
+    def io_rate(self) -> int:
+        return self.__io_rate
+
+    @property
+    def index_entry_size(self) -> int:
+        return self.__index_entry_size
+
+    def get_table(self, name: str) -> TableStatistics or None:
+        return self.__tables.get(name.lower())
+
+
+def load_statistics(filename: str) -> UpgradeStatistics:
+    """
+    Read the statistics file, which is JSON in the form:
+
+        {
+            "ioRate": 52428800,
+            "indexEntrySize": 32,
+            "tables": {
+                "PRICE": { "rows": 1200000, "avgRowSize": 180 }
+            }
+        }
+
+    Only "tables" is required.  The row counts and sizes match the
+    TABLE_ROWS and AVG_ROW_LENGTH columns of MySql's
+    information_schema.TABLES.
+    """
+    with open(filename, 'r', encoding='UTF-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get('tables'), dict):
+        raise Exception("statistics must have a 'tables' dictionary, in " +
+                        filename)
+    tables = []
+    for name, stats in data['tables'].items():
+        if (not isinstance(stats, dict) or 'rows' not in stats or
+                'avgRowSize' not in stats):
+            raise Exception("table " + name + " must have 'rows' and " +
+                            "'avgRowSize' values, in " + filename)
+        tables.append(TableStatistics(
+            name, int(stats['rows']), int(stats['avgRowSize'])))
+    return UpgradeStatistics(
+        tables,
+        int(data.get('ioRate', DEFAULT_IO_RATE)),
+        int(data.get('indexEntrySize', DEFAULT_INDEX_ENTRY_SIZE)))
+
+
+class StepEstimate(object):
+    """
+    The estimated cost of one step of the upgrade.
+    """
+    def __init__(self, change_name: str, kind: str, description: str,
+                 io_bytes: int, seconds: float, tables: list or tuple,
+                 missing_tables: list or tuple):
+        """
+        :param tables: the names of the tables the step reads or writes.
+        :param missing_tables: the tables that have no statistics; the step
+            costs at least as much as the estimate.
+        """
+        object.__init__(self)
+        self.__change_name = change_name
+        self.__kind = kind
+        self.__description = description
+        self.__io_bytes = io_bytes
+        self.__seconds = seconds
+        self.__tables = tuple(tables)
+        self.__missing_tables = tuple(missing_tables)
+
+    @property
+    def change_name(self) -> str:
+        return self.__change_name
+
+    @property
+    def kind(self) -> str:
+        return self.__kind
+
+    @property
+    def description(self) -> str:
+        return self.__description
+
+    @property
+    def io_bytes(self) -> int:
+        return self.__io_bytes
+
+    @property
+    def seconds(self) -> float:
+        return self.__seconds
+
+    @property
+    def tables(self) -> tuple:
+        return self.__tables
+
+    @property
+    def missing_tables(self) -> tuple:
+        return self.__missing_tables
+
+
+def estimate_upgrade(generator: MySqlScriptGenerator, changes: list,
+                     statistics: UpgradeStatistics) -> list:
+    """
+    Estimate each step of the upgrade, with the most expensive step first.
+
+    :param changes: as returned by ``BranchUpgradeAnalysis.changes``
+    :rtype: list[StepEstimate]
+    """
+    assert isinstance(generator, MySqlScriptGenerator)
+    assert isinstance(statistics, UpgradeStatistics)
+    ret = []
+    for change in changes:
+        if isinstance(change, TableUpgradeAnalysis):
+            for step in generator.classify_upgrade(change):
+                ret.append(_estimate_table_step(change, step, statistics))
+        elif isinstance(change, SqlChange):
+            ret.append(_estimate_sql_change(change, statistics))
+        elif isinstance(change, UpgradeAnalysis):
+            ret.append(_make_estimate(
+                change.name, METADATA_ONLY_STEP, 'replaced', 0, [], [],
+                statistics))
+    ret.sort(key=lambda est: est.io_bytes, reverse=True)
+    return ret
+
+
+def format_estimates(estimates: list, statistics: UpgradeStatistics) -> list:
+    """
+    :rtype: list[str]
+    """
+    ret = ['Upgrade estimate at ' + _format_bytes(statistics.io_rate) +
+           ' per second']
+    total_bytes = 0
+    total_seconds = 0.0
+    missing = []
+    for est in estimates:
+        assert isinstance(est, StepEstimate)
+        total_bytes += est.io_bytes
+        total_seconds += est.seconds
+        flag = '??' if len(est.missing_tables) > 0 else '  '
+        ret.append('{0} {1:>9} {2:>10}  {3:<15} {4}: {5}'.format(
+            flag, _format_duration(est.seconds), _format_bytes(est.io_bytes),
+            est.kind, est.change_name, est.description))
+        for name in est.missing_tables:
+            if name not in missing:
+                missing.append(name)
+    ret.append('')
+    ret.append('Total: ' + _format_bytes(total_bytes) + ' of I/O in ' +
+               _format_duration(total_seconds) + ', over ' +
+               str(len(estimates)) + ' step(s)')
+    if len(missing) > 0:
+        ret.append('?? No statistics for ' + ', '.join(missing) +
+                   '; these steps cost more than estimated')
+    return ret
+
+
+def _estimate_table_step(change: TableUpgradeAnalysis, step: OnlineDdlStep,
+                         statistics: UpgradeStatistics) -> StepEstimate:
+    names = [change.name]
+    if (isinstance(change.before, SchemaObject) and
+            change.before.name != change.name):
+        # Renamed; the statistics are for the old name.
+        names.append(change.before.name)
+    table = None
+    for name in names:
+        table = table or statistics.get_table(name)
+    description = step.classification + ' (' + ', '.join(
+        op.description for op in step.operations) + ')'
+
+    if step.algorithm is None or step.algorithm == INSTANT_ALGORITHM:
+        return _make_estimate(change.name, METADATA_ONLY_STEP, description,
+                              0, [change.name], [], statistics)
+    missing = [] if table is not None else [change.name]
+    if step.rebuilds_table or step.is_table_copy:
+        io_bytes = 2 * table.size if table is not None else 0
+        return _make_estimate(change.name, FULL_COPY_STEP, description,
+                              io_bytes, [change.name], missing, statistics)
+    index_count = len([op for op in step.operations
+                       if op.operation_type == ADD_INDEX_OPERATION])
+    if index_count > 0:
+        io_bytes = 0
+        if table is not None:
+            io_bytes = table.size + (
+                index_count * table.rows * statistics.index_entry_size)
+        return _make_estimate(change.name, INDEX_BUILD_STEP, description,
+                              io_bytes, [change.name], missing, statistics)
+    return _make_estimate(change.name, METADATA_ONLY_STEP, description,
+                          0, [change.name], [], statistics)
+
+
+def _estimate_sql_change(change: SqlChange,
+                         statistics: UpgradeStatistics) -> StepEstimate:
+    text = ' '.join(sql.sql for sql in change.sql_set.get()
+                    if isinstance(sql, SqlString))
+    names = []
+    if change.chunked is not None:
+        names.append(change.chunked.table_name)
+    for table in statistics.tables:
+        if table.name not in names and re.search(
+                r'\b' + re.escape(table.name) + r'\b', text, re.IGNORECASE):
+            names.append(table.name)
+    io_bytes = 0
+    missing = []
+    for name in names:
+        table = statistics.get_table(name)
+        if table is None:
+            missing.append(name)
+        else:
+            io_bytes += 2 * table.size
+    description = 'sql change'
+    if change.chunked is not None:
+        description += ', chunked by ' + change.chunked.key_column
+    if len(names) <= 0:
+        description += ' on unknown tables'
+        missing.append('(sql change ' + str(change.order) + ')')
+    return _make_estimate('change', DATA_MIGRATION_STEP, description,
+                          io_bytes, names, missing, statistics)
+
+
+def _make_estimate(change_name, kind, description, io_bytes, tables,
+                   missing_tables, statistics):
+    return StepEstimate(change_name, kind, description, io_bytes,
+                        io_bytes / statistics.io_rate, tables, missing_tables)
+
+
+def _format_bytes(count) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024:
+            return '{0:.1f} {1}'.format(count, unit)
+        count /= 1024.0
+    return '{0:.1f} TiB'.format(count)
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return '{0}:{1:02d}:{2:02d}'.format(
+        seconds // 3600, (seconds // 60) % 60, seconds % 60)
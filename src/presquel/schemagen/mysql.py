@@ -3,21 +3,256 @@ Base classes used for the generation of code based on the model objects.
 """
 
 from ..model.base import (SqlString, SqlSet)
-from ..model.schema import (View, Table, Constraint, NamedConstraint,
+from ..model.change import (SqlChange)
+from ..model.schema import (View, Table, Column, Constraint, NamedConstraint,
     SqlConstraint, LanguageConstraint, ValueTypeValue, ColumnarSchemaObject)
 from .base import (SchemaScriptGenerator)
+from .upgrade import (TableUpgradeAnalysis)
+from .alter import (
+    AlterOperation, TableAlterAnalysis, get_index_constraints,
+    INDEX_CONSTRAINT_TYPES, PRIMARY_KEY_CONSTRAINT_TYPES,
+    CREATE_TABLE_OPERATION, DROP_TABLE_OPERATION, RENAME_TABLE_OPERATION,
+    DROP_FOREIGN_KEY_OPERATION, DROP_INDEX_OPERATION, DROP_COLUMN_OPERATION,
+    RENAME_COLUMN_OPERATION, MODIFY_COLUMN_OPERATION, ADD_COLUMN_OPERATION,
+    REPLACE_PRIMARY_KEY_OPERATION, DROP_PRIMARY_KEY_OPERATION,
+    ADD_PRIMARY_KEY_OPERATION, ADD_INDEX_OPERATION, ADD_FOREIGN_KEY_OPERATION,
+    TYPE_MODIFICATION, NULLABLE_MODIFICATION, AUTO_INCREMENT_MODIFICATION)
 import time
+import re
 
 PLATFORMS = ('mysql',)
 
+# The stored procedure that guards each step of a checkpointed script.
+CHECKPOINT_PROCEDURE_NAME = 'presquel_checkpoint'
+
+# Statements that can't run inside a stored procedure.
+ROUTINE_STATEMENT_PATTERN = re.compile(
+    r'^\s*(CREATE|DROP)\s+(PROCEDURE|FUNCTION|TRIGGER|EVENT)\b',
+    re.IGNORECASE)
+
+# Triggers and events are created and dropped where they appear in the step,
+# outside of the guard, so these statements must be safe to run again.
+CREATE_TRIGGER_PATTERN = re.compile(
+    r'^\s*CREATE\s+(TRIGGER|EVENT)\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w`.]+)',
+    re.IGNORECASE)
+DROP_TRIGGER_PATTERN = re.compile(
+    r'^(\s*DROP\s+(?:TRIGGER|EVENT)\s+)(?!IF\s+EXISTS\b)', re.IGNORECASE)
+
+# Online DDL (ALGORITHM and LOCK clauses) first appeared in 5.6.
+DEFAULT_SERVER_VERSION = (5, 6, 0)
+
+
+class DdlAlgorithm(object):
+    """
+    The algorithm MySql uses to run an ALTER TABLE.  Should be considered an
+    enum.  A higher rank is more disruptive.
+    """
+    def __init__(self, name: str, rank: int):
+        object.__init__(self)
+        self.__name = name
+        self.__rank = rank
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def rank(self) -> int:
+        return self.__rank
+
+    def __str__(self):
+        return self.__name
+
+
+INSTANT_ALGORITHM = DdlAlgorithm('INSTANT', 0)
+INPLACE_ALGORITHM = DdlAlgorithm('INPLACE', 1)
+COPY_ALGORITHM = DdlAlgorithm('COPY', 2)
+
+
+class DdlLock(object):
+    """
+    The concurrent access MySql allows while an ALTER TABLE runs.  Should be
+    considered an enum.  A higher rank is more disruptive.
+    """
+    def __init__(self, name: str, rank: int):
+        object.__init__(self)
+        self.__name = name
+        self.__rank = rank
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def rank(self) -> int:
+        return self.__rank
+
+    def __str__(self):
+        return self.__name
+
+
+NONE_LOCK = DdlLock('NONE', 0)
+SHARED_LOCK = DdlLock('SHARED', 1)
+EXCLUSIVE_LOCK = DdlLock('EXCLUSIVE', 2)
+
+
+class OnlineDdlStep(object):
+    """
+    A single statement in a MySql table upgrade, along with how the server
+    is expected to run it.  The algorithm and lock are None for statements
+    that are not an ALTER TABLE (create, drop, and rename table).
+    """
+    def __init__(self, table_name: str, operations: list or tuple,
+                 algorithm: DdlAlgorithm or None, lock: DdlLock or None,
+                 rebuilds_table: bool, sql: str):
+        """
+        :type operations: list[AlterOperation] or tuple[AlterOperation]
+        """
+        object.__init__(self)
+        assert isinstance(table_name, str)
+        assert algorithm is None or isinstance(algorithm, DdlAlgorithm)
+        assert lock is None or isinstance(lock, DdlLock)
+        self.__table_name = table_name
+        self.__operations = tuple(operations)
+        self.__algorithm = algorithm
+        self.__lock = lock
+        self.__rebuilds_table = rebuilds_table
+        self.__sql = sql
+
+    @property
+    def table_name(self) -> str:
+        return self.__table_name
+
+    @property
+    def operations(self) -> tuple:
+        """
+        :rtype: tuple[AlterOperation]
+        """
+        return self.__operations
+
+    @property
+    def algorithm(self) -> DdlAlgorithm or None:
+        return self.__algorithm
+
+    @property
+    def lock(self) -> DdlLock or None:
+        return self.__lock
+
+    @property
+    def rebuilds_table(self) -> bool:
+        return self.__rebuilds_table
+
+    @property
+    def is_table_copy(self) -> bool:
+        """
+        True if the server copies the whole table, blocking writes while it
+        does so.
+        """
+        return self.__algorithm == COPY_ALGORITHM
+
+    @property
+    def sql(self) -> str:
+        return self.__sql
+
+    @property
+    def classification(self) -> str:
+        """
+        A short, human readable description of how the step runs.
+        """
+        if self.__algorithm is None:
+            return 'metadata only'
+        ret = 'ALGORITHM=' + self.__algorithm.name
+        if self.__lock is not None:
+            ret += ', LOCK=' + self.__lock.name
+        if self.__rebuilds_table:
+            ret += ', rebuilds table'
+        return ret
+
+
+class OnlineDdlReport(object):
+    """
+    Collects the online DDL classification of every step in an upgrade, so
+    that the operations which copy a table can be reviewed before the upgrade
+    runs against a large production table.
+    """
+    def __init__(self, server_version: tuple):
+        object.__init__(self)
+        self.__server_version = tuple(server_version)
+        self.__steps = []
+
+    @property
+    def server_version(self) -> tuple:
+        return self.__server_version
+
+    @property
+    def steps(self) -> tuple:
+        """
+        :rtype: tuple[OnlineDdlStep]
+        """
+        return tuple(self.__steps)
+
+    @property
+    def table_copies(self) -> tuple:
+        """
+        :rtype: tuple[OnlineDdlStep]
+        """
+        return tuple(s for s in self.__steps if s.is_table_copy)
+
+    def add_steps(self, steps: list or tuple):
+        """
+        :type steps: list[OnlineDdlStep] or tuple[OnlineDdlStep]
+        """
+        for step in steps:
+            assert isinstance(step, OnlineDdlStep)
+            self.__steps.append(step)
+
+    def to_lines(self) -> list:
+        """
+        :rtype: list[str]
+        """
+        ret = ['Online DDL report for MySql ' +
+               '.'.join(str(v) for v in self.__server_version)]
+        if self.__server_version < (5, 6, 0):
+            ret.append('  Online DDL is not supported by this server '
+                       'version; every alter copies the table.')
+        for step in self.__steps:
+            flag = '!!' if step.is_table_copy else '  '
+            ret.append(flag + ' ' + step.table_name + ': ' +
+                       step.classification)
+            for op in step.operations:
+                ret.append('      ' + op.description)
+        copies = self.table_copies
+        ret.append('')
+        ret.append(str(len(copies)) + ' of ' + str(len(self.__steps)) +
+                   ' statement(s) copy the table')
+        for step in copies:
+            ret.append('  ' + step.table_name + ': ' + ', '.join(
+                op.description for op in step.operations))
+        return ret
+
 
 class MySqlScriptGenerator(SchemaScriptGenerator):
     """
     Generates MySql syntax for schema generation.
+
+    The server version decides which online DDL algorithms the upgrade
+    scripts may request.
     """
 
-    def __init__(self):
+    def __init__(self, server_version: tuple=DEFAULT_SERVER_VERSION):
         SchemaScriptGenerator.__init__(self)
+        assert isinstance(server_version, tuple)
+        self.__server_version = server_version
+
+    @property
+    def server_version(self) -> tuple:
+        """
+        :rtype: tuple[int]
+        """
+        return self.__server_version
+
+    def for_server_version(self, server_version: tuple):
+        return MySqlScriptGenerator(server_version)
 
     def is_platform(self, platforms):
         """
@@ -32,6 +267,114 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
                 return True
         return False
 
+    def _get_sql_for_platform(self, sql_set):
+        sql_string = sql_set.get_for_platform(PLATFORMS)
+        if sql_string is None:
+            return None
+        assert isinstance(sql_string, SqlString)
+        return sql_string.sql
+
+    def _generate_upgrade_chunked_sqlchange(self, sql_change, sql):
+        """
+        Wraps the change in a temporary stored procedure that walks the key
+        column in ranges of the batch size, committing after each range, so
+        that no single transaction holds locks or undo log for the whole
+        table.
+
+        :param sql_change: SqlChange
+        :param sql: str
+        :return: list(str)
+        """
+        assert isinstance(sql_change, SqlChange)
+        chunked = sql_change.chunked
+        proc_name = 'presquel_chunk_' + '_'.join(
+            str(i) for i in sql_change.order.items())
+        key_column = _parse_name(chunked.key_column)
+        batch_size = str(chunked.batch_size)
+
+        sql = self._render_chunk_range(
+            sql_change.sql_set.get_for_platform(PLATFORMS).template,
+            'chunk_start', '(chunk_start + ' + batch_size + ')')
+
+        return [
+            '-- Chunked change over ' + chunked.table_name + '.' +
+            chunked.key_column + ', ' + batch_size + ' keys per commit\n',
+            'DROP PROCEDURE IF EXISTS ' + proc_name + ';\n' +
+            'delimiter //\n' +
+            'CREATE PROCEDURE ' + proc_name + '()\n' +
+            'BEGIN\n' +
+            '    DECLARE chunk_start BIGINT;\n' +
+            '    DECLARE max_key BIGINT;\n' +
+            '    SELECT MIN(' + key_column + '), MAX(' + key_column +
+            ')\n        INTO chunk_start, max_key\n        FROM ' +
+            _parse_name(chunked.table_name) + ';\n' +
+            '    WHILE chunk_start IS NOT NULL AND chunk_start <= max_key DO\n' +
+            '        START TRANSACTION;\n' +
+            '        ' + sql + ';\n' +
+            '        COMMIT;\n' +
+            '        SET chunk_start = chunk_start + ' + batch_size + ';\n' +
+            '    END WHILE;\n' +
+            'END; //\n' +
+            'delimiter ;\n' +
+            'CALL ' + proc_name + '();\n' +
+            'DROP PROCEDURE ' + proc_name + ';\n'
+        ]
+
+    def generate_checkpoint(self, done_condition, statements, record):
+        """
+        Runs the step from a temporary stored procedure, which checks the
+        done condition first.  Stored routines, triggers and events can't be
+        created or dropped from a stored procedure, so those statements
+        (such as the ones around a chunked change, or the validation
+        triggers) run around the guard.
+
+        :return: list(str)
+        """
+        before = []
+        body = []
+        after = []
+        for statement in statements:
+            # Trigger bodies keep the ';' that ends their last statement.
+            statement = statement.strip().rstrip(';').rstrip()
+            if not ROUTINE_STATEMENT_PATTERN.match(statement):
+                body.append(statement)
+                continue
+            match = CREATE_TRIGGER_PATTERN.match(statement)
+            if match is not None:
+                hoisted = [
+                    'DROP ' + match.group(1).upper() + ' IF EXISTS ' +
+                    match.group(2), statement]
+            else:
+                hoisted = [DROP_TRIGGER_PATTERN.sub(
+                    r'\1IF EXISTS ', statement, 1)]
+            if len(body) > 0 and (
+                    match is not None or
+                    statement.upper().startswith('DROP')):
+                after.extend(hoisted)
+            else:
+                before.extend(hoisted)
+        body.append(record)
+
+        sql = 'delimiter //\n'
+        for statement in before:
+            sql += statement + ' //\n'
+        sql += (
+            'DROP PROCEDURE IF EXISTS ' + CHECKPOINT_PROCEDURE_NAME + ' //\n' +
+            'CREATE PROCEDURE ' + CHECKPOINT_PROCEDURE_NAME + '()\n' +
+            'BEGIN\n' +
+            '    IF NOT (' + done_condition + ') THEN\n')
+        for statement in body:
+            sql += '        ' + statement + ';\n'
+        sql += (
+            '    END IF;\n' +
+            'END //\n' +
+            'CALL ' + CHECKPOINT_PROCEDURE_NAME + '() //\n' +
+            'DROP PROCEDURE ' + CHECKPOINT_PROCEDURE_NAME + ' //\n')
+        for statement in after:
+            sql += statement + ' //\n'
+        sql += 'delimiter ;\n'
+        return [sql]
+
     def _header(self, schema_object):
         """
         Create the header comment for the schema file.
@@ -40,13 +383,15 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
                '\n-- Generated on ' + time.asctime(time.gmtime(time.time())) + \
                '\n\n'
 
-    def _generate_base_table(self, table):
+    def _generate_base_table(self, table, defer_indexes=False):
         """
         Generate the creation script for a Table.
 
         http://dev.mysql.com/doc/refman/5.1/en/create-table.html
 
         :param table: Table
+        :param defer_indexes: only include the primary key; the other indexes
+            and foreign keys are added by _generate_deferred_indexes_table.
         :return: list(str)
         """
         assert isinstance(table, Table)
@@ -71,28 +416,16 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
                 sql += '    '
             else:
                 sql += '\n    , '
-            sql += _parse_name(col.name) + ' ' + _parse_value_type(
-                col.value_type)
+            sql += _generate_column_definition(col)
 
             for cst in col.constraints:
                 if (isinstance(cst, SqlConstraint) and
                         cst.constraint_type == 'inputvalidation'):
                     input_validations.append(cst)
-                if cst.constraint_type == 'notnull':
-                    sql += ' NOT NULL'
-                elif (cst.constraint_type == 'nullable' or
-                        cst.constraint_type == 'null'):
-                    # print("null constraint")
-                    sql += ' NULL'
-
-            if col.default_value is not None:
-                sql += ' DEFAULT ' + _escape_value_type_value(col.default_value)
 
-            if col.auto_increment:
-                sql += ' AUTO_INCREMENT'
-
-            # TODO add COMMENT, COLUMN_FORMAT, STORAGE support
             for cst in col.constraints:
+                if defer_indexes and _is_deferred_constraint(cst):
+                    continue
                 constraint_sql += _generate_base_constraints(
                     table, [col], cst)
 
@@ -104,7 +437,7 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
                     cst.constraint_type in [
                         'valuerestriction', 'validatewrite', 'validate']):
                 input_validations.append(cst)
-            else:
+            elif not (defer_indexes and _is_deferred_constraint(cst)):
                 constraint_sql += _generate_base_constraints(
                     table, cst.get_columns_by_names(table), cst)
 
@@ -123,6 +456,36 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
 
         return [self._header(table), sql]
 
+    def _generate_deferred_indexes_table(self, table):
+        """
+        Add the secondary indexes, followed by the foreign keys, with a
+        single ALTER TABLE so the table is only scanned once.
+
+        :param table: Table
+        :return: list(str)
+        """
+        assert isinstance(table, Table)
+        indexes = []
+        foreign_keys = []
+        for cst, column_names in get_index_constraints(table):
+            if not _is_deferred_constraint(cst):
+                continue
+            columns = [table.get_column_named(name) for name in column_names]
+            clause = _generate_add_constraint(table, columns, cst)
+            if clause is None:
+                continue
+            if cst.constraint_type == 'foreignkey':
+                foreign_keys.append(clause)
+            else:
+                indexes.append(clause)
+        if len(indexes) + len(foreign_keys) <= 0:
+            return []
+        return [
+            '-- Deferred indexes for ' + table.name + '\n' +
+            'ALTER TABLE ' + _parse_name(table.table_name) + '\n    ' +
+            '\n    , '.join(indexes + foreign_keys) + ';\n'
+        ]
+
     def _generate_base_view(self, view):
         """
         Generate the creation script for a View.
@@ -162,7 +525,8 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
 
     def _generate_upgrade_table(self, table):
         """
-        Generate the upgrade script for a Table.
+        Generate the upgrade script for a Table.  Each statement is preceded
+        by a comment describing the online DDL algorithm and lock it uses.
 
         :param table:
         :return: list(str)
@@ -170,7 +534,220 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
 
         # FIXME include dropping then recreating the triggers.
 
-        raise Exception("not implemented")
+        steps = self.classify_upgrade(table)
+        if len(steps) <= 0:
+            return []
+        ret = [self._header(table)]
+        for step in steps:
+            sql = '-- ' + step.classification + '\n'
+            for op in step.operations:
+                sql += '--   ' + op.description + '\n'
+            ret.append(sql + step.sql + '\n')
+        return ret
+
+    def generate_upgrade_report(self, changes: list) -> list:
+        report = OnlineDdlReport(self.server_version)
+        for change in changes:
+            report.add_steps(self.classify_upgrade(change))
+        if len(report.steps) <= 0:
+            return []
+        return report.to_lines()
+
+    def classify_upgrade(self, change) -> list:
+        """
+        Split a table upgrade into the statements that run it, grouping
+        together adjacent operations that share the same algorithm and lock
+        into a single ALTER TABLE.  Anything that isn't a table upgrade has
+        no steps.
+
+        :rtype: list[OnlineDdlStep]
+        """
+        if not isinstance(change, TableUpgradeAnalysis):
+            return []
+        alter = TableAlterAnalysis(change)
+        table_name = _parse_name(alter.table_name)
+        after = change.after if isinstance(change.after, Table) else None
+
+        ret = []
+        group = []
+        group_class = None
+        # The old and new names of the columns renamed in the group; the
+        # server resolves every clause against the table as it was before
+        # the ALTER, so a later clause can't use the new name.
+        renamed = set()
+        for op in alter.operations:
+            algorithm, lock, rebuilds = self._classify_operation(op)
+            if algorithm is None:
+                ret.extend(self.__alter_step(table_name, group, group_class))
+                group = []
+                group_class = None
+                renamed = set()
+                ret.append(OnlineDdlStep(
+                    table_name, [op], None, None, False,
+                    self._generate_table_operation(alter, op)))
+                continue
+            op_class = (algorithm, lock, rebuilds)
+            columns = _operation_column_names(op)
+            if group_class is not None and (
+                    group_class[0:2] != op_class[0:2] or
+                    len(renamed & columns) > 0):
+                ret.extend(self.__alter_step(table_name, group, group_class))
+                group = []
+                group_class = None
+                renamed = set()
+            if group_class is None:
+                group_class = op_class
+            elif rebuilds:
+                group_class = (algorithm, lock, True)
+            group.append((op, self._generate_alter_clause(after, op)))
+            if op.operation_type == RENAME_COLUMN_OPERATION:
+                renamed |= columns
+        ret.extend(self.__alter_step(table_name, group, group_class))
+        return ret
+
+    def __alter_step(self, table_name, group, group_class):
+        if len(group) <= 0:
+            return []
+        algorithm, lock, rebuilds = group_class
+        sql = 'ALTER TABLE ' + table_name + '\n    ' + '\n    , '.join(
+            clause for op, clause in group)
+        if self.server_version >= (5, 6, 0):
+            sql += '\n    , ALGORITHM=' + algorithm.name
+            if lock is not None:
+                sql += ', LOCK=' + lock.name
+        return [OnlineDdlStep(table_name, [op for op, clause in group],
+                              algorithm, lock, rebuilds, sql + ';')]
+
+    def _classify_operation(self, op: AlterOperation) -> tuple:
+        """
+        Find how the server runs the operation, based on the online DDL
+        support of the server version.  Statements that are not an
+        ALTER TABLE have no algorithm.
+
+        https://dev.mysql.com/doc/refman/8.0/en/innodb-online-ddl-operations.html
+
+        :return: (algorithm, lock, rebuilds table)
+        :rtype: (DdlAlgorithm or None, DdlLock or None, bool)
+        """
+        assert isinstance(op, AlterOperation)
+        version = self.server_version
+        op_type = op.operation_type
+        if op_type in (CREATE_TABLE_OPERATION, DROP_TABLE_OPERATION,
+                       RENAME_TABLE_OPERATION):
+            return None, None, False
+        if version < (5, 6, 0):
+            return COPY_ALGORITHM, None, True
+
+        if op_type == ADD_COLUMN_OPERATION:
+            if op.column.auto_increment:
+                return INPLACE_ALGORITHM, SHARED_LOCK, True
+            if version >= (8, 0, 29) or (
+                    version >= (8, 0, 12) and op.is_trailing):
+                return INSTANT_ALGORITHM, None, False
+            return INPLACE_ALGORITHM, NONE_LOCK, True
+        if op_type == DROP_COLUMN_OPERATION:
+            if version >= (8, 0, 29):
+                return INSTANT_ALGORITHM, None, False
+            return INPLACE_ALGORITHM, NONE_LOCK, True
+        if op_type == RENAME_COLUMN_OPERATION:
+            if version >= (8, 0, 28):
+                return INSTANT_ALGORITHM, None, False
+            return INPLACE_ALGORITHM, NONE_LOCK, False
+        if op_type == MODIFY_COLUMN_OPERATION:
+            if (TYPE_MODIFICATION in op.modifications or
+                    AUTO_INCREMENT_MODIFICATION in op.modifications):
+                return COPY_ALGORITHM, SHARED_LOCK, True
+            if NULLABLE_MODIFICATION in op.modifications:
+                return INPLACE_ALGORITHM, NONE_LOCK, True
+            # Only the default value changed, which is a metadata change.
+            if version >= (8, 0, 0):
+                return INSTANT_ALGORITHM, None, False
+            return INPLACE_ALGORITHM, NONE_LOCK, False
+        if op_type in (DROP_INDEX_OPERATION, DROP_FOREIGN_KEY_OPERATION):
+            return INPLACE_ALGORITHM, NONE_LOCK, False
+        if op_type == ADD_INDEX_OPERATION:
+            constraint_type = op.constraint.constraint_type
+            if constraint_type.startswith('fulltext'):
+                # The first full text index adds a hidden column.
+                return INPLACE_ALGORITHM, SHARED_LOCK, True
+            if constraint_type.startswith('spatial'):
+                if version >= (5, 7, 0):
+                    return INPLACE_ALGORITHM, SHARED_LOCK, False
+                return COPY_ALGORITHM, SHARED_LOCK, True
+            return INPLACE_ALGORITHM, NONE_LOCK, False
+        if op_type in (ADD_PRIMARY_KEY_OPERATION,
+                       REPLACE_PRIMARY_KEY_OPERATION):
+            return INPLACE_ALGORITHM, NONE_LOCK, True
+        if op_type == DROP_PRIMARY_KEY_OPERATION:
+            return COPY_ALGORITHM, SHARED_LOCK, True
+        if op_type == ADD_FOREIGN_KEY_OPERATION:
+            # In-place only when foreign_key_checks is disabled, which this
+            # tool does not assume.
+            return COPY_ALGORITHM, SHARED_LOCK, True
+        raise Exception("unknown alter operation " + str(op_type))
+
+    def _generate_table_operation(self, alter: TableAlterAnalysis,
+                                  op: AlterOperation) -> str:
+        """
+        Generate the statement for the operations that work on the table as a
+        whole, rather than altering it.
+        """
+        upgrade = alter.upgrade
+        if op.operation_type == CREATE_TABLE_OPERATION:
+            return self._generate_base_table(upgrade.after)[1]
+        if op.operation_type == DROP_TABLE_OPERATION:
+            return 'DROP TABLE ' + _parse_name(upgrade.before.table_name) + ';'
+        if op.operation_type == RENAME_TABLE_OPERATION:
+            return ('RENAME TABLE ' + _parse_name(upgrade.before.table_name) +
+                    ' TO ' + _parse_name(upgrade.after.table_name) + ';')
+        raise Exception("not a table operation: " + str(op.operation_type))
+
+    def _generate_alter_clause(self, table: Table,
+                               op: AlterOperation) -> str:
+        """
+        Generate the ALTER TABLE clause for a single operation.
+        """
+        op_type = op.operation_type
+        if op_type == ADD_COLUMN_OPERATION:
+            sql = 'ADD COLUMN ' + _generate_column_definition(op.column)
+            if not op.is_trailing:
+                if op.previous_column is None:
+                    sql += ' FIRST'
+                else:
+                    sql += ' AFTER ' + _parse_name(op.previous_column.name)
+            return sql
+        if op_type == DROP_COLUMN_OPERATION:
+            return 'DROP COLUMN ' + _parse_name(op.before_column.name)
+        if op_type == RENAME_COLUMN_OPERATION:
+            if self.server_version >= (8, 0, 0):
+                return ('RENAME COLUMN ' + _parse_name(op.before_column.name) +
+                        ' TO ' + _parse_name(op.column.name))
+            # Older servers need the full definition; any other change to
+            # the column is made by a following modify.
+            return ('CHANGE COLUMN ' + _parse_name(op.before_column.name) +
+                    ' ' + _generate_column_definition(
+                        op.before_column, op.column.name))
+        if op_type == MODIFY_COLUMN_OPERATION:
+            return 'MODIFY COLUMN ' + _generate_column_definition(op.column)
+        if op_type == DROP_FOREIGN_KEY_OPERATION:
+            return 'DROP FOREIGN KEY ' + _constraint_name(
+                op.before_constraint, op.column_names)
+        if op_type == DROP_INDEX_OPERATION:
+            return 'DROP INDEX ' + _constraint_name(
+                op.before_constraint, op.column_names)
+        if op_type == DROP_PRIMARY_KEY_OPERATION:
+            return 'DROP PRIMARY KEY'
+        if op_type in (ADD_PRIMARY_KEY_OPERATION, ADD_INDEX_OPERATION,
+                       ADD_FOREIGN_KEY_OPERATION,
+                       REPLACE_PRIMARY_KEY_OPERATION):
+            columns = [table.get_column_named(name)
+                       for name in op.column_names]
+            sql = _generate_add_constraint(table, columns, op.constraint)
+            assert sql is not None
+            if op_type == REPLACE_PRIMARY_KEY_OPERATION:
+                sql = 'DROP PRIMARY KEY, ' + sql
+            return sql
+        raise Exception("unknown alter operation " + str(op_type))
 
     def _generate_upgrade_view(self, view):
         """
@@ -200,6 +777,62 @@ class MySqlScriptGenerator(SchemaScriptGenerator):
         raise Exception("not implemented")
 
 
+def _operation_column_names(op):
+    """
+    The lower case names of the columns an alter operation refers to.
+
+    :rtype: set[str]
+    """
+    assert isinstance(op, AlterOperation)
+    ret = set(name.lower() for name in op.column_names)
+    for col in (op.column, op.before_column, op.previous_column):
+        if isinstance(col, Column):
+            ret.add(col.name.lower())
+    return ret
+
+
+def _generate_column_definition(col, name=None):
+    """
+    The column name and definition, as used by both CREATE TABLE and
+    ALTER TABLE.
+
+    :param col: Column
+    :param name: the name to give the column, if not the column's own name.
+    :return: str
+    """
+    assert isinstance(col, Column)
+    sql = _parse_name(name or col.name) + ' ' + _parse_value_type(
+        col.value_type)
+
+    for cst in col.constraints:
+        if cst.constraint_type == 'notnull':
+            sql += ' NOT NULL'
+        elif (cst.constraint_type == 'nullable' or
+                cst.constraint_type == 'null'):
+            # print("null constraint")
+            sql += ' NULL'
+
+    if col.default_value is not None:
+        sql += ' DEFAULT ' + _escape_value_type_value(col.default_value)
+
+    if col.auto_increment:
+        sql += ' AUTO_INCREMENT'
+
+    # TODO add COMMENT, COLUMN_FORMAT, STORAGE support
+    return sql
+
+
+def _constraint_name(cst, column_names):
+    """
+    The name of the index backing the constraint.  MySql names unnamed indexes
+    after their first column.
+    """
+    if isinstance(cst, NamedConstraint) and cst.name:
+        return _parse_name(cst.name)
+    assert len(column_names) > 0
+    return _parse_name(column_names[0])
+
+
 def _escape_value_type_value(vtv):
     """
 
@@ -210,7 +843,7 @@ def _escape_value_type_value(vtv):
 
     if vtv.str_value is not None:
         # FIXME look at proper escaping
-        return "'" + vtv.str_value.replace("'", "''")
+        return "'" + vtv.str_value.replace("'", "''") + "'"
     elif vtv.boolean_value is not None:
         if vtv.boolean_value:
             return "1"
@@ -397,10 +1030,35 @@ def _generate_base_constraints(table, columns, ct):
     return constraint_sql
 
 
+def _is_deferred_constraint(cst):
+    """
+    Secondary indexes and foreign keys can be added after a bulk load; the
+    primary key stays with the table, because it defines the row layout.
+    """
+    return (cst.constraint_type in INDEX_CONSTRAINT_TYPES and
+            cst.constraint_type not in PRIMARY_KEY_CONSTRAINT_TYPES)
+
+
+def _generate_add_constraint(table, columns, ct):
+    """
+    The ALTER TABLE "ADD" clause for the constraint, or None if the
+    constraint has no schema definition.
+    """
+    sql = _generate_base_constraints(table, columns, ct)
+    if len(sql) <= 0:
+        return None
+    assert sql.startswith('\n    , ')
+    return 'ADD ' + sql[len('\n    , '):]
+
+
 def _generate_validation_triggers(table, csts):
     assert isinstance(table, ColumnarSchemaObject)
     assert len(csts) > 0
 
+    columns = {}
+    for col in table.columns:
+        columns[col.name] = 'NEW.' + col.name
+
     checks = ""
     for cst in csts:
         assert isinstance(cst, SqlConstraint)
@@ -409,10 +1067,11 @@ def _generate_validation_triggers(table, csts):
             msg = cst.details['message']
         sset = cst.sql
         assert isinstance(sset, SqlSet)
-        sval = sset.get_for_platform(PLATFORMS).sql
+        template = sset.get_for_platform(PLATFORMS).template
 
-        for col in table.columns:
-            sval = sval.replace('{' + col.name + '}', 'NEW.' + col.name)
+        # The placeholders are the columns of the new row.
+        template.validate(columns.keys())
+        sval = template.render(columns)
 
         checks += (
             '    IF NOT (' + sval +
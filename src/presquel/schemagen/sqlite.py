@@ -0,0 +1,668 @@
+"""
+Generates SQLite syntax for schema generation, so that a full schema can be
+created in a local (or in-memory) database, such as for tests.
+
+SQLite can't alter most of a table in place.  Column additions, renames and
+drops, and index changes are run directly; anything else rebuilds the table,
+by copying it into a new table with the upgraded definition.
+
+https://www.sqlite.org/lang_altertable.html
+"""
+
+from ..model.base import (SqlString, SqlSet)
+from ..model.change import (SqlChange)
+from ..model.schema import (View, Table, Column, Constraint, NamedConstraint,
+                            SqlConstraint, LanguageConstraint,
+                            ValueTypeValue, ColumnarSchemaObject)
+from .base import (SchemaScriptGenerator)
+from .upgrade import (TableUpgradeAnalysis)
+from .alter import (
+    AlterOperation, TableAlterAnalysis, get_index_constraints,
+    is_column_nullable, PRIMARY_KEY_CONSTRAINT_TYPES,
+    CREATE_TABLE_OPERATION, DROP_TABLE_OPERATION, RENAME_TABLE_OPERATION,
+    DROP_INDEX_OPERATION, DROP_COLUMN_OPERATION, RENAME_COLUMN_OPERATION,
+    ADD_COLUMN_OPERATION, ADD_INDEX_OPERATION)
+import time
+import re
+
+PLATFORMS = ('sqlite',)
+
+# The constraints that are checked on each insert and update, with a trigger.
+VALIDATION_CONSTRAINT_TYPES = (
+    'inputvalidation', 'valuerestriction', 'validatewrite', 'validate')
+
+# Index constraint types that SQLite creates as a separate index.  Full text
+# and spatial indexes need virtual tables in SQLite, so they become plain
+# indexes.
+UNIQUE_INDEX_CONSTRAINT_TYPES = ('uniquekey', 'uniqueindex')
+PLAIN_INDEX_CONSTRAINT_TYPES = (
+    'key', 'index', 'fulltextkey', 'fulltextindex', 'spatialkey',
+    'spatialindex')
+
+# Value type names, by the start of the declared type, mapped to the SQLite
+# type affinity.  https://www.sqlite.org/datatype3.html
+VALUE_TYPE_AFFINITIES = (
+    (('BOOL', 'TINYINT', 'SMALLINT', 'MEDIUMINT', 'BIGINT', 'INT', 'SERIAL',
+      'BIT'), 'INTEGER'),
+    (('NCHAR', 'NVARCHAR', 'VARCHAR', 'CHAR', 'TINYTEXT', 'MEDIUMTEXT',
+      'LONGTEXT', 'TEXT', 'CLOB', 'ENUM', 'SET', 'JSON'), 'TEXT'),
+    (('DATETIME', 'DATE', 'TIMESTAMP', 'TIME', 'YEAR'), 'TEXT'),
+    (('VARBINARY', 'BINARY', 'TINYBLOB', 'MEDIUMBLOB', 'LONGBLOB', 'BLOB'),
+     'BLOB'),
+    (('DOUBLE', 'FLOAT', 'REAL'), 'REAL'),
+    (('DECIMAL', 'NUMERIC', 'DEC', 'FIXED'), 'NUMERIC'),
+)
+
+# Operations that SQLite can run with ALTER TABLE, CREATE INDEX or DROP
+# INDEX.  Anything else rebuilds the table.
+DIRECT_OPERATIONS = (
+    RENAME_TABLE_OPERATION, DROP_INDEX_OPERATION, DROP_COLUMN_OPERATION,
+    RENAME_COLUMN_OPERATION, ADD_COLUMN_OPERATION, ADD_INDEX_OPERATION)
+
+REBUILD_TABLE_PREFIX = 'presquel_new_'
+
+# SQLite ignores a change to the foreign_keys setting inside a transaction.
+FOREIGN_KEYS_PRAGMA_PATTERN = re.compile(
+    r'^\s*PRAGMA\s+foreign_keys\s*=\s*(\w+)\s*;?\s*$', re.IGNORECASE)
+
+# Returns the rows of the table with a foreign key to a missing row.
+FOREIGN_KEY_CHECK_PATTERN = re.compile(
+    r'^\s*PRAGMA\s+foreign_key_check\b', re.IGNORECASE)
+
+
+class SqliteScriptGenerator(SchemaScriptGenerator):
+    """
+    Generates SQLite syntax for schema generation.  The scripts are meant to
+    be run with a script runner, such as sqlite3's executescript.
+    """
+
+    def __init__(self):
+        SchemaScriptGenerator.__init__(self)
+
+    def is_platform(self, platforms):
+        """
+        Checks if this generator is one of the supported platform grammars.
+        The "platforms" variable is produced by the Change.platforms property.
+
+        :param platforms:
+        :return: boolean
+        """
+        for plat in platforms:
+            if plat.strip().lower() in PLATFORMS:
+                return True
+        return False
+
+    def split_non_transactional(self, statements):
+        """
+        A table rebuild turns the foreign keys off, so that dropping the old
+        table doesn't delete or reject the rows that reference it.  That
+        only works outside of a transaction.
+        """
+        before = []
+        during = []
+        after = []
+        for statement in statements:
+            match = FOREIGN_KEYS_PRAGMA_PATTERN.match(
+                _strip_comments(statement))
+            if match is None:
+                during.append(statement)
+            elif match.group(1).upper() in ('ON', 'TRUE', 'YES', '1'):
+                after.append(statement)
+            else:
+                before.append(statement)
+        return before, during, after
+
+    def is_check_statement(self, statement):
+        """
+        The foreign keys are off while a table is rebuilt, so the rebuild
+        checks the rebuilt table's foreign keys itself.  SQLite only returns
+        the broken rows, so the script runner must fail on them.
+        """
+        return FOREIGN_KEY_CHECK_PATTERN.match(
+            _strip_comments(statement)) is not None
+
+    def _get_sql_for_platform(self, sql_set):
+        sql_string = sql_set.get_for_platform(PLATFORMS)
+        if sql_string is None:
+            return None
+        assert isinstance(sql_string, SqlString)
+        return sql_string.sql
+
+    def _generate_upgrade_chunked_sqlchange(self, sql_change, sql):
+        """
+        SQLite has no stored procedures to loop over the key ranges, and
+        only one writer at a time no matter how the change is split up, so
+        the change runs once over the whole key range.
+
+        :param sql_change: SqlChange
+        :param sql: str
+        :return: list(str)
+        """
+        assert isinstance(sql_change, SqlChange)
+        chunked = sql_change.chunked
+        key_column = _parse_name(chunked.key_column)
+        table_name = _parse_name(chunked.table_name)
+
+        sql = self._render_chunk_range(
+            sql_change.sql_set.get_for_platform(PLATFORMS).template,
+            '(SELECT MIN(' + key_column + ') FROM ' + table_name + ')',
+            '(SELECT MAX(' + key_column + ') + 1 FROM ' + table_name + ')')
+        return [
+            '-- Chunked change over ' + chunked.table_name + '.' +
+            chunked.key_column + ', run as a single statement\n',
+            sql + ';\n'
+        ]
+
+    def _header(self, schema_object):
+        """
+        Create the header comment for the schema file.
+        """
+        return '-- Schema for ' + schema_object.name + \
+               '\n-- Generated on ' + time.asctime(time.gmtime(time.time())) + \
+               '\n\n'
+
+    def _generate_base_table(self, table, defer_indexes=False):
+        """
+        Generate the creation script for a Table, followed by its indexes
+        and validation triggers.
+
+        https://www.sqlite.org/lang_createtable.html
+
+        :param table: Table
+        :param defer_indexes: leave out the secondary indexes; they are added
+            by _generate_deferred_indexes_table.  SQLite can't add a foreign
+            key to an existing table, so those stay with the table.
+        :return: list(str)
+        """
+        assert isinstance(table, Table)
+        sql = _generate_create_table(table, _parse_name(table.table_name))
+        if not defer_indexes:
+            sql += _generate_indexes(table)
+        sql += _generate_validation_triggers(table)
+        return [self._header(table), sql]
+
+    def _generate_deferred_indexes_table(self, table):
+        """
+        :param table: Table
+        :return: list(str)
+        """
+        assert isinstance(table, Table)
+        sql = _generate_indexes(table)
+        if len(sql) <= 0:
+            return []
+        return ['-- Deferred indexes for ' + table.name + '\n' + sql]
+
+    def _generate_base_view(self, view):
+        """
+        Generate the creation script for a View.
+
+        :param view:
+        :return: list(str)
+        """
+        assert isinstance(view, View)
+        return [self._header(view), _generate_create_view(view)]
+
+    def _generate_base_sequence(self, sequence):
+        """
+        SQLite has no sequences.
+
+        :param sequence:
+        :return: list(str)
+        """
+        raise Exception("sqlite does not support sequences")
+
+    def _generate_base_procedure(self, procedure):
+        """
+        SQLite has no stored procedures.
+
+        :param procedure:
+        :return: list(str)
+        """
+        raise Exception("sqlite does not support procedures")
+
+    def _generate_upgrade_table(self, table):
+        """
+        Generate the upgrade script for a Table.  The validation triggers are
+        dropped first, and created again after the table changes, as they
+        can reference the changed columns.
+
+        :param table: TableUpgradeAnalysis
+        :return: list(str)
+        """
+        assert isinstance(table, TableUpgradeAnalysis)
+        alter = TableAlterAnalysis(table)
+        if not alter.has_operations():
+            return []
+        before = table.before if isinstance(table.before, Table) else None
+        after = table.after if isinstance(table.after, Table) else None
+        ret = [self._header(table)]
+
+        op_types = [op.operation_type for op in alter.operations]
+        if CREATE_TABLE_OPERATION in op_types:
+            ret.append(self._generate_base_table(after)[1])
+            return ret
+        if before is not None:
+            ret.append(_generate_drop_validation_triggers(before))
+        if DROP_TABLE_OPERATION in op_types:
+            ret.append('DROP TABLE ' + _parse_name(before.table_name) + ';\n')
+            return ret
+
+        if all(_is_direct_operation(before, op) for op in alter.operations):
+            for op in alter.operations:
+                ret.append(_generate_direct_operation(before, after, op))
+        else:
+            ret.append(_generate_rebuild_table(before, after, alter))
+        ret.append(_generate_validation_triggers(after))
+        return ret
+
+    def _generate_upgrade_view(self, view):
+        """
+        Generate the upgrade script for a View, by replacing it.
+
+        :param view:
+        :return: list(str)
+        """
+        ret = [self._header(view)]
+        if isinstance(view.before, View):
+            ret.append('DROP VIEW IF EXISTS ' +
+                       _parse_name(view.before.name) + ';\n')
+        if isinstance(view.after, View):
+            ret.append(_generate_create_view(view.after))
+        return ret
+
+    def _generate_upgrade_sequence(self, sequence):
+        """
+        SQLite has no sequences.
+
+        :param sequence:
+        :return: list(str)
+        """
+        raise Exception("sqlite does not support sequences")
+
+    def _generate_upgrade_procedure(self, procedure):
+        """
+        SQLite has no stored procedures.
+
+        :param procedure:
+        :return: list(str)
+        """
+        raise Exception("sqlite does not support procedures")
+
+
+def _generate_create_table(table, table_name):
+    """
+    The CREATE TABLE statement, with the primary key and foreign keys.  The
+    other indexes are separate statements in SQLite.
+    """
+    assert isinstance(table, Table)
+
+    # An auto increment primary key must be declared with its column.
+    inline_pk = None
+    for cst, column_names in get_index_constraints(table):
+        if (cst.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES and
+                len(column_names) == 1 and
+                table.get_column_named(column_names[0]).auto_increment):
+            inline_pk = cst
+
+    # Note: do not use "IF NOT EXISTS", because that indicates upgrade.
+    sql = 'CREATE TABLE ' + table_name + ' (\n'
+    constraint_sql = ''
+    first = True
+    for col in table.columns:
+        if first:
+            first = False
+            sql += '    '
+        else:
+            sql += '\n    , '
+        is_inline_pk = False
+        for cst in col.constraints:
+            if cst is inline_pk:
+                is_inline_pk = True
+            else:
+                constraint_sql += _generate_table_constraint(table, [col], cst)
+        sql += _generate_column_definition(col, is_inline_pk=is_inline_pk)
+    for cst in table.constraints:
+        assert isinstance(cst, Constraint)
+        if cst is not inline_pk:
+            constraint_sql += _generate_table_constraint(
+                table, cst.get_columns_by_names(table), cst)
+    return sql + constraint_sql + '\n);\n'
+
+
+def _generate_column_definition(col, name=None, is_inline_pk=False):
+    """
+    The column name and definition, as used by both CREATE TABLE and
+    ALTER TABLE.
+
+    :param col: Column
+    :param name: the name to give the column, if not the column's own name.
+    :param is_inline_pk: the column is the auto increment primary key.
+    :return: str
+    """
+    assert isinstance(col, Column)
+    if is_inline_pk:
+        # Only an INTEGER PRIMARY KEY can auto increment.
+        return _parse_name(name or col.name) + \
+            ' INTEGER PRIMARY KEY AUTOINCREMENT'
+    sql = _parse_name(name or col.name) + ' ' + _parse_value_type(
+        col.value_type)
+    if not is_column_nullable(col):
+        sql += ' NOT NULL'
+    if col.default_value is not None:
+        sql += ' DEFAULT ' + _escape_value_type_value(col.default_value)
+    return sql
+
+
+def _generate_table_constraint(table, columns, ct):
+    """
+    The CREATE TABLE clause for the primary key, foreign key, and native
+    constraints.  Other constraints are created separately, if at all.
+    """
+    assert isinstance(ct, Constraint)
+    if isinstance(ct, LanguageConstraint):
+        # code generation constraint, not used in schema generation
+        return ''
+    if isinstance(ct, SqlConstraint):
+        if ct.constraint_type == 'native':
+            s = ct.sql
+            assert isinstance(s, SqlSet)
+            sql_string = s.get_for_platform(PLATFORMS)
+            if sql_string is not None:
+                return '\n    , ' + sql_string.sql
+        return ''
+
+    column_names = ', '.join(_parse_name(column.name) for column in columns)
+    sql = '\n    , '
+    if isinstance(ct, NamedConstraint) and ct.name:
+        sql += 'CONSTRAINT ' + _parse_name(ct.name) + ' '
+
+    if ct.constraint_type in PRIMARY_KEY_CONSTRAINT_TYPES:
+        return sql + 'PRIMARY KEY (' + column_names + ')'
+
+    if ct.constraint_type == 'foreignkey':
+        if (('column' not in ct.details and
+                'columns' not in ct.details) or
+                'table' not in ct.details):
+            raise Exception("column and table must be in foreign "
+                            "key; found in " + column_names + " in " +
+                            table.table_name)
+        sql += ('FOREIGN KEY (' + column_names + ') REFERENCES ' +
+                _parse_name(ct.details['table']) + ' (')
+        if 'column' in ct.details:
+            sql += _parse_name(ct.details['column'])
+        else:
+            sql += ', '.join(_parse_name(fc) for fc in ct.details['columns'])
+        sql += ')'
+        if 'match' in ct.details:
+            sql += ' MATCH ' + ct.details['match'].upper()
+        if 'delete' in ct.details:
+            sql += ' ON DELETE ' + ct.details['delete'].upper()
+        if 'update' in ct.details:
+            sql += ' ON UPDATE ' + ct.details['update'].upper()
+        return sql
+
+    # We allow other constraint types, because those could be used
+    # by other databases or tools.
+    return ''
+
+
+def _generate_indexes(table):
+    """
+    The CREATE INDEX statements for the table's secondary indexes.
+    """
+    sql = ''
+    for cst, column_names in get_index_constraints(table):
+        sql += _generate_create_index(table, cst, column_names)
+    return sql
+
+
+def _generate_create_index(table, cst, column_names):
+    if cst.constraint_type in UNIQUE_INDEX_CONSTRAINT_TYPES:
+        sql = 'CREATE UNIQUE INDEX '
+    elif cst.constraint_type in PLAIN_INDEX_CONSTRAINT_TYPES:
+        sql = 'CREATE INDEX '
+    else:
+        return ''
+    return (sql + _index_name(table, cst, column_names) + ' ON ' +
+            _parse_name(table.table_name) + ' (' +
+            ', '.join(_parse_name(name) for name in column_names) + ');\n')
+
+
+def _index_name(table, cst, column_names):
+    """
+    Index names in SQLite are shared by the whole database, so unnamed
+    indexes are named after their table as well as their columns.
+    """
+    if isinstance(cst, NamedConstraint) and cst.name:
+        return _parse_name(cst.name)
+    return _parse_name(table.table_name + '__' + '__'.join(column_names) +
+                       '__Idx')
+
+
+def _generate_create_view(view):
+    sql_string = view.select_query.get_for_platform(PLATFORMS)
+    if sql_string is None:
+        raise Exception("no sqlite support for view " + view.name)
+    assert isinstance(sql_string, SqlString)
+    return ('CREATE VIEW ' + _parse_name(view.name) + ' AS\n' +
+            sql_string.sql + ';\n')
+
+
+def _is_direct_operation(before, op):
+    """
+    Checks if SQLite can run the operation without rebuilding the table.
+    Added columns can't be keys, and need a default if they can't be null;
+    dropped columns can't be part of an index or key.
+    """
+    assert isinstance(op, AlterOperation)
+    op_type = op.operation_type
+    if op_type not in DIRECT_OPERATIONS:
+        return False
+    if op_type == ADD_COLUMN_OPERATION:
+        return (not op.column.auto_increment and
+                (is_column_nullable(op.column) or
+                 op.column.default_value is not None))
+    if op_type == DROP_COLUMN_OPERATION:
+        for cst, column_names in get_index_constraints(before):
+            if op.before_column.name in column_names:
+                return False
+    return True
+
+
+def _generate_direct_operation(before, after, op):
+    """
+    The statement for an upgrade operation that SQLite can run without
+    rebuilding the table.
+    """
+    assert isinstance(op, AlterOperation)
+    op_type = op.operation_type
+    if op_type == RENAME_TABLE_OPERATION:
+        return ('ALTER TABLE ' + _parse_name(before.table_name) +
+                ' RENAME TO ' + _parse_name(after.table_name) + ';\n')
+    table_name = _parse_name(after.table_name)
+    if op_type == DROP_INDEX_OPERATION:
+        return ('DROP INDEX ' + _index_name(
+            before, op.before_constraint, op.column_names) + ';\n')
+    if op_type == DROP_COLUMN_OPERATION:
+        # Requires SQLite 3.35.0
+        return ('ALTER TABLE ' + table_name + ' DROP COLUMN ' +
+                _parse_name(op.before_column.name) + ';\n')
+    if op_type == RENAME_COLUMN_OPERATION:
+        # Requires SQLite 3.25.0
+        return ('ALTER TABLE ' + table_name + ' RENAME COLUMN ' +
+                _parse_name(op.before_column.name) + ' TO ' +
+                _parse_name(op.column.name) + ';\n')
+    if op_type == ADD_COLUMN_OPERATION:
+        return ('ALTER TABLE ' + table_name + ' ADD COLUMN ' +
+                _generate_column_definition(op.column) + ';\n')
+    if op_type == ADD_INDEX_OPERATION:
+        return _generate_create_index(after, op.constraint, op.column_names)
+    raise Exception("not a direct operation: " + str(op_type))
+
+
+def _generate_rebuild_table(before, after, alter):
+    """
+    Copy the table into a new table with the upgraded definition, then
+    replace the old table with it.  This is the procedure SQLite documents
+    for the changes ALTER TABLE doesn't support.
+
+    https://www.sqlite.org/lang_altertable.html#otheralter
+    """
+    assert isinstance(before, Table)
+    assert isinstance(after, Table)
+    assert isinstance(alter, TableAlterAnalysis)
+
+    # after column name -> before column name, for the copied columns.
+    source_names = {}
+    added = []
+    for op in alter.operations:
+        if op.operation_type == ADD_COLUMN_OPERATION:
+            added.append(op.column.name)
+        elif op.operation_type == RENAME_COLUMN_OPERATION:
+            source_names[op.column.name] = op.before_column.name
+    before_names = [col.name for col in before.columns]
+    columns = []
+    sources = []
+    for col in after.columns:
+        if col.name in added:
+            continue
+        source = source_names.get(col.name, col.name)
+        if source in before_names:
+            columns.append(_parse_name(col.name))
+            sources.append(_parse_name(source))
+
+    table_name = _parse_name(after.table_name)
+    new_name = REBUILD_TABLE_PREFIX + table_name
+    return (
+        '-- Rebuild of ' + table_name + ' for: ' + ', '.join(
+            op.description for op in alter.operations
+            if not _is_direct_operation(before, op)) + '\n' +
+        'PRAGMA foreign_keys = OFF;\n' +
+        _generate_create_table(after, new_name) +
+        'INSERT INTO ' + new_name + ' (' + ', '.join(columns) + ')\n' +
+        '    SELECT ' + ', '.join(sources) + ' FROM ' +
+        _parse_name(before.table_name) + ';\n' +
+        'DROP TABLE ' + _parse_name(before.table_name) + ';\n' +
+        'ALTER TABLE ' + new_name + ' RENAME TO ' + table_name + ';\n' +
+        _generate_indexes(after) +
+        'PRAGMA foreign_key_check(' + table_name + ');\n' +
+        'PRAGMA foreign_keys = ON;\n')
+
+
+def _get_validations(table):
+    """
+    :return: the validation constraints, on the columns and on the table.
+    :rtype: list[SqlConstraint]
+    """
+    ret = []
+    for col in table.columns:
+        for cst in col.constraints:
+            if (isinstance(cst, SqlConstraint) and
+                    cst.constraint_type in VALIDATION_CONSTRAINT_TYPES):
+                ret.append(cst)
+    for cst in table.constraints:
+        if (isinstance(cst, SqlConstraint) and
+                cst.constraint_type in VALIDATION_CONSTRAINT_TYPES):
+            ret.append(cst)
+    return ret
+
+
+def _validation_trigger_names(table, index):
+    name = 'validation_' + table.table_name + '_' + str(index)
+    return _parse_name('insert_' + name), _parse_name('update_' + name)
+
+
+def _generate_validation_triggers(table):
+    """
+    A trigger for each validation, on both insert and update, that aborts
+    with the validation's message.
+    """
+    assert isinstance(table, ColumnarSchemaObject)
+
+    columns = {}
+    for col in table.columns:
+        columns[col.name] = 'NEW.' + _parse_name(col.name)
+
+    sql = ''
+    for index, cst in enumerate(_get_validations(table)):
+        msg = 'Input validation failed'
+        if 'message' in cst.details:
+            msg = cst.details['message']
+        sset = cst.sql
+        assert isinstance(sset, SqlSet)
+        sql_string = sset.get_for_platform(PLATFORMS)
+        if sql_string is None:
+            continue
+        template = sql_string.template
+
+        # The placeholders are the columns of the new row.
+        template.validate(columns.keys())
+        sval = template.render(columns)
+
+        for trigger_name, event in zip(
+                _validation_trigger_names(table, index), ('INSERT', 'UPDATE')):
+            sql += (
+                'CREATE TRIGGER ' + trigger_name +
+                '\n        BEFORE ' + event + ' ON ' +
+                _parse_name(table.table_name) +
+                '\n        FOR EACH ROW WHEN NOT (' + sval + ')' +
+                '\nBEGIN\n' +
+                "    SELECT RAISE(ABORT, '" + msg.replace("'", "''") + "');\n" +
+                'END;\n')
+    return sql
+
+
+def _generate_drop_validation_triggers(table):
+    sql = ''
+    for index in range(len(_get_validations(table))):
+        for trigger_name in _validation_trigger_names(table, index):
+            sql += 'DROP TRIGGER IF EXISTS ' + trigger_name + ';\n'
+    return sql
+
+
+def _escape_value_type_value(vtv):
+    """
+
+    :param vtv: ValueTypeValue
+    :return: str
+    """
+    assert isinstance(vtv, ValueTypeValue)
+
+    if vtv.str_value is not None:
+        return "'" + vtv.str_value.replace("'", "''") + "'"
+    elif vtv.boolean_value is not None:
+        if vtv.boolean_value:
+            return "1"
+        else:
+            return "0"
+    elif vtv.computed_value is not None:
+        # Expressions must be in parentheses in SQLite.
+        return '(' + str(vtv.computed_value) + ')'
+    elif vtv.date_value is not None:
+        return "'" + str(vtv.date_value) + "'"
+    elif vtv.numeric_value is not None:
+        return str(vtv.numeric_value)
+    else:
+        return 'NULL'
+
+
+def _parse_value_type(value_type):
+    """
+    Map the declared value type to its SQLite type affinity.
+    """
+    val = value_type.strip().upper()
+    for prefixes, affinity in VALUE_TYPE_AFFINITIES:
+        for prefix in prefixes:
+            if val.startswith(prefix):
+                return affinity
+    return val
+
+
+def _parse_name(name):
+    # TODO properly escape the name
+    return name.strip()
+
+
+def _strip_comments(statement):
+    return '\n'.join(line for line in statement.split('\n')
+                     if not line.strip().startswith('--'))
@@ -4,7 +4,7 @@ Inspects the schema between a previous and a current version.
 
 from ..model.base import (VIEW_TYPE, TABLE_TYPE, COLUMN_TYPE, Order)
 from ..model.schema import (
-    SchemaObject, Column, Table, View, ColumnarSchemaObject)
+    SchemaObject, Column, Table, View, ColumnarSchemaObject, Constraint)
 from ..model.change import (
     Change, SchemaChange, SqlChange, REMOVE_CHANGE,
     ADD_CHANGE, RENAME_CHANGE, ALTER_CHANGE, SQL_CHANGE, CHANGE_TYPES,
@@ -382,9 +382,11 @@ class SchemaUpgradedSet(object):
                 return ViewUpgradeAnalysis(None, after)
             if isinstance(after, Column):
                 return ColumnUpgradeAnalysis(None, after)
+            if isinstance(after, Constraint):
+                return ConstraintUpgradeAnalysis(None, after)
 
             raise Exception("Don't know how to upgrade a " +
-                            after.object_type + " (" + str(after) + ")")
+                            after.object_type.name + " (" + str(after) + ")")
         elif after is None:
             assert isinstance(before, SchemaObject)
 
@@ -394,12 +396,25 @@ class SchemaUpgradedSet(object):
                 return ViewUpgradeAnalysis(before, None)
             if isinstance(before, Column):
                 return ColumnUpgradeAnalysis(before, None)
+            if isinstance(before, Constraint):
+                return ConstraintUpgradeAnalysis(before, None)
 
             raise Exception("Don't know how to remove a " +
-                            before.object_type + " (" + str(before) + ")")
+                            before.object_type.name + " (" + str(before) + ")")
         else:
-            # FIXME
-            pass
+            assert isinstance(before, SchemaObject)
+            assert isinstance(after, SchemaObject)
+
+            if isinstance(after, Table) and isinstance(before, Table):
+                return TableUpgradeAnalysis(before, after)
+            if isinstance(after, View) and isinstance(before, View):
+                return ViewUpgradeAnalysis(before, after)
+            if isinstance(after, Column) and isinstance(before, Column):
+                return ColumnUpgradeAnalysis(before, after)
+            if isinstance(after, Constraint) and isinstance(before, Constraint):
+                return ConstraintUpgradeAnalysis(before, after)
+
+            return IncompatibleUpgradeAnalysis(before, after)
 
 
 class BranchUpgradeAnalysis(object):
@@ -585,6 +600,16 @@ class ColumnUpgradeAnalysis(UpgradeAnalysis):
             pass
 
 
+class ConstraintUpgradeAnalysis(UpgradeAnalysis):
+    def __init__(self, before: SchemaObject or None,
+                 after: SchemaObject or Change or None):
+        UpgradeAnalysis.__init__(self, before, after)
+
+        assert before is None or isinstance(before, Constraint)
+        assert (after is None or isinstance(after, Constraint) or
+                isinstance(after, SchemaChange))
+
+
 class SequenceUpgradeAnalysis(UpgradeAnalysis):
     def __init__(self, before: SchemaObject or None,
                  after: SchemaObject or Change or None):
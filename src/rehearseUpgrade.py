@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+"""
+Checks that the upgrade scripts of each version in a schema package produce
+the same schema as a fresh install of that version, using in-memory SQLite
+databases.
+"""
+
+import os
+import sys
+import argparse
+import presquel
+from presquel.runner import (rehearse_package)
+
+
+VERSION = "%{prog}s " + presquel.VERSION_STR
+
+
+def main(args_list):
+    parser = argparse.ArgumentParser(
+        description="Rehearse the upgrades of a schema package")
+    parser.add_argument('--version', action='version', version=VERSION)
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    parser.add_argument("-j", "--jobs",
+                        help="""number of worker processes; defaults to the
+                        number of CPUs""",
+                        type=int,
+                        default=None)
+    parser.add_argument('source',
+                        help="source directory of the schema package")
+    args = parser.parse_args(args_list)
+
+    base_dir = args.source
+    if not os.path.isdir(base_dir):
+        print("not a directory: " + base_dir)
+        return 1
+
+    results = rehearse_package(base_dir, os.path.basename(base_dir),
+                               args.jobs)
+    failed = 0
+    for result in results:
+        if (result.passed and len(result.warnings) <= 0 and
+                not args.verbose):
+            continue
+        print(str(result))
+        for warning in result.warnings:
+            print("    " + warning)
+        for difference in result.differences:
+            print("    " + difference)
+        if result.error is not None:
+            print("    " + result.error.strip().replace("\n", "\n    "))
+        if not result.passed:
+            failed += 1
+    print("Rehearsed " + str(len(results)) + " upgrade(s); " +
+          str(failed) + " failed")
+    return 1 if failed > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
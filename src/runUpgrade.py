@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+
+"""
+Upgrades a database to the newest (or a given) version of a schema package,
+recording each step so that a failed upgrade resumes where it stopped.
+
+The runner works with any DB-API connection; this tool connects to SQLite
+databases.
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+import presquel
+from presquel.runner import (
+    UpgradeRunner, load_version_table, get_upgrade_problems,
+    get_upgrade_warnings)
+
+
+VERSION = "%{prog}s " + presquel.VERSION_STR
+
+# Seconds to wait for another connection's write lock.
+SQLITE_LOCK_TIMEOUT = 600
+
+
+def main(args_list):
+    parser = argparse.ArgumentParser(
+        description="Upgrade a database to a schema package version")
+    parser.add_argument('--version', action='version', version=VERSION)
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    parser.add_argument("--sqlite",
+                        help="SQLite database file to upgrade",
+                        action="store",
+                        required=True)
+    parser.add_argument("-b", "--batch",
+                        help="number of steps to run in each transaction",
+                        type=int,
+                        default=1)
+    parser.add_argument("-j", "--jobs",
+                        help="""number of connections that run the steps
+                        that don't depend on each other at the same time;
+                        each step is then its own transaction""",
+                        type=int,
+                        default=1)
+    parser.add_argument("-n", "--dry-run",
+                        help="list the steps to run, without running them",
+                        action="store_true")
+    parser.add_argument('source',
+                        help="""source directory of the schema package.  To
+                        upgrade to one specific version, use the format
+                        'source/dir/name@1.2.3'.""")
+    args = parser.parse_args(args_list)
+
+    base_dir = args.source
+    version_name = None
+    if '@' in base_dir:
+        base_dir, version_name = base_dir.split('@', 1)
+    if not os.path.isdir(base_dir):
+        print("not a directory: " + base_dir)
+        return 1
+    package = presquel.load_package(base_dir, os.path.basename(base_dir))
+    target_version = None
+    if version_name is not None:
+        for version in package.get_versions():
+            if version.is_version(version_name):
+                target_version = version
+        if target_version is None:
+            print("could not find version '" + version_name + "' in package")
+            return 1
+
+    gens = presquel.get_generator('sqlite')
+    if len(gens) <= 0:
+        print("No generator found for sqlite")
+        return 1
+
+    # Without an isolation level, the runner's BEGIN puts the DDL
+    # statements in the step's transaction, too.  With several jobs, each
+    # step takes the write lock when it starts, and waits for the other
+    # steps to release it.
+    begin_statement = 'BEGIN' if args.jobs <= 1 else 'BEGIN IMMEDIATE'
+
+    def connect():
+        return sqlite3.connect(args.sqlite, timeout=SQLITE_LOCK_TIMEOUT,
+                               isolation_level=None, check_same_thread=False)
+
+    connection = connect()
+    try:
+        runner = UpgradeRunner(
+            connection, package, gens[0], load_version_table(base_dir),
+            steps_per_commit=args.batch, begin_statement=begin_statement,
+            log=print if args.verbose else None)
+        installed = runner.get_installed_version()
+        print("Installed version: " + (
+            str(installed) if installed is not None else "(none)"))
+        problems = get_upgrade_problems(package, installed, target_version)
+        if len(problems) > 0:
+            print("Problems discovered for " + args.source + ":")
+            for problem in problems:
+                print("[" + args.source + "] " + problem)
+            return 1
+        for warning in get_upgrade_warnings(
+                package, installed, target_version):
+            print("[" + args.source + "] " + warning)
+        if args.dry_run:
+            for step in runner.plan(target_version):
+                print(str(step))
+                if args.verbose:
+                    for statement in step.statements:
+                        print("    " + statement.replace("\n", "\n    "))
+            return 0
+        if args.jobs > 1:
+            steps = runner.run_parallel(connect, args.jobs, target_version)
+        else:
+            steps = runner.run(target_version)
+        print("Ran " + str(len(steps)) + " step(s); installed version: " +
+              str(runner.get_installed_version()))
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,108 @@
+"""
+Tests for the dependencies between upgrade steps.
+"""
+
+import presquel
+from presquel.schemagen import build_upgrade_graph
+from .util import PackageTestCase
+
+A_V00 = """
+    table:
+      name: A
+      columns:
+      - column:
+          name: A_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: A__Key
+    """
+
+# References B, which references A.
+A_V01 = """
+    table:
+      name: A
+      columns:
+      - column:
+          name: A_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: A__Key
+      - column:
+          name: B_Id
+          type: int
+          changes:
+          - change:
+              type: add
+          constraints:
+          - constraint:
+              type: foreign key
+              name: A__B_Id__Fk
+              table: B
+              column: B_Id
+    """
+
+B_V01 = """
+    table:
+      name: B
+      changes:
+      - change:
+          type: add
+      columns:
+      - column:
+          name: B_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: B__Key
+      - column:
+          name: A_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              name: B__A_Id__Fk
+              table: A
+              column: A_Id
+    """
+
+C = """
+    table:
+      name: C
+      columns:
+      - column:
+          name: C_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: C__Key
+    """
+
+
+class BuildUpgradeGraphTest(PackageTestCase):
+    def test_tables_referencing_each_other(self):
+        package = self.load_package({
+            'v00': {'a.yaml': A_V00, 'c.yaml': C},
+            'v01': {'a.yaml': A_V01, 'b.yaml': B_V01, 'c.yaml': C},
+        })
+        branch = package.get_newest_version()
+        changes = presquel.BranchUpgradeAnalysis(branch).changes
+        graph = build_upgrade_graph(changes)
+        steps = dict((node.name, node) for node in graph.nodes)
+        a = steps['A'].index
+        b = steps['B'].index
+        self.assertLess(b, a)
+        # The later table waits for the earlier one, not the other way.
+        self.assertEqual(steps['A'].depends_on, (b,))
+        self.assertEqual(steps['B'].depends_on, ())
+        self.assertEqual(steps['C'].depends_on, ())
+        self.assertEqual(len(graph.waves), 2)
+
+        # A fresh install has the same cycle.
+        graph = build_upgrade_graph(branch.schema_version.schema)
+        self.assertEqual(len(graph.waves), 2)
@@ -0,0 +1,68 @@
+"""
+Tests for the cached schema graph layout.
+"""
+
+import json
+import os
+from presquel.codegen import AnalysisModel
+from presquel.codegen.graph_layout import (
+    load_layout, get_schema_hash, LAYOUT_CACHE_FILE_NAME)
+from .util import PackageTestCase
+
+PARENT = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+    """
+
+CHILD = """
+    table:
+      name: CHILD
+      columns:
+      - column:
+          name: Child_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+    """
+
+
+class LoadLayoutTest(PackageTestCase):
+    def test_focused_layout_keeps_full_layout(self):
+        package = self.load_package({
+            'v00': {'parent.yaml': PARENT, 'child.yaml': CHILD},
+        })
+        analysis = AnalysisModel()
+        analysis.add_version(package.get_newest_version().schema_version)
+        focus = analysis.get_schema_neighborhood('PARENT', 0)
+        cache_file = os.path.join(self.base_dir, LAYOUT_CACHE_FILE_NAME)
+
+        full = load_layout(analysis, self.base_dir)
+        focused = load_layout(analysis, self.base_dir, focus)
+        self.assertNotEqual(full.schema_hash, focused.schema_hash)
+        with open(cache_file, 'r') as f:
+            hashes = [cl['hash'] for cl in json.load(f)['layouts']]
+        self.assertEqual(hashes, [focused.schema_hash, full.schema_hash])
+
+        # Both are cache hits now.
+        self.assertEqual(
+            load_layout(analysis, self.base_dir).to_json(), full.to_json())
+        with open(cache_file, 'r') as f:
+            hashes = [cl['hash'] for cl in json.load(f)['layouts']]
+        self.assertEqual(hashes, [get_schema_hash(analysis),
+                                  get_schema_hash(analysis, focus)])
@@ -0,0 +1,82 @@
+"""
+Tests for the index coverage of the generated data access code.
+"""
+
+from presquel.codegen import AnalysisModel
+from presquel.codegen.index_coverage import (
+    IndexCoverageReport, JOIN_SOURCE)
+from .util import PackageTestCase
+
+PARENT = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Code
+          type: nvarchar(20)
+    """
+
+CHILD = """
+    table:
+      name: CHILD
+      columns:
+      - column:
+          name: Child_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+              pull: always
+      - column:
+          name: Parent_Code
+          type: nvarchar(20)
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Code
+              pull: always
+      - column:
+          name: Other_Code
+          type: nvarchar(20)
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Code
+    """
+
+
+class IndexCoverageReportTest(PackageTestCase):
+    def test_foreign_key_joins(self):
+        package = self.load_package({
+            'v00': {'parent.yaml': PARENT, 'child.yaml': CHILD},
+        })
+        analysis_model = AnalysisModel()
+        analysis_model.add_version(
+            package.get_newest_version().schema_version)
+        report = IndexCoverageReport(analysis_model, ['mysql'])
+
+        joins = dict((path.name, path) for path in report.paths
+                     if path.source == JOIN_SOURCE)
+        # Only the foreign keys that pull in the remote row join it.
+        self.assertEqual(sorted(joins.keys()),
+                         ['CHILD.Parent_Code', 'CHILD.Parent_Id'])
+        self.assertEqual(joins['CHILD.Parent_Id'].table_name, 'PARENT')
+        self.assertTrue(joins['CHILD.Parent_Id'].coverage.is_indexed)
+        self.assertEqual(joins['CHILD.Parent_Code'].column_names, ('Code',))
+        self.assertFalse(joins['CHILD.Parent_Code'].coverage.is_indexed)
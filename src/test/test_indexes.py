@@ -0,0 +1,145 @@
+"""
+Tests for the index problems found in the schema.
+"""
+
+import json
+from presquel.model import Table, WARNING_TYPE
+from presquel.runner import get_upgrade_warnings
+from presquel.model.indexes import (
+    find_index_problems, index_problems_to_json,
+    DUPLICATE_INDEX, REDUNDANT_INDEX, UNINDEXED_FOREIGN_KEY)
+from .util import PackageTestCase
+
+PARENT = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_PARENT
+    """
+
+ITEM = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_ITEM
+      - column:
+          name: Code
+          type: nvarchar(20)
+          constraints:
+          - constraint:
+              type: index
+              name: IDX_CODE
+          - constraint:
+              type: index
+              name: IDX_CODE_AGAIN
+      - column:
+          name: Name
+          type: nvarchar(20)
+          constraints:
+          - constraint:
+              type: index
+              name: IDX_NAME
+      - column:
+          name: Kind
+          type: int
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+      constraints:
+      - constraint:
+          type: unique index
+          name: UQ_NAME_KIND
+          columns: Name, Kind
+    """
+
+
+class IndexProblemsTest(PackageTestCase):
+    def item_table(self):
+        self.package = self.load_package({
+            'v00': {'parent.yaml': PARENT, 'item.yaml': ITEM},
+        })
+        schema_version = self.package.get_newest_version().schema_version
+        for schema in schema_version.schema:
+            if schema.name == 'ITEM':
+                return schema_version, schema
+        self.fail('no ITEM table')
+
+    def test_find_index_problems(self):
+        schema_version, table = self.item_table()
+        self.assertIsInstance(table, Table)
+        problems = dict((p.problem_type, p)
+                        for p in find_index_problems(table))
+        self.assertEqual(len(problems), 3)
+
+        duplicate = problems[DUPLICATE_INDEX]
+        self.assertEqual(duplicate.constraint.name, 'IDX_CODE_AGAIN')
+        self.assertEqual(duplicate.covering_constraint.name, 'IDX_CODE')
+
+        redundant = problems[REDUNDANT_INDEX]
+        self.assertEqual(redundant.constraint.name, 'IDX_NAME')
+        self.assertEqual(redundant.column_names, ('Name',))
+        self.assertEqual(redundant.covering_constraint.name, 'UQ_NAME_KIND')
+        self.assertEqual(redundant.covering_column_names, ('Name', 'Kind'))
+
+        unindexed = problems[UNINDEXED_FOREIGN_KEY]
+        self.assertEqual(unindexed.column_names, ('Parent_Id',))
+        self.assertIsNone(unindexed.covering_constraint)
+
+        # The parent table has nothing to report.
+        for schema in schema_version.schema:
+            if schema.name == 'PARENT':
+                self.assertEqual(find_index_problems(schema), [])
+
+    def test_index_problems_to_json(self):
+        schema_version, table = self.item_table()
+        data = json.loads(index_problems_to_json(find_index_problems(table)))
+        by_problem = dict((p['problem'], p) for p in data['problems'])
+        self.assertEqual(by_problem['redundant index'], {
+            'table': 'ITEM',
+            'problem': 'redundant index',
+            'constraint': 'IDX_NAME',
+            'constraintType': 'index',
+            'columns': ['Name'],
+            'coveredBy': {
+                'constraint': 'UQ_NAME_KIND',
+                'constraintType': 'uniqueindex',
+                'columns': ['Name', 'Kind'],
+            },
+        })
+        self.assertEqual(by_problem['unindexed foreign key']['columns'],
+                         ['Parent_Id'])
+        self.assertNotIn('coveredBy', by_problem['unindexed foreign key'])
+        self.assertEqual(by_problem['duplicate index']['coveredBy'][
+            'constraint'], 'IDX_CODE')
+
+    def test_loaded_as_warnings(self):
+        schema_version, table = self.item_table()
+        warnings = [prb for prb in schema_version.problems
+                    if prb.object_type == WARNING_TYPE]
+        self.assertEqual(len(warnings), 3)
+        for prb in warnings:
+            self.assertFalse(prb.is_error)
+            self.assertTrue(prb.source_name.endswith('item.yaml'))
+            self.assertTrue(prb.comment.startswith('ITEM: '))
+
+        # The upgrade reports them, but they don't stop it.
+        warnings = get_upgrade_warnings(self.package, None)
+        self.assertEqual(len(warnings), 3)
+        self.assertTrue(warnings[0].startswith('(0) Warning: ITEM: '))
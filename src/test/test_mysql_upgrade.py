@@ -0,0 +1,152 @@
+"""
+Tests for the MySql upgrade scripts.
+"""
+
+import re
+import presquel
+from presquel.schemagen import MySqlScriptGenerator, parse_server_version
+from .util import PackageTestCase
+
+ITEM_V00 = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+ITEM_RENAMED_NOT_NULL = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Label
+          type: nvarchar(100)
+          changes:
+          - change:
+              type: rename
+              was: Name
+          constraints:
+          - constraint:
+              type: not null
+    """
+
+
+class ClassifyUpgradeTest(PackageTestCase):
+    def classify(self, package, server_version: str) -> list:
+        gen = MySqlScriptGenerator().for_server_version(
+            parse_server_version(server_version))
+        ret = []
+        for change in presquel.BranchUpgradeAnalysis(
+                package.get_newest_version()).changes:
+            ret.extend(gen.classify_upgrade(change))
+        return ret
+
+    def test_modify_renamed_column_in_own_alter(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_RENAMED_NOT_NULL},
+        })
+        for server_version in ('5.7.22', '8.0.30'):
+            steps = self.classify(package, server_version)
+            self.assertEqual(
+                [[op.operation_type.name for op in step.operations]
+                 for step in steps],
+                [['rename column'], ['modify column']], server_version)
+            self.assertIn('MODIFY COLUMN Label', steps[1].sql)
+
+
+PRICE = """
+    table:
+      name: PRICE
+      columns:
+      - column:
+          name: Price_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_PRICE
+      - column:
+          name: Price
+          type: int
+    """
+
+SCALE_PRICES = """
+    change:
+        update: data
+        chunk:
+            table: PRICE
+            key: Price_Id
+            size: 10000
+        sql: "
+        UPDATE PRICE SET Price = Price * {{chunk_size}}
+            WHERE Price_Id >= {chunk_start} AND Price_Id < {chunk_end};
+        "
+    """
+
+
+def chunked_change_sql(test_case: PackageTestCase, gen, sql: str) -> list:
+    """
+    The upgrade scripts for a chunked change over PRICE with the given sql.
+    """
+    package = test_case.load_package({
+        'v00': {'price.yaml': PRICE},
+        'v01': {'price.yaml': PRICE,
+                'scale.yaml': SCALE_PRICES.replace('{{chunk_size}}', sql)},
+    })
+    for change in presquel.BranchUpgradeAnalysis(
+            package.get_newest_version()).changes:
+        if isinstance(change, presquel.model.SqlChange):
+            return gen.generate_upgrade(change)
+    test_case.fail('no sql change')
+
+
+class ChunkedChangeTest(PackageTestCase):
+    def test_procedure(self):
+        scripts = chunked_change_sql(self, MySqlScriptGenerator(), '100')
+        # The procedure is named after the change's position in the files.
+        scripts = [re.sub(r'presquel_chunk_[0-9_]+', 'presquel_chunk', script)
+                   for script in scripts]
+        self.assertEqual(scripts, [
+            '-- Chunked change over PRICE.Price_Id, 10000 keys per commit\n',
+            'DROP PROCEDURE IF EXISTS presquel_chunk;\n'
+            'delimiter //\n'
+            'CREATE PROCEDURE presquel_chunk()\n'
+            'BEGIN\n'
+            '    DECLARE chunk_start BIGINT;\n'
+            '    DECLARE max_key BIGINT;\n'
+            '    SELECT MIN(Price_Id), MAX(Price_Id)\n'
+            '        INTO chunk_start, max_key\n'
+            '        FROM PRICE;\n'
+            '    WHILE chunk_start IS NOT NULL AND chunk_start <= max_key DO\n'
+            '        START TRANSACTION;\n'
+            '        UPDATE PRICE SET Price = Price * 100 WHERE '
+            'Price_Id >= chunk_start AND '
+            'Price_Id < (chunk_start + 10000);\n'
+            '        COMMIT;\n'
+            '        SET chunk_start = chunk_start + 10000;\n'
+            '    END WHILE;\n'
+            'END; //\n'
+            'delimiter ;\n'
+            'CALL presquel_chunk();\n'
+            'DROP PROCEDURE presquel_chunk;\n',
+        ])
+
+    def test_unknown_placeholder(self):
+        with self.assertRaises(Exception) as context:
+            chunked_change_sql(self, MySqlScriptGenerator(), '{scale}')
+        self.assertIn('unknown placeholders {scale}', str(context.exception))
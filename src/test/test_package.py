@@ -0,0 +1,35 @@
+"""
+Tests for loading the versions of a schema package.
+"""
+
+from presquel.model import SchemaBranch
+from .util import PackageTestCase
+
+ITEM = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+    """
+
+
+class SchemaPackageTest(PackageTestCase):
+    def test_several_versions(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM},
+            'v01': {'item.yaml': ITEM},
+            'v02': {'item.yaml': ITEM},
+        })
+        self.assertEqual(package.unresolved_branch_versions, [])
+        self.assertEqual(sorted(str(version)
+                                for version in package.get_versions()),
+                         ['0', '1', '2'])
+        self.assertEqual(len(package.branches), 3)
+        newest = package.get_newest_version()
+        self.assertIsInstance(newest, SchemaBranch)
+        self.assertEqual(str(newest.version), '2')
+        self.assertEqual(str(newest.parent.version), '1')
+        self.assertEqual(str(newest.parent.parent.version), '0')
+        self.assertIsNone(newest.parent.parent.parent)
@@ -0,0 +1,159 @@
+"""
+Tests for the generated PHP data access classes.
+"""
+
+import os
+import re
+from presquel.codegen import AnalysisModel, filegen, php, mysql
+from .util import PackageTestCase
+
+PARENT = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_PARENT
+      - column:
+          name: Code
+          type: nvarchar(20)
+    """
+
+CHILD = """
+    table:
+      name: CHILD
+      columns:
+      - column:
+          name: Child_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_CHILD
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+              pull: always
+          - constraint:
+              type: not null
+      - column:
+          name: Label
+          type: nvarchar(20)
+    """
+
+PRICE = """
+    table:
+      name: PRICE
+      columns:
+      - column:
+          name: Price_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: PK_PRICE
+      - column:
+          name: Price
+          type: decimal(10,2)
+          constraints:
+          - constraint:
+              type: value restriction
+              dialects:
+              - dialect:
+                  platforms: all
+                  sql: "{Price} >= 0.0"
+    """
+
+PLATFORMS = ['mysql']
+
+
+def _php_array(text, name):
+    """
+    The string keys and values of a generated PHP array.
+    """
+    match = re.search(r'\$' + name + r' = array\(\n(.*?)\n    \);', text,
+                      re.DOTALL)
+    assert match is not None, name
+    return dict(re.findall(r'"([^"]*)" => "([^"]*)"', match.group(1)))
+
+
+class PhpDboTest(PackageTestCase):
+    def generate(self, versions):
+        package = self.load_package(versions)
+        branch = package.get_newest_version().schema_version
+        analysis_model = AnalysisModel()
+        analysis_model.add_version(branch)
+        output_dir = os.path.join(self.base_dir, 'out')
+        os.makedirs(output_dir)
+        file_gen = filegen.FileGen(php.PhpLanguageGenerator())
+        ret = {}
+        for schema in branch.schema:
+            config = php.PhpGenConfig(
+                analysis_model.get_analysis_for(schema), output_dir,
+                PLATFORMS, mysql.MySqlPrepSqlConverter('php', PLATFORMS),
+                'Test', 'Base')
+            file_gen.generate_file(config)
+            with open(os.path.join(
+                    output_dir, php.PhpLanguageGenerator().generate_filename(
+                        config))) as f:
+                ret[schema.name] = f.read()
+        return ret
+
+    def test_pulled_foreign_key_join(self):
+        files = self.generate({
+            'v00': {'parent.yaml': PARENT, 'child.yaml': CHILD},
+        })
+        child = files['CHILD']
+        join = ' INNER JOIN PARENT k1 ON k1.Parent_Id = CHILD.Parent_Id'
+
+        # Without columns, every column is read, with the join.
+        self.assertIn(join + "';", child)
+        self.assertEqual(_php_array(child, 'READ_JOINS'), {'k1': join})
+
+        # Only the pulled columns need the join, so an unrelated subset of
+        # the columns leaves it out.
+        columns = _php_array(child, 'READ_COLUMNS')
+        column_joins = _php_array(child, 'READ_COLUMN_JOINS')
+        self.assertEqual(column_joins, {
+            'PARENT__Parent_Id': 'k1',
+            'PARENT__Code': 'k1',
+        })
+        for name in ('Child_Id', 'Parent_Id', 'Label'):
+            self.assertNotIn(name, column_joins)
+            self.assertNotIn('k1.', columns[name])
+        self.assertEqual(columns['PARENT__Code'], 'k1.Code AS PARENT__Code')
+        self.assertIn('isset($joins[$alias])', child)
+
+        # The parent has nothing to join.
+        self.assertNotIn('$joins', files['PARENT'])
+        self.assertNotIn('READ_JOINS', files['PARENT'])
+
+    def test_create_batch_leaves_out_value_restrictions(self):
+        price = self.generate({'v00': {'price.yaml': PRICE}})['PRICE']
+        self.assertIn(
+            '$prefix = "INSERT INTO PRICE (Price_Id, Price) VALUES ";', price)
+        start = price.index('private function createBatchRow(')
+        row = price[start:price.index('\n    }\n', start)]
+        self.assertEqual(re.findall(r'\$values\[\] = "([^"]*)";', row),
+                         [':Price_Id', ':Price'])
+
+    def test_batch_names_numbered_per_chunk(self):
+        child = self.generate({
+            'v00': {'parent.yaml': PARENT, 'child.yaml': CHILD},
+        })['CHILD']
+        for function in ('updateBatch', 'deleteByKeys'):
+            start = child.index('public function ' + function + '(')
+            body = child[start:child.index('\n    }\n', start)]
+            # The parameter names restart with every chunk, so that every
+            # full chunk has the same sql.
+            self.assertIn('$i - $start', body, function)
+            self.assertNotRegex(body, r'"_" \. \$i\b', function)
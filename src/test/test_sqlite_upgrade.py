@@ -0,0 +1,202 @@
+"""
+Tests for the SQLite upgrade scripts.
+"""
+
+import sqlite3
+import presquel
+from presquel.schemagen import SqliteScriptGenerator
+from presquel.runner import split_sql_statements
+from .util import PackageTestCase
+from .test_mysql_upgrade import chunked_change_sql
+
+ITEM_V00 = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Code
+          type: int
+          constraints:
+          - constraint:
+              type: index
+              name: IDX_ITEM_CODE
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+ITEM_CODE_TEXT = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Code
+          type: nvarchar(20)
+          constraints:
+          - constraint:
+              type: index
+              name: IDX_ITEM_CODE
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+ITEM_NO_CODE = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+ITEM_NO_NAME = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Code
+          type: int
+          constraints:
+          - constraint:
+              type: index
+              name: IDX_ITEM_CODE
+    """
+
+
+class SqliteUpgradeTest(PackageTestCase):
+    def upgrade(self, item_v01):
+        """
+        Upgrade a database with one ITEM row to the new ITEM table.
+
+        :return: the upgrade statements, and the connection.
+        """
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': item_v01},
+        })
+        gen = SqliteScriptGenerator()
+        connection = sqlite3.connect(':memory:', isolation_level=None)
+        self.addCleanup(connection.close)
+        base = package.get_version(min(package.get_versions()))
+        for schema in base.schema_version.schema:
+            connection.executescript(''.join(gen.generate_base(schema)))
+        connection.execute("INSERT INTO ITEM VALUES (1, 12, 'one')")
+
+        statements = []
+        for change in presquel.BranchUpgradeAnalysis(
+                package.get_newest_version()).changes:
+            for script in gen.generate_upgrade(change):
+                statements.extend(split_sql_statements(script))
+        before, during, after = gen.split_non_transactional(statements)
+        for statement in before:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        for statement in during:
+            cursor = connection.execute(statement)
+            if gen.is_check_statement(statement):
+                self.assertEqual(cursor.fetchall(), [])
+        connection.execute('COMMIT')
+        for statement in after:
+            connection.execute(statement)
+        return statements, connection
+
+    def assert_rebuilt(self, statements):
+        gen = SqliteScriptGenerator()
+        before, during, after = gen.split_non_transactional(statements)
+        self.assertEqual([s.strip() for s in before],
+                         ['PRAGMA foreign_keys = OFF'])
+        self.assertEqual([s.strip() for s in after],
+                         ['PRAGMA foreign_keys = ON'])
+        sql = '\n'.join(during)
+        self.assertIn('CREATE TABLE presquel_new_ITEM', sql)
+        self.assertIn('DROP TABLE ITEM', sql)
+        self.assertIn('ALTER TABLE presquel_new_ITEM RENAME TO ITEM', sql)
+        checks = [s for s in during if gen.is_check_statement(s)]
+        self.assertEqual([s.strip() for s in checks],
+                         ['PRAGMA foreign_key_check(ITEM)'])
+
+    def test_type_change_rebuilds(self):
+        statements, connection = self.upgrade(ITEM_CODE_TEXT)
+        self.assert_rebuilt(statements)
+        self.assertEqual(
+            [(row[1], row[2]) for row in connection.execute(
+                'PRAGMA table_info(ITEM)')],
+            [('Item_Id', 'INTEGER'), ('Code', 'TEXT'), ('Name', 'TEXT')])
+        self.assertEqual(connection.execute(
+            'SELECT Item_Id, Code, Name FROM ITEM').fetchall(),
+            [(1, '12', 'one')])
+        # The index is created again on the new table.
+        self.assertEqual(
+            [row[1] for row in connection.execute('PRAGMA index_list(ITEM)')
+             if row[3] == 'c'],
+            ['IDX_ITEM_CODE'])
+
+    def test_drop_indexed_column_rebuilds(self):
+        # SQLite can't drop a column that is in an index.
+        statements, connection = self.upgrade(ITEM_NO_CODE)
+        self.assert_rebuilt(statements)
+        self.assertEqual(
+            [row[1] for row in connection.execute('PRAGMA table_info(ITEM)')],
+            ['Item_Id', 'Name'])
+        self.assertEqual(connection.execute('SELECT * FROM ITEM').fetchall(),
+                         [(1, 'one')])
+        self.assertEqual(
+            connection.execute('PRAGMA index_list(ITEM)').fetchall(), [])
+
+    def test_drop_column_without_rebuild(self):
+        statements, connection = self.upgrade(ITEM_NO_NAME)
+        self.assertEqual([s.strip() for s in statements
+                          if not s.strip().startswith('--')],
+                         ['ALTER TABLE ITEM DROP COLUMN Name'])
+        self.assertEqual(connection.execute('SELECT * FROM ITEM').fetchall(),
+                         [(1, 12)])
+
+    def test_is_check_statement(self):
+        gen = SqliteScriptGenerator()
+        self.assertTrue(gen.is_check_statement(
+            '-- check\nPRAGMA foreign_key_check(ITEM);'))
+        self.assertFalse(gen.is_check_statement('PRAGMA foreign_keys = ON;'))
+        self.assertFalse(gen.is_check_statement('SELECT 1;'))
+
+    def test_chunked_change_single_statement(self):
+        scripts = chunked_change_sql(self, SqliteScriptGenerator(), '100')
+        self.assertEqual(scripts, [
+            '-- Chunked change over PRICE.Price_Id, run as a single '
+            'statement\n',
+            'UPDATE PRICE SET Price = Price * 100 WHERE '
+            'Price_Id >= (SELECT MIN(Price_Id) FROM PRICE) AND '
+            'Price_Id < (SELECT MAX(Price_Id) + 1 FROM PRICE);\n',
+        ])
+        connection = sqlite3.connect(':memory:')
+        self.addCleanup(connection.close)
+        connection.execute('CREATE TABLE PRICE (Price_Id INTEGER, Price INT)')
+        connection.execute('INSERT INTO PRICE VALUES (1, 2), (7, 3)')
+        connection.execute(scripts[1])
+        self.assertEqual(connection.execute(
+            'SELECT Price FROM PRICE ORDER BY Price_Id').fetchall(),
+            [(200,), (300,)])
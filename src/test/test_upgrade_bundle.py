@@ -0,0 +1,87 @@
+"""
+Tests for the checkpointed upgrade scripts.
+"""
+
+from presquel.schemagen import MySqlScriptGenerator
+from presquel.runner import (generate_upgrade_bundle, split_sql_statements)
+from .util import PackageTestCase
+
+ITEM = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: Item__Id__Key
+    """
+
+PRICE = """
+    table:
+      name: PRICE
+      changes:
+      - change:
+          type: add
+      columns:
+      - column:
+          name: Price_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+              name: Price__Id__Key
+      - column:
+          name: Amount
+          type: decimal(10,2)
+      constraints:
+      - constraint:
+          type: value restriction
+          message: amount must be non-negative
+          dialects:
+          - dialect:
+              platforms: all
+              sql: "{Amount} >= 0"
+    """
+
+
+class UpgradeBundleTest(PackageTestCase):
+    def assert_triggers_outside_guard(self, script):
+        self.assertNotIn(';;', script)
+        self.assertNotIn('END; //', script)
+        statements = split_sql_statements(script)
+        created = []
+        for pos, statement in enumerate(statements):
+            if statement.startswith('CREATE PROCEDURE'):
+                self.assertNotIn('TRIGGER', statement)
+            elif statement.startswith('CREATE TRIGGER'):
+                name = statement.split()[2]
+                created.append(name)
+                self.assertEqual(statements[pos - 1],
+                                 'DROP TRIGGER IF EXISTS ' + name)
+                self.assertTrue(statement.endswith('END'))
+                # The guarded step created the table first.
+                calls = [stmt for stmt in statements[:pos]
+                         if stmt.startswith('CALL ')]
+                self.assertTrue(len(calls) > 0)
+        self.assertEqual(created, ['insert_validation_PRICE',
+                                   'update_validation_PRICE'])
+
+    def test_upgrade_with_validations(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM},
+            'v01': {'item.yaml': ITEM, 'price.yaml': PRICE},
+        })
+        script = ''.join(generate_upgrade_bundle(
+            package, MySqlScriptGenerator(), min(package.get_versions())))
+        self.assert_triggers_outside_guard(script)
+
+    def test_install_with_validations(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM, 'price.yaml': PRICE},
+        })
+        script = ''.join(generate_upgrade_bundle(
+            package, MySqlScriptGenerator(), None))
+        self.assert_triggers_outside_guard(script)
@@ -0,0 +1,369 @@
+"""
+Tests for the upgrade runner, against in-memory SQLite databases.
+"""
+
+import os
+import sqlite3
+import textwrap
+import presquel
+from presquel.schemagen import SqliteScriptGenerator
+from presquel.runner import (
+    UpgradeRunner, load_version_table, get_upgrade_problems)
+from .util import PackageTestCase
+from .test_dependencies import (A_V00, A_V01, B_V01, C)
+
+ITEM_V00 = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+ITEM_V01 = """
+    table:
+      name: ITEM
+      columns:
+      - column:
+          name: Item_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+      - column:
+          name: Code
+          type: nvarchar(20)
+          changes:
+          - change:
+              type: add
+    """
+
+# Adds a column without an add change.
+ITEM_IMPLICIT_ADD = ITEM_V01.replace("""
+          changes:
+          - change:
+              type: add""", "")
+
+# The second statement fails until the test creates ITEM_ARCHIVE.
+ARCHIVE_CHANGE = """
+    change:
+        update: data
+        sql: "INSERT INTO ITEM (Item_Id, Name, Code) VALUES (1, 'one', 'A');
+            INSERT INTO ITEM_ARCHIVE SELECT Item_Id, Name FROM ITEM"
+    """
+
+PARENT_V00 = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+    """
+
+# Making a column not null rebuilds the table.
+PARENT_V01 = """
+    table:
+      name: PARENT
+      columns:
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Name
+          type: nvarchar(100)
+          constraints:
+          - constraint:
+              type: not null
+    """
+
+CHILD = """
+    table:
+      name: CHILD
+      columns:
+      - column:
+          name: Child_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+    """
+
+# Making the foreign key not null rebuilds the referencing table.
+CHILD_NOT_NULL = """
+    table:
+      name: CHILD
+      columns:
+      - column:
+          name: Child_Id
+          type: int
+          constraints:
+          - constraint:
+              type: primary key
+      - column:
+          name: Parent_Id
+          type: int
+          constraints:
+          - constraint:
+              type: foreign key
+              table: PARENT
+              column: Parent_Id
+          - constraint:
+              type: not null
+    """
+
+MANIFEST = """
+    manifest:
+    - version table:
+        create:
+        - CREATE TABLE IF NOT EXISTS APP_VERSION (
+            Product VARCHAR(64), Release VARCHAR(64))
+        - CREATE TABLE IF NOT EXISTS APP_STEP (
+            Product VARCHAR(64), Release VARCHAR(64), Step INTEGER,
+            Label VARCHAR(255))
+        query: SELECT Release FROM APP_VERSION WHERE Product = {package}
+        insert: INSERT INTO APP_VERSION (Product, Release) VALUES (
+            {package}, {version})
+        step query: SELECT Step FROM APP_STEP WHERE Product = {package}
+            AND Release = {version}
+        step insert: INSERT INTO APP_STEP (Product, Release, Step, Label)
+            VALUES ({package}, {version}, {step}, {name})
+    """
+
+
+class UpgradeRunnerTest(PackageTestCase):
+    def setUp(self):
+        PackageTestCase.setUp(self)
+        self.connection = sqlite3.connect(':memory:', isolation_level=None)
+        self.addCleanup(self.connection.close)
+
+    def runner(self, package, version_table=None, steps_per_commit=1):
+        return UpgradeRunner(self.connection, package,
+                             SqliteScriptGenerator(), version_table,
+                             steps_per_commit=steps_per_commit,
+                             begin_statement='BEGIN')
+
+    def query(self, sql):
+        return self.connection.execute(sql).fetchall()
+
+    def columns(self, table_name):
+        return [row[1] for row in self.query(
+            'PRAGMA table_info(' + table_name + ')')]
+
+    def test_fresh_install(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_V01},
+        })
+        runner = self.runner(package)
+        self.assertIsNone(runner.get_installed_version())
+        steps = runner.run()
+        self.assertEqual([step.name for step in steps], ['ITEM'])
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name', 'Code'])
+        self.assertEqual(str(runner.get_installed_version()), '1')
+        self.assertEqual(self.query(
+            'SELECT Package, Version FROM PRESQUEL_VERSION'),
+            [('test', '1')])
+
+    def test_upgrade(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_V01},
+        })
+        runner = self.runner(package)
+        runner.run(min(package.get_versions()))
+        self.assertEqual(str(runner.get_installed_version()), '0')
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name'])
+
+        steps = runner.run()
+        self.assertEqual([str(step.version) for step in steps], ['1'])
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name', 'Code'])
+        self.assertEqual(str(runner.get_installed_version()), '1')
+        self.assertEqual(runner.run(), [])
+
+    def test_failed_step_rolls_back_and_resumes(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_V01, 'zz_archive.yaml': ARCHIVE_CHANGE},
+        })
+        runner = self.runner(package)
+        runner.run(min(package.get_versions()))
+        version = package.get_newest_version().version
+        self.assertEqual([step.name for step in runner.plan()],
+                         ['ITEM', 'change'])
+
+        self.assertRaises(sqlite3.OperationalError, runner.run)
+        # The first step is committed; the failed step left nothing behind.
+        self.assertEqual(runner.get_completed_steps(version), {0})
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name', 'Code'])
+        self.assertEqual(self.query('SELECT * FROM ITEM'), [])
+        self.assertEqual(str(runner.get_installed_version()), '0')
+
+        self.connection.execute(
+            'CREATE TABLE ITEM_ARCHIVE (Item_Id INT, Name NVARCHAR(100))')
+        steps = runner.run()
+        self.assertEqual([step.index for step in steps], [1])
+        self.assertEqual(self.query('SELECT * FROM ITEM_ARCHIVE'),
+                         [(1, 'one')])
+        self.assertEqual(runner.get_completed_steps(version), {0, 1})
+        self.assertEqual(str(runner.get_installed_version()), '1')
+
+    def test_steps_per_commit(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_V01, 'zz_archive.yaml': ARCHIVE_CHANGE},
+        })
+        runner = self.runner(package, steps_per_commit=2)
+        runner.run(min(package.get_versions()))
+        version = package.get_newest_version().version
+
+        # Both steps share the transaction, so both are rolled back.
+        self.assertRaises(sqlite3.OperationalError, runner.run)
+        self.assertEqual(runner.get_completed_steps(version), set())
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name'])
+
+        self.connection.execute(
+            'CREATE TABLE ITEM_ARCHIVE (Item_Id INT, Name NVARCHAR(100))')
+        steps = runner.run()
+        self.assertEqual([step.index for step in steps], [0, 1])
+        self.assertEqual(runner.get_completed_steps(version), {0, 1})
+
+    def test_manifest_version_table(self):
+        base_dir = self.write_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_V01},
+        })
+        with open(os.path.join(base_dir, '_manifest.yaml'), 'w') as f:
+            f.write(textwrap.dedent(MANIFEST))
+        package = presquel.load_package(base_dir, 'test')
+        runner = self.runner(package, load_version_table(base_dir))
+        runner.run(min(package.get_versions()))
+        runner.run()
+
+        self.assertEqual(self.query(
+            'SELECT Product, Release FROM APP_VERSION ORDER BY Release'),
+            [('test', '0'), ('test', '1')])
+        self.assertEqual(self.query(
+            'SELECT Product, Release, Step, Label FROM APP_STEP '
+            'ORDER BY Release, Step'),
+            [('test', '0', 0, 'ITEM'), ('test', '1', 0, 'ITEM')])
+        self.assertEqual(self.query(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'PRESQUEL%'"),
+            [])
+
+    def test_upgrade_problems(self):
+        package = self.load_package({
+            'v00': {'item.yaml': ITEM_V00},
+            'v01': {'item.yaml': ITEM_IMPLICIT_ADD},
+        })
+        first = min(package.get_versions())
+        self.assertEqual(get_upgrade_problems(package, None, first), [])
+        problems = get_upgrade_problems(package, first)
+        self.assertTrue(len(problems) > 0)
+        self.assertTrue(all('implicit add' in prb for prb in problems))
+
+        runner = self.runner(package)
+        runner.run(first)
+        self.assertRaises(Exception, runner.run)
+        self.assertEqual(self.columns('ITEM'), ['Item_Id', 'Name'])
+
+    def test_rebuild_keeps_referencing_rows(self):
+        package = self.load_package({
+            'v00': {'parent.yaml': PARENT_V00, 'child.yaml': CHILD},
+            'v01': {'parent.yaml': PARENT_V01, 'child.yaml': CHILD},
+        })
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        runner = self.runner(package)
+        runner.run(min(package.get_versions()))
+        self.connection.execute("INSERT INTO PARENT VALUES (1, 'one')")
+        self.connection.execute('INSERT INTO CHILD VALUES (10, 1)')
+
+        steps = runner.run()
+        self.assertTrue(any('PRAGMA foreign_keys = OFF' in statement
+                            for step in steps
+                            for statement in step.statements))
+        self.assertEqual(self.query('SELECT * FROM PARENT'), [(1, 'one')])
+        self.assertEqual(self.query('SELECT * FROM CHILD'), [(10, 1)])
+        self.assertEqual(self.query('PRAGMA foreign_keys'), [(1,)])
+        self.assertEqual(self.query('PRAGMA foreign_key_check'), [])
+
+    def test_rebuild_fails_on_broken_foreign_keys(self):
+        package = self.load_package({
+            'v00': {'parent.yaml': PARENT_V00, 'child.yaml': CHILD},
+            'v01': {'parent.yaml': PARENT_V00, 'child.yaml': CHILD_NOT_NULL},
+        })
+        runner = self.runner(package)
+        runner.run(min(package.get_versions()))
+        # Written with the foreign keys off, so the row has no parent.
+        self.connection.execute('INSERT INTO CHILD VALUES (10, 1)')
+        self.connection.execute('PRAGMA foreign_keys = ON')
+
+        with self.assertRaises(Exception) as context:
+            runner.run()
+        self.assertIn('foreign_key_check(CHILD)', str(context.exception))
+        # The rebuild rolled back, and the foreign keys are on again.
+        self.assertEqual(str(runner.get_installed_version()), '0')
+        self.assertEqual(self.query('SELECT * FROM CHILD'), [(10, 1)])
+        self.assertEqual(
+            [row[3] for row in self.query('PRAGMA table_info(CHILD)')],
+            [0, 0])
+        self.assertEqual(self.query('PRAGMA foreign_keys'), [(1,)])
+
+    def test_run_parallel(self):
+        package = self.load_package({
+            'v00': {'a.yaml': A_V00, 'c.yaml': C},
+            'v01': {'a.yaml': A_V01, 'b.yaml': B_V01, 'c.yaml': C},
+        })
+        db_file = os.path.join(self.base_dir, 'test.db')
+
+        def connect():
+            return sqlite3.connect(db_file, timeout=10, isolation_level=None,
+                                   check_same_thread=False)
+
+        connection = connect()
+        self.addCleanup(connection.close)
+        runner = UpgradeRunner(connection, package, SqliteScriptGenerator(),
+                               begin_statement='BEGIN IMMEDIATE')
+        steps = runner.run_parallel(connect, 2, min(package.get_versions()))
+        self.assertEqual(sorted(step.name for step in steps), ['A', 'C'])
+        self.assertEqual(str(runner.get_installed_version()), '0')
+
+        steps = runner.run_parallel(connect, 2)
+        version = package.get_newest_version().version
+        self.assertEqual(str(runner.get_installed_version()), '1')
+        self.assertEqual(runner.get_completed_steps(version),
+                         set(step.index for step in steps))
+        self.assertEqual(
+            [row[1] for row in connection.execute('PRAGMA table_info(A)')],
+            ['A_Id', 'B_Id'])
+        self.assertEqual(
+            [row[1] for row in connection.execute('PRAGMA table_info(B)')],
+            ['B_Id', 'A_Id'])
+        self.assertEqual(runner.run_parallel(connect, 2), [])
@@ -0,0 +1,42 @@
+"""
+Helpers for building schema packages in the tests.
+"""
+
+import os
+import tempfile
+import textwrap
+import unittest
+import presquel
+
+
+class PackageTestCase(unittest.TestCase):
+    """
+    A test that writes its schema packages to a temporary directory, which
+    is removed when the test finishes.
+    """
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory(prefix='presquel-test-')
+        self.addCleanup(temp_dir.cleanup)
+        self.base_dir = temp_dir.name
+
+    def write_package(self, versions: dict) -> str:
+        """
+        :param versions: the version directory names, mapped to the names
+            and YAML text of the files in them.
+        :type versions: dict[str, dict[str, str]]
+        :return: the package directory
+        """
+        for version, files in versions.items():
+            os.makedirs(os.path.join(self.base_dir, version))
+            for name, text in files.items():
+                with open(os.path.join(self.base_dir, version, name), 'w',
+                          encoding='UTF-8') as f:
+                    f.write(textwrap.dedent(text))
+        return self.base_dir
+
+    def load_package(self, versions: dict, package_name: str='test'):
+        """
+        :rtype: presquel.model.version.SchemaPackage
+        """
+        return presquel.load_package(self.write_package(versions),
+                                     package_name)